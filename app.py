@@ -1,18 +1,48 @@
-from dash import Dash, html, dcc, Input, Output, State, no_update
+from dash import Dash, html, dcc, Input, Output, State, ClientsideFunction, no_update
 import dash_bootstrap_components as dbc
-import pandas as pd
-import pyodbc
-from flask import Response
+import os
+import threading
+import time
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from flask import Response, g, jsonify, request, stream_with_context
+from werkzeug.middleware.proxy_fix import ProxyFix
 from conexion_bd import (
     crear_usuario,
     verificar_credenciales,
     asignar_ubicacion,
     liberar_ubicacion,
-    obtener_opciones_disponibles,
-    obtener_todas_las_posiciones,
     ingresar_pallet,
-    conectar_bd    
+    ingresar_lote_pallets,
+    obtener_datos_pallet,
+    ejecutar_lote_movimientos,
+    iterar_posiciones_exportacion,
+    COLUMNAS_EXPORTACION,
+    lecturas_por_destino,
+    pool_sitio,
 )
+from cache_almacen import buscar_id_pallet, cubo_stock, indice_busqueda, iniciar_refresco_snapshot, obtener_snapshot, snapshot_publicado
+from busqueda_pallets import LIMITE_RESULTADOS
+from cubo_stock import DIMENSIONES, TRAMOS_EDAD, SIN_FECHA
+from circuito_bd import circuito, circuito_replica
+from modelo_almacen import PalletModelo, orden_fecha_faena
+from recomendador import recomendar_ubicaciones
+from planificador_retiro import planificar_retiro
+from lista_picking import generar_lista_picking
+from compactacion import fragmentacion_por_rack, planificar_compactacion
+from exportacion import generar_csv, generar_parquet, parquet_disponible
+from ledger import ocupacion_en
+import series_ocupacion
+from limite_tasa import LimitadorTasa
+from qr_pallet import extraer_npallet, validar_qr
+from importacion_diferida import ModuloDiferido
+import perfil_memoria
+import sitios
+import trazas
+
+# pandas solo lo usan las vistas de racks; se importa en la primera visualización
+pd = ModuloDiferido("pandas")
+pyodbc = ModuloDiferido("pyodbc")
 
 
 
@@ -20,15 +50,239 @@ from conexion_bd import (
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP], suppress_callback_exceptions=True)
 server = app.server
 
-from flask import Response
+# Proxies propios delante de la aplicación (balanceador). request.remote_addr toma de
+# X-Forwarded-For solo las direcciones que agregaron ellos; las anteriores las escribe
+# el cliente y no se usan. Sin balanceador debe ser 0.
+PROXIES_CONFIABLES = int(os.getenv("PROXIES_CONFIABLES", "1"))
+if PROXIES_CONFIABLES:
+    server.wsgi_app = ProxyFix(server.wsgi_app, x_for=PROXIES_CONFIABLES)
+
+# Sitio de cada solicitud (ver sitios.py): ?sitio= al abrir una página o llamar a la API;
+# el servidor lo deja en una cookie que usan los callbacks siguientes del navegador
+COOKIE_SITIO = "sitio"
+
+
+@server.before_request
+def fijar_sitio():
+    """Fija el sitio de la solicitud; un ?sitio= desconocido se rechaza."""
+    pedido = request.args.get("sitio")
+    if pedido is not None and not sitios.es_sitio(pedido):
+        return jsonify({"error": f"Sitio desconocido: {pedido}. Sitios: {', '.join(sitios.SITIOS)}."}), 404
+    sitio = pedido or request.cookies.get(COOKIE_SITIO)
+    g.token_sitio = sitios.usar_sitio(sitio if sitios.es_sitio(sitio) else sitios.SITIO_PREDETERMINADO)
+
+
+@server.after_request
+def recordar_sitio(respuesta):
+    pedido = request.args.get("sitio")
+    if pedido and sitios.es_sitio(pedido) and pedido != request.cookies.get(COOKIE_SITIO):
+        respuesta.set_cookie(COOKIE_SITIO, pedido, max_age=365 * 86400, samesite="Lax")
+    return respuesta
+
+
+@server.teardown_request
+def restaurar_sitio(_error):
+    token = g.pop("token_sitio", None)
+    if token is not None:
+        sitios.restaurar(token)
+
+
+# Grabación opcional de callbacks para reproducir tráfico real (TRAZA_ARCHIVO)
+trazas.instrumentar_dash(server)
+
+# Medición opcional de memoria por callback (PERFIL_MEMORIA)
+perfil_memoria.instrumentar_dash(app)
+
+
+def _estado_sitio(sitio):
+    """Circuito, snapshot, pool de conexiones y réplica de un sitio en este proceso."""
+    with sitios.en_sitio(sitio) as configuracion:
+        estado = circuito.resumen()
+        snapshot = snapshot_publicado()
+        estado["snapshot_obsoleto"] = bool(snapshot and snapshot.obsoleto)
+        estado["antiguedad_snapshot"] = round(time.time() - snapshot.creado, 1) if snapshot else None
+        estado["pool"] = pool_sitio("primario").resumen()
+        if configuracion.servidor_lectura:
+            estado["replica"] = dict(
+                circuito_replica.resumen(),
+                lecturas=dict(lecturas_por_destino.get(sitio, {})),
+                pool=pool_sitio("replica").resumen(),
+            )
+    return estado
+
 
 @server.route("/health")
 def health_check():
-    return Response("200", status=200, mimetype='text/plain')
+    """Estado del sitio de la solicitud y, con varios sitios, de cada uno; 503 solo si todos tienen el circuito abierto."""
+    estado = _estado_sitio(sitios.sitio_actual())
+    abiertos = estado["estado"] == "abierto"
+    if len(sitios.SITIOS) > 1:
+        estado["sitio"] = sitios.sitio_actual()
+        estado["sitios"] = {sitio: _estado_sitio(sitio) for sitio in sitios.SITIOS}
+        abiertos = all(detalle["estado"] == "abierto" for detalle in estado["sitios"].values())
+    return jsonify(estado), 503 if abiertos else 200
+
+
+# Cantidad máxima de pallets por lista de picking
+MAXIMO_PICKING = 500
+
+# Cadencia de la vista en tiempo real (ms): mínima tras un cambio, máxima sin cambios
+INTERVALO_REALTIME_MINIMO = int(os.getenv("REALTIME_INTERVALO_MINIMO_MS", "2000"))
+INTERVALO_REALTIME_MAXIMO = int(os.getenv("REALTIME_INTERVALO_MAXIMO_MS", "60000"))
+
+# Solicitudes en curso de la vista en tiempo real por proceso a partir de las cuales
+# se recomienda a los clientes consultar más lento
+CARGA_REALTIME_ALTA = int(os.getenv("REALTIME_CARGA_ALTA", "8"))
+
+# Límite por cliente de la vista en tiempo real: ráfaga de 10 y luego 1 solicitud por segundo
+limitador_realtime = LimitadorTasa(
+    tasa=float(os.getenv("REALTIME_SOLICITUDES_POR_SEGUNDO", "1")),
+    capacidad=int(os.getenv("REALTIME_RAFAGA", "10")),
+)
+
+_realtime_en_curso = 0
+_lock_realtime = threading.Lock()
+
+
+def _entero_positivo(valor, maximo):
+    """Entero entre 1 y `maximo` (los mayores se recortan a `maximo`); None si no es un entero positivo."""
+    try:
+        numero = int(valor)
+    except (TypeError, ValueError):
+        return None
+    if numero < 1:
+        return None
+    return min(numero, maximo)
+
+
+@server.route("/api/picking")
+def api_picking():
+    """Lista de picking FEFO: ?variedad=&mercado=&cantidad=."""
+    cantidad = _entero_positivo(request.args.get("cantidad", 10), MAXIMO_PICKING)
+    if cantidad is None:
+        return jsonify({"error": "La cantidad debe ser un número entero mayor que 0."}), 400
+
+    snapshot = obtener_snapshot()
+    lista = generar_lista_picking(
+        snapshot.indice_picking(),
+        snapshot.modelo(),
+        cantidad,
+        variedad=request.args.get("variedad") or None,
+        mercado=request.args.get("mercado") or None,
+    )
+    return jsonify({"cantidad_solicitada": cantidad, "pallets": lista})
+
+
+
+@server.route("/api/pallets/buscar")
+def api_buscar_pallets():
+    """Búsqueda de pallets ubicados por NPallet (prefijo o parcial): ?q=&limite=."""
+    limite = _entero_positivo(request.args.get("limite", LIMITE_RESULTADOS), MAXIMO_PICKING)
+    if limite is None:
+        return jsonify({"error": "El límite debe ser un número entero mayor que 0."}), 400
+    texto = request.args.get("q", "")
+    return jsonify({"q": texto, "pallets": indice_busqueda().buscar(texto, limite)})
+
+
+@server.route("/api/stock")
+def api_stock():
+    """Pallets ubicados agrupados desde el cubo de stock: ?por=rack,variedad&rack=&variedad=&mercado=&tramo=."""
+    por = [d for d in request.args.get("por", "rack,tramo").split(",") if d]
+    if any(d not in DIMENSIONES for d in por):
+        return jsonify({"error": f"Dimensiones válidas: {', '.join(DIMENSIONES)}."}), 400
+    filtros = {}
+    for dimension in DIMENSIONES:
+        valor = request.args.get(dimension)
+        if valor:
+            filtros[dimension] = int(valor) if dimension in ("piso", "rack") and valor.isdigit() else valor
+    grupos = cubo_stock().consultar(por, filtros)
+    return jsonify({
+        "por": por,
+        "filtros": filtros,
+        "grupos": [dict(zip(por, valores), cantidad=cantidad) for valores, cantidad in grupos],
+    })
+
+
+# Exportaciones simultáneas por sitio en cada proceso. Cada descarga ocupa una conexión
+# del pool del sitio (réplica o primario) durante toda la transferencia, por lo que
+# un cliente lento no debe poder dejar al resto de la aplicación sin conexiones.
+EXPORTACIONES_SIMULTANEAS = int(os.getenv("EXPORTACIONES_SIMULTANEAS", "2"))
+
+_cupos_exportacion = {}
+_lock_cupos_exportacion = threading.Lock()
+
+
+def _cupo_exportacion():
+    """Semáforo de exportaciones del sitio actual."""
+    sitio = sitios.sitio_actual()
+    with _lock_cupos_exportacion:
+        if sitio not in _cupos_exportacion:
+            _cupos_exportacion[sitio] = threading.BoundedSemaphore(EXPORTACIONES_SIMULTANEAS)
+        return _cupos_exportacion[sitio]
+
+
+def _fecha_faena_parametro(nombre):
+    """Fecha de faena de 8 dígitos (AAAAMMDD o DDMMAAAA) del parámetro; None si no viene. Lanza ValueError si es inválida."""
+    valor = (request.args.get(nombre) or "").strip()
+    if not valor:
+        return None
+    if len(valor) != 8 or not valor.isdigit():
+        raise ValueError(valor)
+    datetime.strptime(orden_fecha_faena(valor), "%Y%m%d")
+    return valor
+
+
+@server.route("/exportar/inventario.<formato>")
+def exportar_inventario(formato):
+    """Descarga el inventario en CSV o Parquet: ?rack=&variedad=&mercado=&desde=&hasta= (Fecha Faena)."""
+    if formato not in ("csv", "parquet"):
+        return jsonify({"error": "Formato no soportado. Use csv o parquet."}), 404
+    if formato == "parquet" and not parquet_disponible():
+        return jsonify({"error": "La exportación Parquet requiere el paquete pyarrow."}), 501
+
+    try:
+        rack = int(request.args["rack"]) if request.args.get("rack") else None
+    except ValueError:
+        return jsonify({"error": "El rack debe ser un número entero."}), 400
+    try:
+        fecha_desde = _fecha_faena_parametro("desde")
+        fecha_hasta = _fecha_faena_parametro("hasta")
+    except ValueError:
+        return jsonify({"error": "Las fechas desde/hasta deben tener 8 dígitos (AAAAMMDD o DDMMAAAA)."}), 400
+
+    cupo = _cupo_exportacion()
+    if not cupo.acquire(blocking=False):
+        return jsonify({"error": "Hay demasiadas exportaciones en curso, intente nuevamente en unos minutos."}), 503
+
+    lotes = iterar_posiciones_exportacion(
+        rack=rack,
+        variedad=request.args.get("variedad") or None,
+        mercado=request.args.get("mercado") or None,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    )
+
+    if formato == "csv":
+        contenido, mimetype = generar_csv(COLUMNAS_EXPORTACION, lotes), "text/csv"
+    else:
+        contenido, mimetype = generar_parquet(COLUMNAS_EXPORTACION, lotes), "application/vnd.apache.parquet"
+
+    # La descarga comienza con el primer lote; el inventario nunca se carga completo en memoria
+    respuesta = Response(
+        stream_with_context(contenido),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename=inventario.{formato}"},
+    )
+    # El servidor cierra la respuesta al terminar o al cortarse la descarga
+    respuesta.call_on_close(cupo.release)
+    return respuesta
 
 
 
 # --- Layouts ---
+# Los layouts que no dependen de los datos se construyen una vez por proceso (lru_cache)
+# y se reutilizan en cada navegación; Dash solo los serializa.
+@lru_cache(maxsize=None)
 def sidebar():
     return dbc.Col(
         dbc.Nav(
@@ -38,6 +292,12 @@ def sidebar():
                 dbc.NavLink("Liberar Ubicación", href="/liberar", active="exact"),
                 dbc.NavLink("Visualización", href="/visualizacion", active="exact"),
                 dbc.NavLink("Visualización en Tiempo Real", href="/visualizacion_realtime", active="exact"),
+                dbc.NavLink("Buscar Pallet", href="/buscar_pallet", active="exact"),
+                dbc.NavLink("Picking FEFO", href="/picking", active="exact"),
+                dbc.NavLink("Compactación", href="/compactacion", active="exact"),
+                dbc.NavLink("Historial", href="/historial", active="exact"),
+                dbc.NavLink("Capacidad", href="/capacidad", active="exact"),
+                dbc.NavLink("Stock por Antigüedad", href="/stock", active="exact"),
                 dbc.NavLink("Cerrar Sesión", href="/", active="exact"),
             ],
             vertical=True,
@@ -52,9 +312,23 @@ def sidebar():
     )
 
 
+def barra_sitio():
+    """Selector de sitio (planta); solo se muestra con más de un sitio configurado."""
+    return html.Div(
+        dcc.Dropdown(
+            id="selector-sitio",
+            options=[{"label": sitio, "value": sitio} for sitio in sitios.SITIOS],
+            clearable=False,
+            style={"width": "250px"},
+        ),
+        style={"padding": "10px 20px", "display": "block" if len(sitios.SITIOS) > 1 else "none"},
+    )
+
+
 
 
 
+@lru_cache(maxsize=None)
 def login_layout():
     """Layout para la página de inicio de sesión."""
     return html.Div(
@@ -123,6 +397,7 @@ def login_layout():
     )
 
 
+@lru_cache(maxsize=None)
 def gestion_layout():
     """Layout para la página de gestión de ubicaciones."""
     return html.Div([
@@ -139,7 +414,11 @@ def gestion_layout():
                             dcc.Dropdown(id="letra-select", placeholder="Seleccione Letra", options=[]),
                             # Cambiamos el placeholder para reflejar que se ingresará NPallet
                             dbc.Input(id="pallet-id", placeholder="Ingrese el NPallet", type="text", className="mt-2"),
+                            # Recomendación de ubicación para el pallet escaneado
+                            html.Div(id="recomendacion-ubicacion", className="mt-2"),
+                            dcc.Store(id="recomendacion-store"),
                             dbc.Button("Asignar Ubicación", id="assign-button", className="mt-3", color="success"),
+                            dbc.Button("Usar Recomendación", id="usar-recomendacion-button", className="mt-3 ms-2", color="info"),
                             html.Div(id="assign-feedback", className="mt-3"),
                         ], width=6),
                     ]),
@@ -150,6 +429,7 @@ def gestion_layout():
     ])
 
 
+@lru_cache(maxsize=None)
 def liberar_layout():
     """Layout para la página de liberación de ubicaciones."""
     return html.Div([
@@ -166,6 +446,19 @@ def liberar_layout():
                             html.Div(id="liberar-feedback", className="mt-3"),
                         ], width=6),
                     ]),
+                    html.Hr(),
+                    html.H4("Planificar Despacho"),
+                    dbc.Row([
+                        dbc.Col([
+                            # Un NPallet por línea (o separados por comas)
+                            dbc.Textarea(id="despacho-npallets", placeholder="Ingrese los NPallet a despachar", className="mb-2", rows=5),
+                            dbc.Button("Planificar", id="planificar-despacho-button", color="primary", className="mt-2"),
+                            dbc.Button("Ejecutar Plan", id="ejecutar-plan-button", color="danger", className="mt-2 ms-2"),
+                            dcc.Store(id="plan-despacho-store"),
+                            html.Div(id="plan-despacho-feedback", className="mt-3"),
+                            html.Div(id="plan-despacho", className="mt-3"),
+                        ], width=8),
+                    ]),
                 ]),
                 width=10,
             ),
@@ -174,6 +467,7 @@ def liberar_layout():
 
 
 
+@lru_cache(maxsize=None)
 def visualizacion_layout():
     """Layout para la página de visualización del almacén."""
     
@@ -181,7 +475,7 @@ def visualizacion_layout():
     filtro_dropdown = dcc.Dropdown(
         id="filtro-id-pallet",
         options=[],
-        placeholder="Seleccione uno o más NPallet",
+        placeholder="Escriba para buscar uno o más NPallet",
         multi=True,
         style={"marginBottom": "20px"}
     )
@@ -235,6 +529,13 @@ def visualizacion_layout():
         html.H5("Filtrar por Fecha de Faena", style={"marginTop": "20px"}),
         filtro_fecha_dropdown,
         html.Hr(),
+
+        # Exportación del inventario completo (descarga en streaming)
+        html.A("Exportar inventario (CSV)", href="/exportar/inventario.csv", className="btn btn-outline-primary w-100"),
+
+        # Refresco de las opciones de los filtros; solo se envían si cambiaron
+        dcc.Interval(id="interval-opciones-filtro", interval=60000, n_intervals=0),
+        dcc.Store(id="token-opciones-filtro"),
     ], style={
         "backgroundColor": "#f8f9fa",
         "padding": "20px",
@@ -292,6 +593,7 @@ def visualizacion_layout():
     ])
 
 
+@lru_cache(maxsize=None)
 def ingresar_pallet_layout():
     """Layout para la página de ingreso de pallets usando el código QR."""
     return html.Div([
@@ -302,7 +604,13 @@ def ingresar_pallet_layout():
                     html.H2("Ingresar Pallet desde Código QR", className="mb-4"),
                     dbc.Input(id="qr-data-input", placeholder="Escanee o ingrese el código QR", type="text", className="mb-3"),
                     dbc.Button("Ingresar Pallet", id="ingresar-pallet-button", color="primary", className="mb-4"),
-                    html.Div(id="ingresar-pallet-feedback", className="mt-2")
+                    html.Div(id="ingresar-pallet-feedback", className="mt-2"),
+                    html.Hr(),
+                    html.H4("Ingreso por Lote"),
+                    # Un código QR por línea, por ejemplo pegado desde el archivo del lector
+                    dbc.Textarea(id="qr-lote-input", placeholder="Pegue los códigos QR, uno por línea", className="mb-2", rows=8),
+                    dbc.Button("Ingresar Lote", id="ingresar-lote-button", color="primary", className="mb-4"),
+                    html.Div(id="ingresar-lote-feedback", className="mt-2"),
                 ]),
                 width=10,
             ),
@@ -310,54 +618,191 @@ def ingresar_pallet_layout():
     ])
 
 
-def visualizacion_realtime_layout():
-    """Layout para la página de visualización en tiempo real del almacén."""
+@lru_cache(maxsize=None)
+def buscar_pallet_layout():
+    """Layout para la página de búsqueda de pallets por NPallet."""
     return html.Div([
         dbc.Row([
             sidebar(),
             dbc.Col(
                 dbc.Container([
-                    html.H2("Visualización en Tiempo Real del Almacén", style={"marginBottom": "30px"}),
-
-                    # Intervalo para actualizaciones en tiempo real
-                    dcc.Interval(
-                        id="interval-realtime",
-                        interval=5000,  # Actualiza cada 5000ms (5 segundos)
-                        n_intervals=0
+                    html.H2("Buscar Pallet"),
+                    dbc.Input(
+                        id="buscar-npallet",
+                        placeholder="Escriba el NPallet completo o una parte",
+                        type="text",
+                        className="mt-2",
+                        style={"maxWidth": "400px"},
                     ),
+                    html.Div(id="buscar-npallet-resultado", className="mt-4"),
+                ]),
+                width=10,
+            ),
+        ]),
+    ])
 
-                    # Rack 1
-                    html.Div([
-                        html.Div([
-                            html.Div([
-                                html.H4("Utilización:", className="text-primary", style={"marginRight": "10px", "display": "inline-block"}),
-                                html.H2(id="utilizacion-rack1-realtime-html", className="text-success", style={"marginRight": "30px", "display": "inline-block"}),
-                                html.H4("Espacios disponibles:", className="text-primary", style={"marginRight": "10px", "display": "inline-block"}),
-                                html.H2(id="disponibles-rack1-realtime-html", className="text-success", style={"display": "inline-block"}),
-                            ], style={"display": "flex", "alignItems": "center", "marginBottom": "15px"}),
-                        ]),
-                        html.Div(id="rack1-realtime-html"),
-                    ], style={"marginBottom": "50px"}),
 
-                    # Rack 2
-                    html.Div([
-                        html.Div([
-                            html.Div([
-                                html.H4("Utilización:", className="text-primary", style={"marginRight": "10px", "display": "inline-block"}),
-                                html.H2(id="utilizacion-rack2-realtime-html", className="text-success", style={"marginRight": "30px", "display": "inline-block"}),
-                                html.H4("Espacios disponibles:", className="text-primary", style={"marginRight": "10px", "display": "inline-block"}),
-                                html.H2(id="disponibles-rack2-realtime-html", className="text-success", style={"display": "inline-block"}),
-                            ], style={"display": "flex", "alignItems": "center", "marginBottom": "15px"}),
-                        ]),
-                        html.Div(id="rack2-realtime-html"),
+def picking_layout():
+    """Layout para la página de generación de listas de picking FEFO."""
+    opciones = obtener_snapshot().opciones
+    return html.Div([
+        dbc.Row([
+            sidebar(),
+            dbc.Col(
+                dbc.Container([
+                    html.H2("Lista de Picking por Fecha de Faena"),
+                    dbc.Row([
+                        dbc.Col([
+                            dcc.Dropdown(
+                                id="picking-variedad",
+                                options=[{"label": v, "value": v} for v in opciones["Variedad"]],
+                                placeholder="Seleccione Variedad",
+                            ),
+                            dcc.Dropdown(
+                                id="picking-mercado",
+                                options=[{"label": m, "value": m} for m in opciones["Mercado"]],
+                                placeholder="Seleccione Mercado",
+                            ),
+                            dbc.Input(id="picking-cantidad", placeholder="Cantidad de pallets", type="number", min=1, className="mt-2"),
+                            dbc.Button("Generar Lista", id="picking-button", color="primary", className="mt-3"),
+                        ], width=6),
                     ]),
+                    html.Div(id="picking-resultado", className="mt-4"),
                 ]),
-                xs=12, sm=12, md=10, lg=10, xl=10,
+                width=10,
+            ),
+        ]),
+    ])
+
+
+@lru_cache(maxsize=None)
+def compactacion_layout():
+    """Layout para la página de análisis de fragmentación y compactación de carriles."""
+    return html.Div([
+        dbc.Row([
+            sidebar(),
+            dbc.Col(
+                dbc.Container([
+                    html.H2("Compactación de Carriles"),
+                    html.Div(id="fragmentacion-tabla", className="mt-3"),
+                    html.H4("Movimientos Propuestos", className="mt-4"),
+                    html.Div(id="compactacion-plan"),
+                    dcc.Store(id="compactacion-store"),
+                    dbc.Button("Ejecutar Movimientos", id="ejecutar-compactacion-button", color="danger", className="mt-3"),
+                    html.Div(id="compactacion-feedback", className="mt-3"),
+                ]),
+                width=10,
+            ),
+        ]),
+    ])
+
+
+def historial_layout():
+    """Layout para la página de reconstrucción histórica de la ocupación."""
+    return html.Div([
+        dbc.Row([
+            sidebar(),
+            dbc.Col(
+                dbc.Container([
+                    html.H2("Historial de Ocupación", style={"marginBottom": "30px"}),
+                    dbc.Row([
+                        dbc.Col(dcc.DatePickerSingle(id="historial-fecha", date=date.today(), display_format="DD/MM/YYYY"), width=3),
+                        dbc.Col(
+                            # Minutos desde la medianoche, en pasos de 15 minutos
+                            dcc.Slider(
+                                id="historial-minuto",
+                                min=0, max=1425, step=15, value=0,
+                                marks={h * 60: f"{h:02d}:00" for h in range(0, 24, 3)},
+                                updatemode="drag",
+                            ),
+                            width=9,
+                        ),
+                    ]),
+                    html.H4(id="historial-instante", className="text-primary mt-3"),
+                    html.Div(id="rack1-historial-html", style={"marginBottom": "50px"}),
+                    html.Div(id="rack2-historial-html"),
+                ]),
+                width=10,
+            ),
+        ]),
+    ])
+
+
+def capacidad_layout():
+    """Layout para la página de historia de utilización (planificación de capacidad)."""
+    series = series_ocupacion.series_disponibles()
+    return html.Div([
+        dbc.Row([
+            sidebar(),
+            dbc.Col(
+                dbc.Container([
+                    html.H2("Historia de Utilización", style={"marginBottom": "30px"}),
+                    dbc.Row([
+                        dbc.Col(dcc.Dropdown(
+                            id="capacidad-series",
+                            options=[{"label": s, "value": s} for s in series],
+                            value=["general"] if "general" in series else [],
+                            multi=True,
+                            placeholder="Seleccione una o más series",
+                        ), width=8),
+                        dbc.Col(dcc.RadioItems(
+                            id="capacidad-resolucion",
+                            options=[
+                                {"label": " Minuto", "value": "1m"},
+                                {"label": " Hora", "value": "1h"},
+                                {"label": " Día", "value": "1d"},
+                            ],
+                            value="1h",
+                            inline=True,
+                            inputStyle={"marginLeft": "10px"},
+                        ), width=4),
+                    ]),
+                    dcc.Graph(id="capacidad-grafico", className="mt-3"),
+                ]),
+                width=10,
+            ),
+        ]),
+    ])
+
+
+def stock_layout():
+    """Layout para el reporte de stock por rack, variedad, mercado y antigüedad."""
+    cubo = cubo_stock()
+    filtros = [("stock-rack", "rack", "Rack"), ("stock-variedad", "variedad", "Variedad"), ("stock-mercado", "mercado", "Mercado")]
+    return html.Div([
+        dbc.Row([
+            sidebar(),
+            dbc.Col(
+                dbc.Container([
+                    html.H2("Stock por Antigüedad", style={"marginBottom": "30px"}),
+                    dbc.Row([
+                        dbc.Col(dcc.Dropdown(
+                            id=id_filtro,
+                            options=[{"label": str(v), "value": v} for v in cubo.valores(dimension)],
+                            placeholder=f"Todos ({etiqueta})",
+                        ), width=3)
+                        for id_filtro, dimension, etiqueta in filtros
+                    ] + [
+                        dbc.Col(dcc.Dropdown(
+                            id="stock-agrupar",
+                            options=[
+                                {"label": "Por Rack", "value": "rack"},
+                                {"label": "Por Variedad", "value": "variedad"},
+                                {"label": "Por Mercado", "value": "mercado"},
+                            ],
+                            value="rack",
+                            clearable=False,
+                        ), width=3),
+                    ]),
+                    html.Div(id="stock-tabla", className="mt-4"),
+                ]),
+                width=10,
             ),
         ]),
     ])
 
 
+@lru_cache(maxsize=None)
 def visualizacion_realtime_layout():
     """Layout para la página de visualización en tiempo real del almacén."""
     return html.Div([
@@ -367,12 +812,16 @@ def visualizacion_realtime_layout():
                 dbc.Container([
                     html.H2("Visualización en Tiempo Real del Almacén", style={"marginBottom": "30px"}),
 
-                    # Intervalo para actualizaciones en tiempo real
+                    # Intervalo para actualizaciones en tiempo real; su cadencia la ajusta
+                    # assets/polling_realtime.js según la versión de los datos y la visibilidad
                     dcc.Interval(
                         id="interval-realtime",
-                        interval=2000,  # Actualiza cada 2000ms (2 segundos)
+                        interval=INTERVALO_REALTIME_MINIMO,
                         n_intervals=0
                     ),
+                    # Revisa la visibilidad de la pestaña en el navegador, sin llamar al servidor
+                    dcc.Interval(id="interval-visibilidad", interval=1000, n_intervals=0),
+                    dcc.Store(id="estado-realtime"),
 
                     # Rack 1
                     html.Div([
@@ -406,6 +855,44 @@ def visualizacion_realtime_layout():
     ])
 
 
+def generar_html_matriz_estado(df, titulo):
+    """Genera el HTML para la tabla dinámica de un rack (verde libre, rojo ocupado)."""
+    filas = []
+    encabezados = ["Piso", "Posición Pallet"] + list(df.columns)
+    filas.append(html.Tr([html.Th(col, style={"textAlign": "center"}) for col in encabezados]))
+
+    for index, row in df.iterrows():
+        celdas = []
+        piso, posicion = index if isinstance(index, tuple) else (index, "")
+        celdas.append(html.Td(piso, style={"textAlign": "center"}))
+        celdas.append(html.Td(posicion, style={"textAlign": "center"}))
+
+        for col, val in row.items():
+            estilo = {"textAlign": "center", "fontWeight": "bold", "color": "white"}
+            if val == "Libre":
+                estilo["backgroundColor"] = "green"
+            else:
+                estilo["backgroundColor"] = "red"
+            celdas.append(html.Td(val, style=estilo))
+
+        filas.append(html.Tr(celdas))
+
+    return html.Div([
+        html.H4(titulo, style={"marginTop": "20px", "marginBottom": "10px"}),
+        html.Table(filas, className="table table-bordered table-hover", style={"marginTop": "20px"})
+    ])
+
+
+def _identificador_cliente():
+    """Dirección del cliente según el último proxy confiable (ver PROXIES_CONFIABLES)."""
+    return request.remote_addr
+
+
+def _intervalo_sugerido(en_curso):
+    """Intervalo mínimo que el servidor recomienda a los clientes según la carga del proceso."""
+    return min(INTERVALO_REALTIME_MAXIMO, INTERVALO_REALTIME_MINIMO * (1 + en_curso // CARGA_REALTIME_ALTA))
+
+
 @app.callback(
     [
         Output("rack1-realtime-html", "children"),
@@ -414,44 +901,50 @@ def visualizacion_realtime_layout():
         Output("utilizacion-rack2-realtime-html", "children"),
         Output("disponibles-rack1-realtime-html", "children"),
         Output("disponibles-rack2-realtime-html", "children"),
+        Output("estado-realtime", "data"),
     ],
-    Input("interval-realtime", "n_intervals")
+    Input("interval-realtime", "n_intervals"),
+    State("estado-realtime", "data"),
 )
-def actualizar_vista_realtime(n_intervals):
-    """Actualiza los datos en tiempo real."""
-
-    # Generar HTML de tablas dinámicas
-    def generar_html_matriz(df, titulo):
-        """Genera el HTML para la tabla dinámica de un rack."""
-        filas = []
-        encabezados = ["Piso", "Posición Pallet"] + list(df.columns)
-        filas.append(html.Tr([html.Th(col, style={"textAlign": "center"}) for col in encabezados]))
-
-        for index, row in df.iterrows():
-            celdas = []
-            piso, posicion = index if isinstance(index, tuple) else (index, "")
-            celdas.append(html.Td(piso, style={"textAlign": "center"}))
-            celdas.append(html.Td(posicion, style={"textAlign": "center"}))
-
-            for col, val in row.items():
-                estilo = {"textAlign": "center", "fontWeight": "bold", "color": "white"}
-                if val == "Libre":
-                    estilo["backgroundColor"] = "green"
-                else:
-                    estilo["backgroundColor"] = "red"
-                celdas.append(html.Td(val, style=estilo))
-
-            filas.append(html.Tr(celdas))
-
-        return html.Div([
-            html.H4(titulo, style={"marginTop": "20px", "marginBottom": "10px"}),
-            html.Table(filas, className="table table-bordered table-hover", style={"marginTop": "20px"})
-        ])
-
-    # Recuperar posiciones
-    posiciones = obtener_todas_las_posiciones()
+def actualizar_vista_realtime(n_intervals, estado):
+    """Actualiza los datos en tiempo real; si la versión de los datos no cambió no se reenvían las tablas."""
+    global _realtime_en_curso
+    version_cliente = (estado or {}).get("version")
+    sin_cambios = (no_update,) * 6
+
+    if not limitador_realtime.permitir(_identificador_cliente()):
+        return sin_cambios + ({
+            "version": version_cliente,
+            "intervalo_minimo": INTERVALO_REALTIME_MINIMO,
+            "intervalo_maximo": INTERVALO_REALTIME_MAXIMO,
+            "intervalo_sugerido": INTERVALO_REALTIME_MAXIMO,
+        },)
+
+    with _lock_realtime:
+        _realtime_en_curso += 1
+        en_curso = _realtime_en_curso
+    try:
+        return _vista_realtime(version_cliente, en_curso)
+    finally:
+        with _lock_realtime:
+            _realtime_en_curso -= 1
+
+
+def _vista_realtime(version_cliente, en_curso):
+    # Recuperar posiciones; los viewers del mismo proceso comparten el snapshot
+    snapshot = obtener_snapshot(ttl=2)
+    estado = {
+        "version": snapshot.token_datos(),
+        "intervalo_minimo": INTERVALO_REALTIME_MINIMO,
+        "intervalo_maximo": INTERVALO_REALTIME_MAXIMO,
+        "intervalo_sugerido": _intervalo_sugerido(en_curso),
+    }
+    if version_cliente == estado["version"]:
+        return (no_update,) * 6 + (estado,)
+
+    posiciones = snapshot.posiciones
     if not posiciones:
-        return "Error: No hay datos disponibles", "", "", "", "", ""
+        return "Error: No hay datos disponibles", "", "", "", "", "", estado
 
     df_posiciones = pd.DataFrame.from_records(posiciones, columns=[
         "Tipo Almacén", "Piso", "Rack", "Letra", "Posición Pallet", "Estado Ubicación",
@@ -488,21 +981,33 @@ def actualizar_vista_realtime(n_intervals):
         aggfunc="first"
     ).fillna("Libre").sort_index(ascending=[False, False])
 
-    rack1_html = generar_html_matriz(matriz_rack1, "Rack 1")
-    rack2_html = generar_html_matriz(matriz_rack2, "Rack 2")
+    rack1_html = generar_html_matriz_estado(matriz_rack1, "Rack 1")
+    rack2_html = generar_html_matriz_estado(matriz_rack2, "Rack 2")
+
+    return rack1_html, rack2_html, utilizacion_rack1, utilizacion_rack2, f"{disponibles_rack1} espacios", f"{disponibles_rack2} espacios", estado
 
-    return rack1_html, rack2_html, utilizacion_rack1, utilizacion_rack2, f"{disponibles_rack1} espacios", f"{disponibles_rack2} espacios"
+
+# Cadencia adaptativa de interval-realtime, calculada en el navegador (assets/polling_realtime.js)
+app.clientside_callback(
+    ClientsideFunction(namespace="realtime", function_name="ajustar_intervalo"),
+    [Output("interval-realtime", "interval"), Output("interval-realtime", "disabled")],
+    [Input("estado-realtime", "data"), Input("interval-visibilidad", "n_intervals")],
+    State("interval-realtime", "interval"),
+)
 
 
 @app.callback(
     [Output("ingresar-pallet-feedback", "children"),
      Output("qr-data-input", "value")],
     [Input("ingresar-pallet-button", "n_clicks")],
-    [State("qr-data-input", "value")],
+    [State("qr-data-input", "value"), State("sitio-pagina", "data")],
     prevent_initial_call=True
 )
-def manejar_ingresar_pallet(n_clicks, qr_data):
+def manejar_ingresar_pallet(n_clicks, qr_data, sitio_pagina):
     """Maneja el ingreso del pallet a la base de datos."""
+    aviso = _aviso_otro_sitio(sitio_pagina)
+    if aviso is not None:
+        return aviso, no_update
     if qr_data:
         feedback = ingresar_pallet(qr_data)
     else:
@@ -510,6 +1015,40 @@ def manejar_ingresar_pallet(n_clicks, qr_data):
     return feedback, ""
 
 
+# Errores de un lote que se listan en pantalla; del resto solo se informa la cantidad
+ERRORES_LOTE_MOSTRADOS = 20
+
+
+@app.callback(
+    [Output("ingresar-lote-feedback", "children"),
+     Output("qr-lote-input", "value")],
+    [Input("ingresar-lote-button", "n_clicks")],
+    [State("qr-lote-input", "value"), State("sitio-pagina", "data")],
+    prevent_initial_call=True
+)
+def manejar_ingresar_lote(n_clicks, texto, sitio_pagina):
+    """Ingresa un lote de códigos QR; el texto se conserva si alguna línea no se ingresó."""
+    aviso = _aviso_otro_sitio(sitio_pagina)
+    if aviso is not None:
+        return aviso, no_update
+    if not (texto or "").strip():
+        return "", no_update
+
+    resultado = ingresar_lote_pallets(texto)
+    if "error" in resultado:
+        return dbc.Alert(resultado["error"], color="danger"), no_update
+
+    ingresados, errores = resultado["ingresados"], resultado["errores"]
+    contenido = [html.P(f"Pallets ingresados: {ingresados}. Líneas con errores: {len(errores)}.")]
+    if errores:
+        contenido.append(html.Ul([html.Li(f"Línea {numero}: {error}") for numero, error in errores[:ERRORES_LOTE_MOSTRADOS]]))
+        if len(errores) > ERRORES_LOTE_MOSTRADOS:
+            contenido.append(html.P(f"... y {len(errores) - ERRORES_LOTE_MOSTRADOS} errores más."))
+        color = "warning" if ingresados else "danger"
+        return dbc.Alert(contenido, color=color), no_update
+    return dbc.Alert(contenido, color="success"), ""
+
+
 
 
 @app.callback(
@@ -520,19 +1059,16 @@ def manejar_ingresar_pallet(n_clicks, qr_data):
      Output("disponibles-rack1-html", "children"),
      Output("disponibles-rack2-html", "children"),
      Output("utilizacion-general-html", "children"),
-     Output("espacios-disponibles-general-html", "children"),
-     Output("filtro-id-pallet", "options"),
-     Output("filtro-variedad-pallet", "options"),
-     Output("filtro-mercado-pallet", "options"),
-     Output("filtro-fecha-faena", "options")],
+     Output("espacios-disponibles-general-html", "children")],
     [Input("filtro-id-pallet", "value"),
      Input("filtro-variedad-pallet", "value"),
      Input("filtro-mercado-pallet", "value"),
      Input("filtro-fecha-faena", "value")]
 )
 def actualizar_colores(filtro_ids, filtro_variedad, filtro_mercado, filtro_fecha_faena):
-    """Actualiza las tablas, la utilización, los espacios disponibles, las métricas generales y los filtros."""
-    posiciones = obtener_todas_las_posiciones()
+    """Actualiza las tablas, la utilización, los espacios disponibles y las métricas generales."""
+    snapshot = obtener_snapshot()
+    posiciones = snapshot.posiciones
     df_posiciones = pd.DataFrame.from_records(posiciones, columns=[
         "Tipo Almacén", "Piso", "Rack", "Letra", "Posición Pallet", "Estado Ubicación",
         "id_pallet_asignado", "Descripción", "Variedad", "Mercado", "Fecha Faena", "NPallet"
@@ -574,11 +1110,10 @@ def actualizar_colores(filtro_ids, filtro_variedad, filtro_mercado, filtro_fecha
         aggfunc="first"
     ).fillna("Libre").sort_index(ascending=[False, False])
 
-    # Crear opciones para los dropdowns dinámicos
-    id_pallet_options = [{"label": val, "value": val} for val in df_posiciones["NPallet"].unique() if val != "Libre"]
-    variedad_options = [{"label": val, "value": val} for val in df_posiciones["Variedad"].dropna().unique()]
-    mercado_options = [{"label": val, "value": val} for val in df_posiciones["Mercado"].dropna().unique()]
-    fecha_faena_options = [{"label": str(val), "value": str(val)} for val in df_posiciones["Fecha Faena"].dropna().unique()]
+    # Resolver los filtros sobre los índices bitmap del snapshot
+    resaltados = snapshot.indice.npallets_resaltados(
+        filtro_ids, filtro_variedad, filtro_mercado, filtro_fecha_faena
+    )
 
     # Generar HTML de tablas con colores dinámicos
     def generar_html_matriz(df, titulo):
@@ -597,20 +1132,10 @@ def actualizar_colores(filtro_ids, filtro_variedad, filtro_mercado, filtro_fecha
 
                 if val == "Libre":
                     estilo["backgroundColor"] = "green"
+                elif val in resaltados:
+                    estilo["backgroundColor"] = "blue"
                 else:
-                    variedad = df_posiciones.loc[df_posiciones["NPallet"] == val, "Variedad"].values[0]
-                    mercado = df_posiciones.loc[df_posiciones["NPallet"] == val, "Mercado"].values[0]
-                    fecha_faena = df_posiciones.loc[df_posiciones["NPallet"] == val, "Fecha Faena"].values[0]
-
-                    if (
-                        (filtro_ids and val in filtro_ids) or
-                        (filtro_variedad and variedad in filtro_variedad) or
-                        (filtro_mercado and mercado in filtro_mercado) or
-                        (filtro_fecha_faena and str(fecha_faena) in filtro_fecha_faena)
-                    ):
-                        estilo["backgroundColor"] = "blue"
-                    else:
-                        estilo["backgroundColor"] = "red"
+                    estilo["backgroundColor"] = "red"
 
                 celdas.append(html.Td(val, style=estilo))
             filas.append(html.Tr(celdas))
@@ -632,13 +1157,47 @@ def actualizar_colores(filtro_ids, filtro_variedad, filtro_mercado, filtro_fecha
         f"{disponibles_rack2} espacios",
         utilizacion_general,
         f"{disponibles_general} espacios",
-        id_pallet_options,
-        variedad_options,
-        mercado_options,
-        fecha_faena_options
     )
 
 
+@app.callback(
+    [Output("filtro-variedad-pallet", "options"),
+     Output("filtro-mercado-pallet", "options"),
+     Output("filtro-fecha-faena", "options"),
+     Output("token-opciones-filtro", "data")],
+    Input("interval-opciones-filtro", "n_intervals"),
+    State("token-opciones-filtro", "data")
+)
+def actualizar_opciones_filtro(n_intervals, token_actual):
+    """Envía las opciones de los filtros solo cuando cambian los valores distintos del almacén."""
+    snapshot = obtener_snapshot()
+    if snapshot.token_opciones == token_actual:
+        return no_update, no_update, no_update, no_update
+
+    opciones = snapshot.opciones
+    variedad_options = [{"label": val, "value": val} for val in opciones["Variedad"]]
+    mercado_options = [{"label": val, "value": val} for val in opciones["Mercado"]]
+    fecha_faena_options = [{"label": val, "value": val} for val in opciones["Fecha Faena"]]
+    return variedad_options, mercado_options, fecha_faena_options, snapshot.token_opciones
+
+
+@app.callback(
+    Output("filtro-id-pallet", "options"),
+    Input("filtro-id-pallet", "search_value"),
+    State("filtro-id-pallet", "value")
+)
+def buscar_opciones_npallet(texto, seleccionados):
+    """Entrega las opciones de NPallet que coinciden con el texto escrito (búsqueda en el servidor)."""
+    seleccionados = seleccionados or []
+    if not texto:
+        # Sin texto solo se mantienen los NPallet ya seleccionados
+        return [{"label": val, "value": val} for val in seleccionados]
+
+    encontrados = obtener_snapshot().buscar_npallets(texto)
+    valores = seleccionados + [val for val in encontrados if val not in seleccionados]
+    return [{"label": val, "value": val} for val in valores]
+
+
 
 # --- Callbacks ---
 @app.callback(
@@ -656,6 +1215,18 @@ def display_page(pathname):
         return visualizacion_layout()
     elif pathname == "/visualizacion_realtime":
         return visualizacion_realtime_layout()
+    elif pathname == "/buscar_pallet":
+        return buscar_pallet_layout()
+    elif pathname == "/picking":
+        return picking_layout()
+    elif pathname == "/compactacion":
+        return compactacion_layout()
+    elif pathname == "/historial":
+        return historial_layout()
+    elif pathname == "/capacidad":
+        return capacidad_layout()
+    elif pathname == "/stock":
+        return stock_layout()
     return login_layout()
 
 
@@ -677,13 +1248,18 @@ def display_page(pathname):
     [
         State("letra-select", "value"),
         State("pallet-id", "value"),  # Aquí se ingresará el string completo
+        State("sitio-pagina", "data"),
     ],
 )
-def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data):
-    # Obtener las opciones disponibles basadas en los filtros seleccionados
-    tipos_almacen, pisos, racks, letras = obtener_opciones_disponibles(
-        tipo_almacen=tipo_almacen, piso=piso, rack=rack, letra=letra
-    )
+def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data, sitio_pagina):
+    # Obtener las opciones disponibles desde el índice de ubicaciones libres del snapshot
+    try:
+        tipos_almacen, pisos, racks, letras = obtener_snapshot().opciones_disponibles(
+            tipo_almacen=tipo_almacen, piso=piso, rack=rack, letra=letra
+        )
+    except (pyodbc.Error, ConnectionError) as e:
+        # Sin ningún snapshot cargado y con la base de datos caída o saturada
+        return dbc.Alert(f"Error al cargar las ubicaciones: {e}", color="warning"), [], [], [], [], pallet_data
 
     # Convertir resultados a formato para dropdowns
     tipos_almacen_options = [{"label": t, "value": t} for t in tipos_almacen]
@@ -693,6 +1269,11 @@ def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data):
 
     # Verificar si el botón de asignar fue presionado
     if n_clicks:
+        # Las opciones de la página pueden ser de otro sitio
+        aviso = _aviso_otro_sitio(sitio_pagina)
+        if aviso is not None:
+            return aviso, tipos_almacen_options, pisos_options, racks_options, letras_options, pallet_data
+
         # Validar que todos los campos requeridos estén llenos
         if not all([tipo_almacen, piso, rack, letra, pallet_data]):
             return (
@@ -708,14 +1289,11 @@ def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data):
             )
 
         # Extraer el NPallet del string ingresado
-        try:
-            n_pallet = pallet_data.split(",")[-1].strip()  # Extraer el último campo (NPallet)
-            if len(n_pallet) != 8 or not n_pallet.isdigit():
-                raise ValueError("El NPallet extraído no es válido.")
-        except Exception as e:
+        n_pallet, error = extraer_npallet(pallet_data)
+        if error:
             return (
                 dbc.Alert(
-                    f"Error al procesar el dato ingresado: {str(e)}. Asegúrese de usar el formato correcto.",
+                    f"Error al procesar el dato ingresado: {error}. Asegúrese de usar el formato correcto.",
                     color="danger",
                 ),
                 tipos_almacen_options,
@@ -725,13 +1303,10 @@ def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data):
                 pallet_data,  # No limpiar el campo si hay error
             )
 
-        # Convertir el NPallet al id_pallet
-        conn = conectar_bd()
-        cursor = conn.cursor()
+        # Convertir el NPallet al id_pallet (cache compartido entre workers)
         try:
-            cursor.execute("SELECT id_pallet FROM pallets WHERE NPallet = ?", (n_pallet,))
-            result = cursor.fetchone()
-            if result is None:
+            id_pallet = buscar_id_pallet(n_pallet)
+            if id_pallet is None:
                 return (
                     dbc.Alert(f"El NPallet '{n_pallet}' no existe en la base de datos.", color="danger"),
                     tipos_almacen_options,
@@ -740,8 +1315,8 @@ def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data):
                     letras_options,
                     pallet_data,  # No limpiar el campo si hay error
                 )
-            id_pallet = result[0]  # Obtener el id_pallet correspondiente
-        except pyodbc.Error as e:
+        except (pyodbc.Error, ConnectionError) as e:
+            # ConnectionError: circuito abierto o pool agotado, se rechaza sin esperar
             return (
                 dbc.Alert(f"Error al buscar el NPallet: {e}", color="danger"),
                 tipos_almacen_options,
@@ -750,8 +1325,6 @@ def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data):
                 letras_options,
                 pallet_data,  # No limpiar el campo si hay error
             )
-        finally:
-            conn.close()
 
         # Intentar asignar el pallet usando id_pallet
         mensaje = asignar_ubicacion(id_pallet, tipo_almacen, piso, rack, letra)
@@ -784,41 +1357,97 @@ def asignar_y_refrescar(tipo_almacen, piso, rack, n_clicks, letra, pallet_data):
 
 
 
+@app.callback(
+    [Output("recomendacion-ubicacion", "children"),
+     Output("recomendacion-store", "data")],
+    Input("pallet-id", "value")
+)
+def recomendar_ubicacion(pallet_data):
+    """Sugiere la mejor ubicación libre para el pallet escaneado."""
+    if not pallet_data:
+        return "", None
+
+    n_pallet, error = extraer_npallet(pallet_data)
+    if error:
+        return "", None
+
+    registro, _ = validar_qr(pallet_data.strip())
+    if registro:
+        # El QR completo ya trae Variedad, Mercado y Fecha Faena
+        variedad, mercado, fecha_faena = registro.variedad.strip(), registro.mercado.strip(), registro.fecha_faena
+    else:
+        try:
+            datos_pallet = obtener_datos_pallet(n_pallet)
+        except (pyodbc.Error, ConnectionError):
+            return "", None
+        if datos_pallet is None:
+            return "", None
+        _, variedad, mercado, fecha_faena = datos_pallet
+
+    pallet = PalletModelo(n_pallet, None, variedad, mercado, fecha_faena)
+    try:
+        modelo = obtener_snapshot().modelo()
+    except (pyodbc.Error, ConnectionError):
+        return "", None
+    recomendaciones = recomendar_ubicaciones(modelo, pallet)
+    if not recomendaciones:
+        return dbc.Alert("No hay ubicaciones libres para recomendar.", color="warning"), None
+
+    opciones = [
+        html.Li(f"{clave[0]}, Piso {clave[1]}, Rack {clave[2]}, Letra {clave[3]}")
+        for _, clave in recomendaciones
+    ]
+    return (
+        dbc.Alert([html.Strong("Ubicaciones recomendadas:"), html.Ol(opciones, className="mb-0")], color="info"),
+        list(recomendaciones[0][1]),
+    )
+
+
+@app.callback(
+    [Output("tipo-almacen-select", "value"),
+     Output("piso-select", "value"),
+     Output("rack-select", "value"),
+     Output("letra-select", "value")],
+    Input("usar-recomendacion-button", "n_clicks"),
+    State("recomendacion-store", "data"),
+    prevent_initial_call=True
+)
+def usar_recomendacion(n_clicks, recomendacion):
+    """Completa los selectores de ubicación con la recomendación vigente."""
+    if not recomendacion:
+        return no_update, no_update, no_update, no_update
+    return tuple(recomendacion)
+
+
 @app.callback(
     Output("liberar-feedback", "children"),
     Input("liberar-button", "n_clicks"),
-    State("pallet-id-liberar", "value")
+    [State("pallet-id-liberar", "value"), State("sitio-pagina", "data")]
 )
-def handle_liberar_pallet(n_clicks, pallet_data):
+def handle_liberar_pallet(n_clicks, pallet_data, sitio_pagina):
     """Libera la ubicación del pallet especificado utilizando NPallet."""
     if n_clicks:
+        aviso = _aviso_otro_sitio(sitio_pagina)
+        if aviso is not None:
+            return aviso
         if not pallet_data:
             return dbc.Alert("Ingrese los datos del pallet.", color="danger")
 
         # Extraer el NPallet del string ingresado
-        try:
-            n_pallet = pallet_data.split(",")[-1].strip()  # Extraer el último campo (NPallet)
-            if len(n_pallet) != 8 or not n_pallet.isdigit():
-                raise ValueError("El NPallet extraído no es válido.")
-        except Exception as e:
+        n_pallet, error = extraer_npallet(pallet_data)
+        if error:
             return dbc.Alert(
-                f"Error al procesar los datos ingresados: {str(e)}. Asegúrese de usar el formato correcto.",
+                f"Error al procesar los datos ingresados: {error}. Asegúrese de usar el formato correcto.",
                 color="danger"
             )
 
-        # Convertir el NPallet al id_pallet
-        conn = conectar_bd()
-        cursor = conn.cursor()
+        # Convertir el NPallet al id_pallet (cache compartido entre workers)
         try:
-            cursor.execute("SELECT id_pallet FROM pallets WHERE NPallet = ?", (n_pallet,))
-            result = cursor.fetchone()
-            if result is None:
+            id_pallet = buscar_id_pallet(n_pallet)
+            if id_pallet is None:
                 return dbc.Alert(f"El NPallet '{n_pallet}' no existe en la base de datos.", color="danger")
-            id_pallet = result[0]  # Obtener el id_pallet correspondiente
-        except pyodbc.Error as e:
+        except (pyodbc.Error, ConnectionError) as e:
             return dbc.Alert(f"Error al buscar el NPallet: {e}", color="danger")
-        finally:
-            conn.close()
 
         # Liberar la ubicación utilizando el id_pallet
         mensaje = liberar_ubicacion(id_pallet)
@@ -848,6 +1477,313 @@ def handle_liberar_pallet(n_clicks, pallet_data):
 
 
 
+@app.callback(
+    Output("picking-resultado", "children"),
+    Input("picking-button", "n_clicks"),
+    [State("picking-variedad", "value"),
+     State("picking-mercado", "value"),
+     State("picking-cantidad", "value")],
+    prevent_initial_call=True
+)
+def generar_picking(n_clicks, variedad, mercado, cantidad):
+    """Muestra los pallets a despachar, del más antiguo y más accesible al más reciente."""
+    cantidad = _entero_positivo(cantidad, MAXIMO_PICKING)
+    if cantidad is None:
+        return dbc.Alert("Ingrese la cantidad de pallets.", color="danger")
+
+    snapshot = obtener_snapshot()
+    lista = generar_lista_picking(snapshot.indice_picking(), snapshot.modelo(), cantidad, variedad, mercado)
+    if not lista:
+        return dbc.Alert("No hay pallets que cumplan con los filtros.", color="warning")
+
+    encabezados = ["NPallet", "Variedad", "Mercado", "Fecha Faena", "Ubicación", "Posición", "Pallets a mover"]
+    filas = [html.Tr([html.Th(col) for col in encabezados])]
+    for item in lista:
+        filas.append(html.Tr([
+            html.Td(item["npallet"]),
+            html.Td(item["variedad"]),
+            html.Td(item["mercado"]),
+            html.Td(item["fecha_faena"]),
+            html.Td(_formatear_ubicacion((item["tipo_almacen"], item["piso"], item["rack"], item["letra"]))),
+            html.Td(item["posicion_pallet"]),
+            html.Td(", ".join(item["bloqueantes"]) or "-"),
+        ]))
+
+    avisos = []
+    if len(lista) < int(cantidad):
+        avisos.append(dbc.Alert(f"Solo hay {len(lista)} pallets disponibles.", color="warning"))
+    return html.Div(avisos + [html.Table(filas, className="table table-bordered table-hover")])
+
+
+@app.callback(
+    Output("buscar-npallet-resultado", "children"),
+    Input("buscar-npallet", "value")
+)
+def buscar_pallet(texto):
+    """Muestra la ubicación de los pallets que coinciden y los pallets que hay delante de cada uno."""
+    if not texto or not texto.strip():
+        return ""
+    resultados = indice_busqueda().buscar(texto)
+    if not resultados:
+        return dbc.Alert(f"No hay pallets ubicados que coincidan con '{texto.strip()}'.", color="warning")
+
+    encabezados = ["NPallet", "Variedad", "Mercado", "Fecha Faena", "Ubicación", "Posición", "Carril", "Pallets delante"]
+    filas = [html.Tr([html.Th(col) for col in encabezados])]
+    for item in resultados:
+        filas.append(html.Tr([
+            html.Td(item["npallet"]),
+            html.Td(item["variedad"]),
+            html.Td(item["mercado"]),
+            html.Td(item["fecha_faena"]),
+            html.Td(_formatear_ubicacion((item["tipo_almacen"], item["piso"], item["rack"], item["letra"]))),
+            html.Td(item["posicion_pallet"]),
+            html.Td(f"{item['ocupados']} de {item['profundidad']}"),
+            html.Td(", ".join(item["bloqueantes"]) or "-"),
+        ]))
+    return html.Table(filas, className="table table-bordered table-hover")
+
+
+@app.callback(
+    [Output("fragmentacion-tabla", "children"),
+     Output("compactacion-plan", "children"),
+     Output("compactacion-store", "data")],
+    Input("compactacion-store", "id")
+)
+def mostrar_compactacion(_):
+    """Muestra la fragmentación por rack y piso y el plan de consolidación propuesto."""
+    snapshot = obtener_snapshot()
+    fragmentacion = snapshot.derivado("fragmentacion", fragmentacion_por_rack)
+    plan = snapshot.derivado("compactacion", planificar_compactacion)
+
+    encabezados = ["Tipo", "Piso", "Rack", "Carriles", "Vacíos", "Parciales", "Espacios libres", "Fragmentación"]
+    filas = [html.Tr([html.Th(col) for col in encabezados])]
+    for grupo in fragmentacion:
+        filas.append(html.Tr([
+            html.Td(grupo["tipo_almacen"]),
+            html.Td(grupo["piso"]),
+            html.Td(grupo["rack"]),
+            html.Td(grupo["carriles"]),
+            html.Td(grupo["vacios"]),
+            html.Td(grupo["parciales"]),
+            html.Td(grupo["libres"]),
+            html.Td(f"{grupo['fragmentacion'] * 100:.1f}%"),
+        ]))
+    tabla_fragmentacion = html.Table(filas, className="table table-bordered table-sm")
+
+    if not plan["pasos"]:
+        return tabla_fragmentacion, dbc.Alert("No hay movimientos de consolidación convenientes.", color="info"), None
+
+    filas = [html.Tr([html.Th("#"), html.Th("NPallet"), html.Th("Origen"), html.Th("Destino")])]
+    for i, paso in enumerate(plan["pasos"], start=1):
+        filas.append(html.Tr([
+            html.Td(i),
+            html.Td(paso["npallet"]),
+            html.Td(_formatear_ubicacion(paso["origen"])),
+            html.Td(_formatear_ubicacion(paso["destino"])),
+        ]))
+    resumen = html.P(
+        f"{len(plan['pasos'])} movimientos liberan {len(plan['carriles_liberados'])} carriles "
+        f"({plan['capacidad_ganada']} posiciones)."
+    )
+    datos = {"sitio": sitios.sitio_actual(), "carriles": _carriles_plan(snapshot.modelo(), plan["pasos"]), "pasos": plan["pasos"]}
+    return tabla_fragmentacion, html.Div([resumen, html.Table(filas, className="table table-bordered table-sm")]), datos
+
+
+@app.callback(
+    Output("compactacion-feedback", "children"),
+    Input("ejecutar-compactacion-button", "n_clicks"),
+    State("compactacion-store", "data"),
+    prevent_initial_call=True
+)
+def ejecutar_compactacion(n_clicks, plan):
+    """Ejecuta los movimientos de consolidación como un lote."""
+    if not plan:
+        return dbc.Alert("No hay movimientos para ejecutar.", color="danger")
+    if plan.get("sitio") != sitios.sitio_actual() or "carriles" not in plan:
+        return dbc.Alert("El almacén cambió desde que se calculó el plan. Recargue la página.", color="warning")
+
+    # Cada carril de origen y destino debe seguir como estaba al calcular el plan
+    mensaje = ejecutar_lote_movimientos(plan["pasos"], plan["carriles"])
+    color = "success" if "Error" not in mensaje else "danger"
+    return dbc.Alert(mensaje, color=color)
+
+
+@app.callback(
+    [Output("historial-instante", "children"),
+     Output("rack1-historial-html", "children"),
+     Output("rack2-historial-html", "children")],
+    [Input("historial-fecha", "date"),
+     Input("historial-minuto", "value")]
+)
+def mostrar_historial(fecha, minuto):
+    """Reconstruye y muestra la ocupación de los racks en el instante seleccionado."""
+    if not fecha:
+        return "", "", ""
+    instante = datetime.fromisoformat(fecha[:10]) + timedelta(minutes=minuto or 0)
+
+    try:
+        modelo = ocupacion_en(instante, obtener_snapshot().modelo())
+    except (pyodbc.Error, ConnectionError) as e:
+        return dbc.Alert(f"Error al reconstruir la ocupación: {e}", color="danger"), "", ""
+    if modelo is None:
+        return dbc.Alert(
+            "No hay registro de ocupación para ese instante: el historial comienza con el primer snapshot del ledger.",
+            color="warning",
+        ), "", ""
+
+    df_posiciones = pd.DataFrame.from_records(modelo.posiciones(), columns=[
+        "Tipo Almacén", "Piso", "Rack", "Letra", "Posición Pallet", "Estado Ubicación",
+        "id_pallet_asignado", "Descripción", "Variedad", "Mercado", "Fecha Faena", "NPallet"
+    ])
+    df_posiciones["NPallet"] = df_posiciones["NPallet"].fillna("Libre")
+
+    racks_html = []
+    for rack in (1, 2):
+        df_rack = df_posiciones[df_posiciones["Rack"] == rack]
+        matriz = pd.crosstab(
+            index=[df_rack["Piso"], df_rack["Posición Pallet"]],
+            columns=df_rack["Letra"],
+            values=df_rack["NPallet"],
+            aggfunc="first"
+        ).fillna("Libre").sort_index(ascending=[False, False])
+        racks_html.append(generar_html_matriz_estado(matriz, f"Rack {rack}"))
+
+    ocupadas = modelo.total_ocupadas()
+    titulo = f"{instante:%d/%m/%Y %H:%M} — {ocupadas} pallets ubicados"
+    return titulo, racks_html[0], racks_html[1]
+
+
+@app.callback(
+    Output("capacidad-grafico", "figure"),
+    [Input("capacidad-series", "value"),
+     Input("capacidad-resolucion", "value")]
+)
+def mostrar_capacidad(series, resolucion):
+    """Grafica los rollups de utilización desde el almacenamiento local, sin consultar SQL Server."""
+    graficos = []
+    for serie in series or []:
+        puntos = series_ocupacion.leer(serie, resolucion)
+        if not puntos:
+            continue
+        fechas = [datetime.fromtimestamp(p[0]) for p in puntos]
+        # Banda mínimo-máximo del bucket y promedio encima
+        graficos.append({"x": fechas, "y": [p[3] for p in puntos], "mode": "lines", "line": {"width": 0},
+                       "showlegend": False, "hoverinfo": "skip"})
+        graficos.append({"x": fechas, "y": [p[2] for p in puntos], "mode": "lines", "line": {"width": 0},
+                       "fill": "tonexty", "fillcolor": "rgba(0, 123, 255, 0.15)", "showlegend": False, "hoverinfo": "skip"})
+        graficos.append({"x": fechas, "y": [round(p[1], 2) for p in puntos], "mode": "lines", "name": serie})
+
+    return {
+        "data": graficos,
+        "layout": {
+            "yaxis": {"title": "Utilización (%)", "range": [0, 100]},
+            "margin": {"t": 20},
+            "hovermode": "x unified",
+        },
+    }
+
+
+@app.callback(
+    Output("stock-tabla", "children"),
+    [Input("stock-rack", "value"),
+     Input("stock-variedad", "value"),
+     Input("stock-mercado", "value"),
+     Input("stock-agrupar", "value")]
+)
+def mostrar_stock(rack, variedad, mercado, agrupar):
+    """Tabla de pallets por la dimensión elegida y tramo de antigüedad, leída del cubo de stock."""
+    filtros = {d: v for d, v in (("rack", rack), ("variedad", variedad), ("mercado", mercado)) if v is not None}
+    grupos = cubo_stock().consultar((agrupar, "tramo"), filtros)
+    if not grupos:
+        return dbc.Alert("No hay pallets ubicados que cumplan con los filtros.", color="warning")
+
+    tramos = [etiqueta for _, etiqueta in TRAMOS_EDAD] + [SIN_FECHA]
+    tabla = {}
+    for (valor, tramo), cantidad in grupos:
+        tabla.setdefault(valor, dict.fromkeys(tramos, 0))[tramo] = cantidad
+    if not any(fila[SIN_FECHA] for fila in tabla.values()):
+        tramos.remove(SIN_FECHA)
+
+    titulo = {"rack": "Rack", "variedad": "Variedad", "mercado": "Mercado"}[agrupar]
+    filas = [html.Tr([html.Th(titulo)] + [html.Th(tramo) for tramo in tramos] + [html.Th("Total")])]
+    for valor, cantidades in tabla.items():
+        filas.append(html.Tr(
+            [html.Td(valor)] + [html.Td(cantidades[tramo] or "-") for tramo in tramos] + [html.Td(sum(cantidades.values()))]
+        ))
+    totales = [sum(fila[tramo] for fila in tabla.values()) for tramo in tramos]
+    filas.append(html.Tr([html.Th("Total")] + [html.Th(total) for total in totales] + [html.Th(sum(totales))]))
+    return html.Table(filas, className="table table-bordered table-sm")
+
+
+def _formatear_ubicacion(clave):
+    return f"{clave[0]}, Piso {clave[1]}, Rack {clave[2]}, Letra {clave[3]}" if clave else ""
+
+
+def _carriles_plan(modelo, pasos):
+    """Contenido, en el modelo con que se calculó el plan, de los carriles que tocan sus pasos."""
+    claves = {tuple(paso[extremo]) for paso in pasos for extremo in ("origen", "destino") if paso.get(extremo)}
+    return modelo.contenido_carriles(claves)
+
+
+@app.callback(
+    [Output("plan-despacho", "children"),
+     Output("plan-despacho-store", "data")],
+    Input("planificar-despacho-button", "n_clicks"),
+    State("despacho-npallets", "value"),
+    prevent_initial_call=True
+)
+def planificar_despacho(n_clicks, texto):
+    """Calcula los retiros y reubicaciones necesarios para despachar los NPallet ingresados."""
+    npallets = [n.strip() for n in (texto or "").replace(",", "\n").splitlines() if n.strip()]
+    if not npallets:
+        return dbc.Alert("Ingrese al menos un NPallet.", color="danger"), None
+
+    modelo = obtener_snapshot().modelo()
+    plan = planificar_retiro(modelo, npallets)
+
+    avisos = []
+    if plan["faltantes"]:
+        avisos.append(dbc.Alert(f"NPallet sin ubicación asignada: {', '.join(plan['faltantes'])}", color="warning"))
+    if not plan["completo"]:
+        avisos.append(dbc.Alert("No hay espacio libre suficiente para reubicar los pallets bloqueantes.", color="danger"))
+
+    filas = [html.Tr([html.Th("#"), html.Th("Acción"), html.Th("NPallet"), html.Th("Origen"), html.Th("Destino")])]
+    for i, paso in enumerate(plan["pasos"], start=1):
+        filas.append(html.Tr([
+            html.Td(i),
+            html.Td("Retirar" if paso["accion"] == "retirar" else "Reubicar"),
+            html.Td(paso["npallet"]),
+            html.Td(_formatear_ubicacion(paso["origen"])),
+            html.Td(_formatear_ubicacion(paso["destino"])),
+        ]))
+    reubicaciones = sum(1 for paso in plan["pasos"] if paso["accion"] == "reubicar")
+    resumen = html.P(f"{len(plan['pasos'])} movimientos, {reubicaciones} reubicaciones temporales.")
+
+    datos = None
+    if plan["completo"]:
+        datos = {"sitio": sitios.sitio_actual(), "carriles": _carriles_plan(modelo, plan["pasos"]), "pasos": plan["pasos"]}
+    return html.Div(avisos + [resumen, html.Table(filas, className="table table-bordered table-sm")]), datos
+
+
+@app.callback(
+    Output("plan-despacho-feedback", "children"),
+    Input("ejecutar-plan-button", "n_clicks"),
+    State("plan-despacho-store", "data"),
+    prevent_initial_call=True
+)
+def ejecutar_plan_despacho(n_clicks, plan):
+    """Ejecuta el plan de despacho como un lote, si sus carriles no cambiaron desde que se calculó."""
+    if not plan:
+        return dbc.Alert("Primero calcule un plan de despacho válido.", color="danger")
+    if plan.get("sitio") != sitios.sitio_actual() or "carriles" not in plan:
+        return dbc.Alert("El almacén cambió desde que se calculó el plan. Vuelva a planificar.", color="warning")
+
+    # ejecutar_lote_movimientos compara los carriles con la base de datos dentro de la transacción
+    mensaje = ejecutar_lote_movimientos(plan["pasos"], plan["carriles"])
+    color = "success" if "Error" not in mensaje else "danger"
+    return dbc.Alert(mensaje, color=color)
+
+
 @app.callback(
     Output("create-user-modal", "is_open"),
     [Input("open-create-user-modal", "n_clicks"),
@@ -918,13 +1854,75 @@ def handle_create_user(n_clicks, username, password):
 
 
 
+def _aviso_otro_sitio(sitio_pagina):
+    """Alerta si la página es de un sitio distinto al de la sesión (se cambió en otra pestaña)."""
+    if sitio_pagina and sitio_pagina != sitios.sitio_actual():
+        return dbc.Alert(
+            f"Esta página es del sitio {sitio_pagina}, pero la sesión cambió al sitio {sitios.sitio_actual()} "
+            "en otra pestaña. Recargue la página.",
+            color="danger",
+        )
+    return None
+
+
+@app.callback(
+    [Output("selector-sitio", "value"), Output("sitio-pagina", "data")],
+    Input("url", "pathname")
+)
+def mostrar_sitio(_):
+    """Muestra en el selector el sitio de la sesión al cargar o navegar."""
+    sitio = sitios.sitio_actual()
+    return sitio, sitio
+
+
+@app.callback(
+    Output("recarga-sitio", "href"),
+    Input("selector-sitio", "value"),
+    [State("sitio-pagina", "data"), State("url", "pathname")],
+    prevent_initial_call=True
+)
+def cambiar_sitio(sitio, sitio_pagina, pathname):
+    """Recarga la página en el sitio elegido; el servidor lo guarda en la cookie."""
+    if not sitio or sitio == sitio_pagina:
+        return no_update
+    return f"{pathname or '/'}?sitio={sitio}"
+
+
+@app.callback(
+    Output("aviso-bd", "children"),
+    Input("interval-estado-bd", "n_intervals"),
+    State("sitio-pagina", "data")
+)
+def mostrar_aviso_bd(_, sitio_pagina):
+    """Avisa cuando la base de datos no responde y se muestran datos obsoletos, o si cambió el sitio."""
+    aviso = _aviso_otro_sitio(sitio_pagina)
+    if aviso is not None:
+        return aviso
+    snapshot = snapshot_publicado()
+    obsoleto = snapshot is not None and snapshot.obsoleto
+    if circuito.estado == "cerrado" and not obsoleto:
+        return None
+    mensaje = "La base de datos no responde; las operaciones de escritura se rechazarán hasta que se recupere."
+    if snapshot is not None:
+        minutos = int((time.time() - snapshot.creado) // 60)
+        mensaje += f" Se muestran los últimos datos disponibles (de hace {minutos} min)."
+    return dbc.Alert(mensaje, color="warning", className="mb-0")
+
+
 # --- Layout Inicial ---
 app.layout = html.Div([
     dcc.Location(id="url", refresh=True),  # Maneja las redirecciones
+    dcc.Location(id="recarga-sitio", refresh=True),  # Recarga la página al cambiar de sitio
+    dcc.Store(id="sitio-pagina"),  # Sitio con el que se cargó la página
+    dcc.Interval(id="interval-estado-bd", interval=10000, n_intervals=0),
+    barra_sitio(),
+    html.Div(id="aviso-bd"),  # Aviso de base de datos no disponible
     html.Div(id="page-content")  # Contenedor para el contenido de la página
 ])
 
 
 # --- Ejecutar la Aplicación ---
 if __name__ == "__main__":
+    # Con gunicorn el refresco se inicia en cada worker (ver gunicorn.conf.py)
+    iniciar_refresco_snapshot()
     app.run_server(debug=True)
\ No newline at end of file
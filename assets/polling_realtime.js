@@ -0,0 +1,47 @@
+// polling_realtime.js
+//
+// Cadencia adaptativa de interval-realtime:
+//  - se pausa mientras la pestaña está oculta y vuelve a consultar al mostrarse;
+//  - duplica el intervalo cada vez que la versión de los datos no cambió;
+//  - vuelve al intervalo mínimo apenas cambia la versión;
+//  - nunca consulta más rápido que el intervalo sugerido por el servidor.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    realtime: (function () {
+        var estado = {version: null, oculto: false};
+
+        return {
+            ajustar_intervalo: function (datos, nVisibilidad, intervaloActual) {
+                var sinCambio = window.dash_clientside.no_update;
+                var disparador = window.dash_clientside.callback_context.triggered
+                    .map(function (t) { return t.prop_id; }).join(",");
+
+                if (disparador.indexOf("interval-visibilidad") === 0) {
+                    var oculto = document.hidden;
+                    if (oculto === estado.oculto) {
+                        return [sinCambio, sinCambio];
+                    }
+                    estado.oculto = oculto;
+                    if (oculto || !datos) {
+                        return [sinCambio, oculto];
+                    }
+                    // Al volver a la pestaña se consulta pronto
+                    return [Math.max(datos.intervalo_minimo, datos.intervalo_sugerido), false];
+                }
+
+                if (!datos) {
+                    return [sinCambio, sinCambio];
+                }
+                var intervalo;
+                if (datos.version !== estado.version) {
+                    intervalo = datos.intervalo_minimo;
+                } else {
+                    intervalo = Math.min(intervaloActual * 2, datos.intervalo_maximo);
+                }
+                estado.version = datos.version;
+                intervalo = Math.max(intervalo, datos.intervalo_sugerido);
+                return [intervalo === intervaloActual ? sinCambio : intervalo, sinCambio];
+            }
+        };
+    })()
+});
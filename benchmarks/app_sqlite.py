@@ -0,0 +1,31 @@
+# benchmarks/app_sqlite.py
+#
+# Aplicación servida por gunicorn sobre la base SQLite de bd_sqlite.py, para pruebas
+# de carga sin SQL Server. La base se crea en ALMACEN_SQLITE (si no existe) antes de
+# que preload_app importe la aplicación, y todos los workers la comparten.
+#
+# Uso:
+#   ALMACEN_SQLITE=/tmp/almacen.db gunicorn -c gunicorn.conf.py --pythonpath benchmarks app_sqlite:server
+#   python benchmarks/carga_concurrente.py --url http://localhost:8000
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bd_sqlite  # noqa: E402
+from layout_almacen import generar_layout  # noqa: E402
+
+
+RUTA = os.getenv("ALMACEN_SQLITE", os.path.join(tempfile.gettempdir(), "almacen_carga.db"))
+
+if not os.path.exists(RUTA):
+    bd_sqlite.crear_base(RUTA, generar_layout(pisos=4, racks=2, letras=100), float(os.getenv("ALMACEN_OCUPACION", "0.5")))
+bd_sqlite.instalar(RUTA)
+
+from app import app, server  # noqa: E402
+
+# Objetos que gunicorn toma de este módulo (app_sqlite:server)
+__all__ = ["app", "server"]
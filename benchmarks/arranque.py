@@ -0,0 +1,91 @@
+# benchmarks/arranque.py
+#
+# Mide el arranque en frío de la aplicación:
+#   - tiempo de `import app` en un proceso nuevo (mediana de varias corridas);
+#   - módulos más lentos de importar según `python -X importtime`;
+#   - tiempo desde lanzar gunicorn hasta la primera respuesta 200 de /health.
+#
+# Uso:
+#   python benchmarks/arranque.py --corridas 5
+#   python benchmarks/arranque.py --sin-servidor
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def tiempo_importacion():
+    codigo = "import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)"
+    salida = subprocess.run(
+        [sys.executable, "-c", codigo], cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    return float(salida.stdout.strip().splitlines()[-1])
+
+
+def modulos_mas_lentos(cantidad):
+    """Retorna [(microsegundos acumulados, módulo)] de los paquetes de primer nivel más lentos."""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app"], cwd=RAIZ, capture_output=True, text=True, check=True
+    )
+    tiempos = []
+    for linea in salida.stderr.splitlines():
+        coincidencia = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)", linea)
+        # Solo módulos importados directamente (sin sangría adicional)
+        if coincidencia and len(coincidencia.group(2)) <= 1:
+            tiempos.append((int(coincidencia.group(1)), coincidencia.group(3)))
+    return sorted(tiempos, reverse=True)[:cantidad]
+
+
+def tiempo_primer_health(puerto, limite):
+    entorno = dict(os.environ, PORT=str(puerto), WEB_CONCURRENCY="1")
+    inicio = time.perf_counter()
+    proceso = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app.server"],
+        cwd=RAIZ, env=entorno, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - inicio < limite:
+            if proceso.poll() is not None:
+                raise RuntimeError("gunicorn terminó antes de responder /health")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{puerto}/health", timeout=1) as respuesta:
+                    if respuesta.status == 200:
+                        return time.perf_counter() - inicio
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f"/health no respondió en {limite} segundos")
+    finally:
+        proceso.terminate()
+        proceso.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tiempo de arranque en frío de la aplicación")
+    parser.add_argument("--corridas", type=int, default=5)
+    parser.add_argument("--puerto", type=int, default=8765)
+    parser.add_argument("--limite", type=float, default=60.0, help="segundos máximos de espera por /health")
+    parser.add_argument("--sin-servidor", action="store_true", help="solo mide la importación")
+    args = parser.parse_args()
+
+    importaciones = [tiempo_importacion() for _ in range(args.corridas)]
+    print(f"import app: mediana {statistics.median(importaciones) * 1000:.0f} ms, mínimo {min(importaciones) * 1000:.0f} ms")
+
+    print("Módulos más lentos:")
+    for microsegundos, modulo in modulos_mas_lentos(10):
+        print(f"  {microsegundos / 1000:>8.1f} ms  {modulo}")
+
+    if not args.sin_servidor:
+        primeros = [tiempo_primer_health(args.puerto, args.limite) for _ in range(args.corridas)]
+        print(f"primer /health: mediana {statistics.median(primeros) * 1000:.0f} ms, mínimo {min(primeros) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
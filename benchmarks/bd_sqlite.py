@@ -0,0 +1,281 @@
+# benchmarks/bd_sqlite.py
+#
+# Base de datos SQLite que reemplaza a SQL Server para benchmarks y reproducción de
+# trazas. conexion_bd se usa sin cambios: instalar() reemplaza su conexión por una
+# que traduce lo específico de T-SQL (hints de bloqueo, TOP, ISNULL, SYSDATETIME,
+# CHECKSUM_AGG, CONCAT, tablas #temporales, DELETE con alias) e implementa en Python
+# los procedimientos almacenados con la misma semántica de carril LIFO.
+
+import importlib
+import os
+import random
+import re
+import sqlite3
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+ESQUEMA = """
+CREATE TABLE ubicaciones (
+    id_ubicacion INTEGER PRIMARY KEY, tipo_almacen TEXT, piso INTEGER, rack INTEGER, letra TEXT,
+    posicion_pallet INTEGER, status_ubicacion TEXT, id_pallet_asignado INTEGER UNIQUE,
+    ubicacion_key TEXT, version_fila INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX ix_ubicaciones_carril ON ubicaciones (piso, rack, letra);
+CREATE TABLE pallets (
+    id_pallet INTEGER PRIMARY KEY, descripcion TEXT, Variedad TEXT, Mercado TEXT, fechafaena TEXT, NPallet TEXT UNIQUE
+);
+CREATE TABLE ledger_movimientos (
+    id_movimiento INTEGER PRIMARY KEY AUTOINCREMENT,
+    fecha_hora TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')),
+    tipo_movimiento TEXT NOT NULL, id_pallet INTEGER NOT NULL, NPallet TEXT,
+    tipo_almacen TEXT, piso INTEGER, rack INTEGER, letra TEXT
+);
+CREATE TABLE ledger_snapshots (
+    id_snapshot INTEGER PRIMARY KEY AUTOINCREMENT, fecha_hora TEXT NOT NULL, id_movimiento INTEGER NOT NULL, contenido TEXT NOT NULL
+);
+CREATE TABLE Usuarios (username TEXT PRIMARY KEY, password TEXT NOT NULL);
+"""
+
+VARIEDADES = ["Cerdo", "Pollo", "Pavo", "Vacuno", "Cordero"]
+MERCADOS = ["Nacional", "China", "Corea", "USA"]
+
+_TRADUCCIONES = [
+    (re.compile(r"WITH \((?:UPDLOCK|HOLDLOCK|TABLOCKX|ROWLOCK|NOLOCK)(?:,\s*\w+)*\)", re.I), ""),
+    (re.compile(r"\bISNULL\(", re.I), "IFNULL("),
+    (re.compile(r"\bSYSDATETIME\(\)", re.I), "strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime')"),
+    (re.compile(r"CHECKSUM_AGG\(CHECKSUM\(\*\)\)", re.I), "TOTAL(version_fila)"),
+    (re.compile(r"CREATE TABLE #", re.I), "CREATE TEMP TABLE "),
+    (re.compile(r"#(\w+)"), r"\1"),
+    (re.compile(r"DELETE (\w+) FROM (\w+) \1\b", re.I), r"DELETE FROM \2 AS \1"),
+]
+_TOP = re.compile(r"SELECT TOP (\d+) ", re.I)
+_EXEC = re.compile(r"\s*EXEC (\w+)", re.I)
+
+
+def traducir(sql):
+    for patron, reemplazo in _TRADUCCIONES:
+        sql = patron.sub(reemplazo, sql)
+    top = _TOP.search(sql)
+    if top:
+        sql = _TOP.sub("SELECT ", sql).rstrip() + f" LIMIT {top.group(1)}"
+    return sql
+
+
+# --- Procedimientos almacenados ---
+
+def _carril(cursor, piso, rack, letra):
+    cursor.execute(
+        "SELECT id_ubicacion, id_pallet_asignado FROM ubicaciones WHERE piso = ? AND rack = ? AND letra = ? ORDER BY posicion_pallet",
+        (piso, rack, letra),
+    )
+    return cursor.fetchall()
+
+
+def _reescribir_carril(cursor, filas, pallets):
+    """
+    Deja los pallets desde la posición 1 e incrementa la versión de las filas que cambian.
+
+    SQLite verifica UNIQUE fila por fila, por lo que primero se vacía el carril; en SQL
+    Server los procedimientos lo hacen con un único UPDATE (sql/version_ubicaciones.sql).
+    """
+    cursor.executemany(
+        "UPDATE ubicaciones SET id_pallet_asignado = NULL WHERE id_ubicacion = ?", [(fila[0],) for fila in filas]
+    )
+    for (id_ubicacion, anterior), nuevo in zip(filas, pallets + [None] * (len(filas) - len(pallets))):
+        cursor.execute(
+            "UPDATE ubicaciones SET id_pallet_asignado = ?, version_fila = version_fila + ? WHERE id_ubicacion = ?",
+            (nuevo, int(anterior != nuevo), id_ubicacion),
+        )
+
+
+def reasignar_pallet(cursor, piso, rack, letra, id_pallet):
+    filas = _carril(cursor, piso, rack, letra)
+    pallets = [fila[1] for fila in filas if fila[1] is not None]
+    if len(pallets) >= len(filas):
+        raise sqlite3.IntegrityError("El carril no tiene posiciones libres.")
+    _reescribir_carril(cursor, filas, [id_pallet] + pallets)
+
+
+def retirar_pallet(cursor, id_pallet):
+    cursor.execute("SELECT piso, rack, letra FROM ubicaciones WHERE id_pallet_asignado = ?", (id_pallet,))
+    ubicacion = cursor.fetchone()
+    if ubicacion is None:
+        return
+    filas = _carril(cursor, *ubicacion)
+    _reescribir_carril(cursor, filas, [fila[1] for fila in filas if fila[1] is not None and fila[1] != id_pallet])
+
+
+def actualizar_status_ubicacion(cursor):
+    cursor.execute(
+        "UPDATE ubicaciones SET status_ubicacion = CASE WHEN id_pallet_asignado IS NULL THEN 'Libre' ELSE 'Ocupado' END"
+    )
+
+
+def insertar_pallet_desde_qr(cursor, qr_data):
+    variedad, descripcion, mercado, fecha_faena, n_pallet = qr_data.split(",")
+    cursor.execute(
+        "INSERT INTO pallets (descripcion, Variedad, Mercado, fechafaena, NPallet) VALUES (?, ?, ?, ?, ?)",
+        (descripcion, variedad, mercado, fecha_faena, n_pallet),
+    )
+
+
+PROCEDIMIENTOS = {
+    "reasignar_pallet": reasignar_pallet,
+    "retirar_pallet": retirar_pallet,
+    "actualizar_status_ubicacion": actualizar_status_ubicacion,
+    "InsertPalletFromQR": insertar_pallet_desde_qr,
+}
+
+
+# --- Conexión compatible con la usada por conexion_bd ---
+
+def _error_odbc(error):
+    import pyodbc
+    if isinstance(error, sqlite3.IntegrityError):
+        if "ubicaciones.id_pallet_asignado" in str(error):
+            # Mismo texto que SQL Server para el índice único de pallet asignado
+            return pyodbc.IntegrityError(
+                "23000",
+                "[23000] Cannot insert duplicate key row in object 'dbo.ubicaciones' "
+                "with unique index 'ux_ubicaciones_pallet_asignado'. (2601)",
+            )
+        return pyodbc.IntegrityError("23000", str(error))
+    return pyodbc.Error("HY000", str(error))
+
+
+class CursorSqlite:
+    def __init__(self, conexion):
+        self._cursor = conexion.cursor()
+        self.fast_executemany = False
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, sql, params=()):
+        try:
+            procedimiento = _EXEC.match(sql)
+            if procedimiento:
+                PROCEDIMIENTOS[procedimiento.group(1)](self._cursor, *params)
+            else:
+                self._cursor.execute(traducir(sql), tuple(params))
+        except sqlite3.Error as e:
+            raise _error_odbc(e)
+        return self
+
+    def executemany(self, sql, filas):
+        try:
+            self._cursor.executemany(traducir(sql), [tuple(fila) for fila in filas])
+        except sqlite3.Error as e:
+            raise _error_odbc(e)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, cantidad):
+        return self._cursor.fetchmany(cantidad)
+
+
+class ConexionSqlite:
+    def __init__(self, ruta):
+        # conexion_bd devuelve las conexiones a un pool y otro hilo puede reutilizarlas
+        self._conexion = sqlite3.connect(ruta, timeout=30, check_same_thread=False)
+        # CONCAT de SQL Server: los NULL se tratan como texto vacío
+        self._conexion.create_function(
+            "CONCAT", -1, lambda *partes: "".join("" if parte is None else str(parte) for parte in partes), deterministic=True
+        )
+        self.timeout = None
+
+    def cursor(self):
+        return CursorSqlite(self._conexion)
+
+    def commit(self):
+        self._conexion.commit()
+
+    def rollback(self):
+        self._conexion.rollback()
+
+    def close(self):
+        self._conexion.close()
+
+
+def crear_base(ruta, carriles, ocupacion=0.5, npallets_extra=(), semilla=7):
+    """
+    Crea la base con el layout {(tipo_almacen, piso, rack, letra): profundidad} y la llena.
+
+    Cada carril recibe pallets hasta la fracción `ocupacion` en promedio. Los
+    `npallets_extra` se crean como pallets sin ubicación (por ejemplo, los que aparecen
+    en una traza).
+    """
+    rnd = random.Random(semilla)
+    conexion = sqlite3.connect(ruta)
+    conexion.executescript(ESQUEMA)
+    ubicaciones, pallets = [], []
+    for (tipo_almacen, piso, rack, letra), profundidad in carriles.items():
+        ocupados = min(profundidad, int(rnd.random() * 2 * ocupacion * profundidad + 0.5))
+        for posicion in range(1, profundidad + 1):
+            id_pallet = None
+            if posicion <= ocupados:
+                id_pallet = len(pallets) + 1
+                fecha = f"2024{rnd.randint(1, 12):02d}{rnd.randint(1, 28):02d}"
+                pallets.append((id_pallet, "Pallet", rnd.choice(VARIEDADES), rnd.choice(MERCADOS), fecha, f"{id_pallet:08d}"))
+            ubicaciones.append((
+                tipo_almacen, piso, rack, letra, posicion, "Ocupado" if id_pallet else "Libre", id_pallet,
+                f"{tipo_almacen}-{piso}-{rack}-{letra}-{posicion}",
+            ))
+    existentes = {pallet[5] for pallet in pallets}
+    for npallet in npallets_extra:
+        if npallet not in existentes:
+            existentes.add(npallet)
+            id_pallet = len(pallets) + 1
+            pallets.append((id_pallet, "Pallet", rnd.choice(VARIEDADES), rnd.choice(MERCADOS), "20240101", npallet))
+
+    conexion.executemany(
+        "INSERT INTO ubicaciones (tipo_almacen, piso, rack, letra, posicion_pallet, status_ubicacion, id_pallet_asignado, ubicacion_key) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        ubicaciones,
+    )
+    conexion.executemany("INSERT INTO pallets VALUES (?, ?, ?, ?, ?, ?)", pallets)
+    conexion.commit()
+    conexion.close()
+
+
+def instalar(ruta, replica=None):
+    """
+    Hace que conexion_bd use la base SQLite en `ruta` para el primario y la réplica.
+
+    `ruta` también puede ser un diccionario {sitio: ruta} con una base por sitio. Con
+    `replica` (ruta o diccionario igual que `ruta`) las conexiones al servidor de lectura
+    del sitio van a esa base. Si pyodbc no está instalado se registra un módulo mínimo
+    con sus clases de error, que son las únicas que conexion_bd usa fuera de la conexión.
+    """
+    try:
+        importlib.import_module("pyodbc")
+    except ImportError:
+        modulo = types.ModuleType("pyodbc")
+        modulo.Error = type("Error", (Exception,), {})
+        modulo.IntegrityError = type("IntegrityError", (modulo.Error,), {})
+        sys.modules["pyodbc"] = modulo
+
+    import conexion_bd
+
+    def ruta_de(destino, sitio):
+        return destino[sitio.nombre] if isinstance(destino, dict) else destino
+
+    def conectar(sitio, servidor, circuito_destino):
+        # Igual que en SQL Server, con el circuito abierto no se intenta conectar
+        circuito_destino.verificar()
+        if replica is not None and sitio.servidor_lectura and servidor == sitio.servidor_lectura:
+            conexion = ConexionSqlite(ruta_de(replica, sitio))
+        else:
+            conexion = ConexionSqlite(ruta_de(ruta, sitio))
+        circuito_destino.registrar_exito()
+        return conexion
+
+    conexion_bd._conectar = conectar
@@ -0,0 +1,122 @@
+# benchmarks/carga_concurrente.py
+#
+# Prueba de carga contra una instancia en ejecución de la aplicación.
+# Mide throughput y latencias para 10, 50 y 200 clientes concurrentes.
+#
+# Uso:
+#   gunicorn -c gunicorn.conf.py app:app.server
+#   python benchmarks/carga_concurrente.py --url http://localhost:8000 --duracion 20
+#
+# Sin SQL Server, la aplicación se puede servir sobre la base SQLite de bd_sqlite.py:
+#   gunicorn -c gunicorn.conf.py --pythonpath benchmarks app_sqlite:server
+
+import argparse
+import json
+import statistics
+import threading
+import time
+import urllib.request
+
+
+SALIDAS_VISUALIZACION = [
+    ("rack1-html", "children"),
+    ("rack2-html", "children"),
+    ("utilizacion-rack1-html", "children"),
+    ("utilizacion-rack2-html", "children"),
+    ("disponibles-rack1-html", "children"),
+    ("disponibles-rack2-html", "children"),
+    ("utilizacion-general-html", "children"),
+    ("espacios-disponibles-general-html", "children"),
+]
+
+ENTRADAS_VISUALIZACION = [
+    "filtro-id-pallet",
+    "filtro-variedad-pallet",
+    "filtro-mercado-pallet",
+    "filtro-fecha-faena",
+]
+
+
+def payload_visualizacion():
+    """Arma la solicitud que envía el navegador al callback actualizar_colores."""
+    return {
+        # Dash identifica los callbacks con varias salidas como "..a.children...b.children.."
+        "output": ".." + "...".join(f"{id_}.{prop}" for id_, prop in SALIDAS_VISUALIZACION) + "..",
+        "outputs": [{"id": id_, "property": prop} for id_, prop in SALIDAS_VISUALIZACION],
+        "inputs": [{"id": id_, "property": "value", "value": None} for id_ in ENTRADAS_VISUALIZACION],
+        "changedPropIds": [],
+        "state": [],
+    }
+
+
+def solicitud(url_base, escenario):
+    if escenario == "health":
+        return urllib.request.Request(f"{url_base}/health")
+    return urllib.request.Request(
+        f"{url_base}/_dash-update-component",
+        data=json.dumps(payload_visualizacion()).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+
+
+def ejecutar_nivel(url_base, escenario, clientes, duracion):
+    latencias = []
+    errores = [0]
+    lock = threading.Lock()
+    inicio_nivel = time.monotonic()
+    fin = inicio_nivel + duracion
+
+    def cliente():
+        locales = []
+        fallidas = 0
+        while time.monotonic() < fin:
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(solicitud(url_base, escenario), timeout=60) as respuesta:
+                    respuesta.read()
+                locales.append(time.perf_counter() - inicio)
+            except Exception:
+                fallidas += 1
+        with lock:
+            latencias.extend(locales)
+            errores[0] += fallidas
+
+    hilos = [threading.Thread(target=cliente) for _ in range(clientes)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    # Las solicitudes en curso al cumplirse la duración también terminan y se cuentan
+    transcurrido = time.monotonic() - inicio_nivel
+
+    if not latencias:
+        return {"clientes": clientes, "rps": 0.0, "p50_ms": None, "p95_ms": None, "errores": errores[0]}
+    latencias.sort()
+    return {
+        "clientes": clientes,
+        "rps": len(latencias) / transcurrido,
+        "p50_ms": statistics.median(latencias) * 1000,
+        "p95_ms": latencias[int(len(latencias) * 0.95) - 1] * 1000,
+        "errores": errores[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga concurrente de la aplicación")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--escenario", choices=["health", "visualizacion"], default="visualizacion")
+    parser.add_argument("--duracion", type=float, default=20.0, help="segundos por nivel de concurrencia")
+    parser.add_argument("--niveles", default="10,50,200")
+    args = parser.parse_args()
+
+    print(f"{'clientes':>8} {'req/s':>10} {'p50 ms':>10} {'p95 ms':>10} {'errores':>8}")
+    for clientes in (int(n) for n in args.niveles.split(",")):
+        r = ejecutar_nivel(args.url.rstrip("/"), args.escenario, clientes, args.duracion)
+        p50 = f"{r['p50_ms']:.1f}" if r["p50_ms"] is not None else "-"
+        p95 = f"{r['p95_ms']:.1f}" if r["p95_ms"] is not None else "-"
+        print(f"{r['clientes']:>8} {r['rps']:>10.1f} {p50:>10} {p95:>10} {r['errores']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# benchmarks/concurrencia_asignaciones.py
+#
+# Prueba de estrés de asignaciones concurrentes contra la base de datos.
+# Varios hilos, cada uno con su propia conexión, asignan pallets libres al mismo
+# carril a la vez. Al terminar se verifica que el carril no tenga más pallets que
+# posiciones, que ningún pallet quede en dos posiciones y que cada asignación
+# exitosa corresponda a un pallet ubicado. Luego se liberan los pallets asignados.
+#
+# Sin --piso/--rack/--letra la prueba corre sobre una base SQLite temporal
+# (bd_sqlite.py) con un carril vacío. Contra SQL Server requiere la migración
+# sql/version_ubicaciones.sql y un carril vacío. Termina con código 1 si alguna
+# ronda deja el carril en un estado inválido.
+#
+# Uso:
+#   python benchmarks/concurrencia_asignaciones.py --hilos 32 --rondas 5
+#   python benchmarks/concurrencia_asignaciones.py --piso 1 --rack 1 --letra A --hilos 32 --rondas 5
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bd_sqlite  # noqa: E402
+from conexion_bd import asignar_ubicacion, conectar_bd, liberar_ubicacion  # noqa: E402
+
+
+def preparar_sqlite(pallets, profundidad):
+    """Crea e instala una base SQLite con dos carriles vacíos y `pallets` pallets sin ubicación."""
+    ruta = os.path.join(tempfile.mkdtemp(prefix="concurrencia_"), "almacen.db")
+    carriles = {("A", 1, 1, "A"): profundidad, ("A", 1, 1, "B"): profundidad}
+    bd_sqlite.crear_base(ruta, carriles, 0, npallets_extra=[f"C{i:07d}" for i in range(pallets)])
+    bd_sqlite.instalar(ruta)
+    return "A", 1, 1, "A"
+
+
+def pallets_sin_ubicacion(cantidad):
+    conn = conectar_bd()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            f"""
+            SELECT TOP {int(cantidad)} p.id_pallet FROM pallets p
+            WHERE NOT EXISTS (SELECT 1 FROM ubicaciones u WHERE u.id_pallet_asignado = p.id_pallet)
+            ORDER BY p.id_pallet
+            """
+        )
+        return [fila[0] for fila in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def estado_carril(piso, rack, letra):
+    """Retorna (posiciones, [(posicion_pallet, id_pallet)] ocupadas) del carril."""
+    conn = conectar_bd()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT posicion_pallet, id_pallet_asignado FROM ubicaciones WHERE piso = ? AND rack = ? AND letra = ?",
+            (piso, rack, letra)
+        )
+        filas = cursor.fetchall()
+        return len(filas), sorted((f[0], f[1]) for f in filas if f[1] is not None)
+    finally:
+        conn.close()
+
+
+def pallets_duplicados():
+    conn = conectar_bd()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT id_pallet_asignado FROM ubicaciones
+            WHERE id_pallet_asignado IS NOT NULL
+            GROUP BY id_pallet_asignado HAVING COUNT(*) > 1
+        """)
+        return [fila[0] for fila in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def carriles_con_huecos():
+    """Carriles con una posición libre delante de una ocupada; los pallets deben quedar desde la posición 1."""
+    conn = conectar_bd()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT DISTINCT u.piso, u.rack, u.letra FROM ubicaciones u
+            WHERE u.id_pallet_asignado IS NOT NULL
+              AND EXISTS (
+                  SELECT 1 FROM ubicaciones v
+                  WHERE v.piso = u.piso AND v.rack = u.rack AND v.letra = u.letra
+                    AND v.posicion_pallet < u.posicion_pallet AND v.id_pallet_asignado IS NULL
+              )
+        """)
+        return [tuple(fila) for fila in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def ejecutar_ronda(tipo_almacen, piso, rack, letra, pallets):
+    barrera = threading.Barrier(len(pallets))
+    resultados = {}
+
+    def asignar(id_pallet):
+        barrera.wait()
+        resultados[id_pallet] = asignar_ubicacion(id_pallet, tipo_almacen, piso, rack, letra)
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=asignar, args=(id_pallet,)) for id_pallet in pallets]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    return resultados, time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de estrés de asignaciones concurrentes a un mismo carril")
+    parser.add_argument("--tipo-almacen", default="A")
+    parser.add_argument("--piso", type=int, help="carril de SQL Server; sin carril se usa una base SQLite temporal")
+    parser.add_argument("--rack", type=int)
+    parser.add_argument("--letra")
+    parser.add_argument("--hilos", type=int, default=32)
+    parser.add_argument("--rondas", type=int, default=5)
+    parser.add_argument("--profundidad", type=int, default=6, help="posiciones del carril de la base SQLite")
+    args = parser.parse_args()
+
+    if args.piso is None and args.rack is None and args.letra is None:
+        args.tipo_almacen, args.piso, args.rack, args.letra = preparar_sqlite(args.hilos, args.profundidad)
+    elif None in (args.piso, args.rack, args.letra):
+        parser.error("--piso, --rack y --letra se indican juntos")
+
+    posiciones, ocupadas = estado_carril(args.piso, args.rack, args.letra)
+    if ocupadas:
+        sys.exit("El carril debe estar vacío antes de la prueba.")
+    pallets = pallets_sin_ubicacion(args.hilos)
+    if len(pallets) < 2:
+        sys.exit("Se necesitan al menos 2 pallets sin ubicación.")
+
+    fallas = 0
+    print(f"Carril {args.piso}-{args.rack}-{args.letra}: {posiciones} posiciones, {len(pallets)} hilos")
+    for ronda in range(1, args.rondas + 1):
+        resultados, duracion = ejecutar_ronda(args.tipo_almacen, args.piso, args.rack, args.letra, pallets)
+        exitosas = {p for p, mensaje in resultados.items() if not str(mensaje).startswith("Error")}
+        _, ocupadas = estado_carril(args.piso, args.rack, args.letra)
+        ubicados = {id_pallet for _, id_pallet in ocupadas}
+        duplicados = pallets_duplicados()
+        huecos = carriles_con_huecos()
+
+        errores = []
+        if len(ocupadas) > posiciones:
+            errores.append(f"carril con {len(ocupadas)} pallets y {posiciones} posiciones")
+        if len({posicion for posicion, _ in ocupadas}) != len(ocupadas):
+            errores.append("dos pallets en la misma posición")
+        if duplicados:
+            errores.append(f"pallets en dos posiciones: {duplicados}")
+        if huecos:
+            errores.append(f"carriles con posiciones libres delante de pallets: {huecos}")
+        if exitosas != ubicados:
+            errores.append(f"asignaciones exitosas {sorted(exitosas)} != pallets en el carril {sorted(ubicados)}")
+        fallas += bool(errores)
+
+        print(f"ronda {ronda}: {len(exitosas)} asignados en {duracion * 1000:.0f} ms - {'; '.join(errores) or 'OK'}")
+
+        # Liberar desde la posición 1 para dejar el carril vacío para la siguiente ronda
+        for _, id_pallet in ocupadas:
+            liberar_ubicacion(id_pallet)
+
+    if fallas:
+        sys.exit(f"{fallas} rondas con el carril en un estado inválido.")
+    print("Ningún carril quedó con asignaciones dobles ni huecos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/memoria_callbacks.py
+#
+# Presupuesto de memoria de los callbacks de visualización.
+#
+# Ejecuta los callbacks más pesados contra la base SQLite de bd_sqlite.py con un
+# almacén sintético del tamaño indicado y mide con tracemalloc (perfil_memoria.medir)
+# el pico de memoria asignada por invocación. Cada callback tiene un presupuesto de
+# MB fijos más KB por posición del almacén; si algún pico lo supera se listan los
+# sitios (archivo:línea) que más memoria retienen al terminar y el script termina
+# con código 1, para usarlo como verificación antes de desplegar.
+#
+# Uso:
+#   python benchmarks/memoria_callbacks.py
+#   python benchmarks/memoria_callbacks.py --letras 200 --pisos 6 --ocupacion 0.8
+#   python benchmarks/memoria_callbacks.py --presupuestos presupuestos.json
+#
+# presupuestos.json reemplaza los valores de PRESUPUESTOS para los callbacks que incluye:
+#   {"actualizar_colores": {"mb": 4, "kb_por_posicion": 6}}
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# La medición no debe grabarse ni instrumentarse a sí misma
+os.environ.pop("TRAZA_ARCHIVO", None)
+os.environ.pop("PERFIL_MEMORIA", None)
+
+import bd_sqlite  # noqa: E402
+from layout_almacen import generar_layout  # noqa: E402
+from perfil_memoria import medir  # noqa: E402
+
+
+# Presupuesto del pico por invocación: MB fijos + KB por posición del almacén
+PRESUPUESTOS = {
+    "snapshot": {"mb": 8, "kb_por_posicion": 10},
+    "actualizar_colores": {"mb": 4, "kb_por_posicion": 6},
+    "actualizar_colores (filtrado)": {"mb": 4, "kb_por_posicion": 6},
+    "actualizar_vista_realtime": {"mb": 4, "kb_por_posicion": 6},
+    "actualizar_opciones_filtro": {"mb": 1, "kb_por_posicion": 0.5},
+    "mostrar_stock": {"mb": 1, "kb_por_posicion": 0.1},
+    "buscar_pallet": {"mb": 2, "kb_por_posicion": 0.5},
+}
+
+
+def escenarios(aplicacion, cache_almacen):
+    """(nombre, función) de cada invocación que se mide; usan el snapshot ya cargado salvo 'snapshot'."""
+    snapshot = cache_almacen.obtener_snapshot()
+    variedad = snapshot.opciones["Variedad"][:1]
+
+    def construir_snapshot():
+        nuevo = cache_almacen.SnapshotAlmacen(snapshot.version, cache_almacen.obtener_todas_las_posiciones())
+        nuevo.modelo()
+        return nuevo
+
+    return [
+        ("snapshot", construir_snapshot),
+        ("actualizar_colores", lambda: aplicacion.actualizar_colores(None, None, None, None)),
+        ("actualizar_colores (filtrado)", lambda: aplicacion.actualizar_colores(None, variedad, None, None)),
+        ("actualizar_vista_realtime", lambda: aplicacion._vista_realtime(None, 1)),
+        ("actualizar_opciones_filtro", lambda: aplicacion.actualizar_opciones_filtro(0, None)),
+        ("mostrar_stock", lambda: aplicacion.mostrar_stock(None, None, None, "variedad")),
+        ("buscar_pallet", lambda: aplicacion.buscar_pallet("0")),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Presupuesto de memoria de los callbacks de visualización")
+    parser.add_argument("--pisos", type=int, default=4)
+    parser.add_argument("--racks", type=int, default=2)
+    parser.add_argument("--letras", type=int, default=100)
+    parser.add_argument("--profundidad", type=int, default=6)
+    parser.add_argument("--ocupacion", type=float, default=0.5)
+    parser.add_argument("--repeticiones", type=int, default=3, help="invocaciones medidas por callback; se toma el mayor pico")
+    parser.add_argument("--presupuestos", help="JSON con presupuestos que reemplazan a los de PRESUPUESTOS")
+    args = parser.parse_args()
+
+    presupuestos = dict(PRESUPUESTOS)
+    if args.presupuestos:
+        with open(args.presupuestos, encoding="utf-8") as archivo:
+            presupuestos.update(json.load(archivo))
+
+    carriles = generar_layout(pisos=args.pisos, racks=args.racks, letras=args.letras, profundidad=args.profundidad)
+    posiciones = sum(carriles.values())
+    ruta = os.path.join(tempfile.mkdtemp(prefix="memoria_"), "almacen.db")
+    bd_sqlite.crear_base(ruta, carriles, args.ocupacion)
+    bd_sqlite.instalar(ruta)
+
+    import app as aplicacion
+    import cache_almacen
+
+    print(f"Almacén: {len(carriles)} carriles, {posiciones} posiciones, ocupación {args.ocupacion:.0%}")
+    print(f"\n{'callback':<32} {'pico MB':>8} {'retenido':>9} {'KB/pos':>7} {'presup.':>8}")
+
+    excedidos = []
+    for nombre, funcion in escenarios(aplicacion, cache_almacen):
+        # La primera invocación importa pandas y arma cachés de Dash; no se mide
+        funcion()
+        mediciones = [medir(funcion)[1] for _ in range(args.repeticiones)]
+        medicion = max(mediciones, key=lambda m: m.pico)
+
+        pico_mb = medicion.pico / 1024 / 1024
+        presupuesto = presupuestos.get(nombre)
+        limite_mb = presupuesto["mb"] + presupuesto["kb_por_posicion"] * posiciones / 1024 if presupuesto else None
+        marca = ""
+        if limite_mb is not None and pico_mb > limite_mb:
+            excedidos.append((nombre, medicion))
+            marca = " EXCEDIDO"
+        limite = f"{limite_mb:.1f}" if limite_mb is not None else "-"
+        print(
+            f"{nombre:<32} {pico_mb:>8.2f} {medicion.retenido / 1024 / 1024:>9.2f} "
+            f"{medicion.pico / 1024 / posiciones:>7.2f} {limite:>8}{marca}"
+        )
+
+    if excedidos:
+        print(f"\nCallbacks sobre su presupuesto: {len(excedidos)}")
+        for nombre, medicion in excedidos:
+            print(f"  {nombre}")
+            for sitio, tamano, bloques in medicion.sitios:
+                print(f"    {tamano / 1024:>10.1f} KB  {bloques:>7} bloques  {sitio}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+# benchmarks/qr_lote.py
+#
+# Velocidad de validación de códigos QR: un lote completamente válido (validación
+# por columnas) frente a un lote con una fracción de líneas
+# erróneas (revisión línea por línea) y frente a validar cada línea por separado.
+#
+# Uso:
+#   python benchmarks/qr_lote.py --lineas 100000 --errores 0.01
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qr_pallet import validar_lote, validar_qr  # noqa: E402
+
+
+def generar_lineas(cantidad, proporcion_errores, semilla=7):
+    aleatorio = random.Random(semilla)
+    lineas = []
+    for i in range(cantidad):
+        linea = f"V{i % 13},Pallet {i},M{i % 4},2024{(i % 12) + 1:02d}15,{i:08d}"
+        if aleatorio.random() < proporcion_errores:
+            linea = linea.replace(",", ";", 1)
+        lineas.append(linea)
+    return lineas
+
+
+def medir(funcion, repeticiones):
+    mejor = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        mejor = min(mejor, time.perf_counter() - inicio)
+    return mejor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validación de lotes de códigos QR")
+    parser.add_argument("--lineas", type=int, default=100000)
+    parser.add_argument("--errores", type=float, default=0.01, help="proporción de líneas erróneas en el segundo lote")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    validas = "\n".join(generar_lineas(args.lineas, 0))
+    con_errores = "\n".join(generar_lineas(args.lineas, args.errores))
+
+    casos = [
+        ("lote válido", lambda: validar_lote(validas)),
+        (f"lote con {args.errores:.1%} errores", lambda: validar_lote(con_errores)),
+        ("línea por línea", lambda: [validar_qr(linea) for linea in validas.split("\n")]),
+    ]
+    print(f"{'caso':<28} {'ms':>9} {'líneas/ms':>10}")
+    for nombre, funcion in casos:
+        segundos = medir(funcion, args.repeticiones)
+        print(f"{nombre:<28} {segundos * 1000:>9.1f} {args.lineas / (segundos * 1000):>10.0f}")
+
+    lote = validar_lote(con_errores)
+    print(f"Lote con errores: {len(lote)} registros, {len(lote.errores)} errores")
+
+
+if __name__ == "__main__":
+    main()
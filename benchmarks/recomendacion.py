@@ -0,0 +1,135 @@
+# benchmarks/recomendacion.py
+#
+# Benchmark offline del recomendador de ubicaciones sobre flujos sintéticos de llegada.
+# Compara el recomendador con una política aleatoria y reporta latencia por
+# recomendación y movimientos extra por pallets bloqueados al despachar.
+#
+# Uso:
+#   python benchmarks/recomendacion.py --letras 200 --pisos 4 --eventos 20000
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modelo_almacen import ModeloAlmacen, PalletModelo, generar_layout_sintetico, orden_fecha_faena  # noqa: E402
+from recomendador import recomendar_ubicaciones  # noqa: E402
+
+
+VARIEDADES = ["Cerdo", "Pollo", "Pavo", "Vacuno", "Cordero"]
+MERCADOS = ["Nacional", "China", "Corea", "USA"]
+
+
+def flujo_sintetico(eventos, semilla, proporcion_despacho=0.45):
+    """Genera eventos ("llegada", PalletModelo) y ("despacho", (variedad, mercado))."""
+    rnd = random.Random(semilla)
+    dia = 0
+    for i in range(eventos):
+        if i % 200 == 0:
+            dia += 1
+        if rnd.random() < proporcion_despacho:
+            yield "despacho", (rnd.choice(VARIEDADES), rnd.choice(MERCADOS))
+        else:
+            fecha = f"2024{1 + dia // 28 % 12:02d}{1 + dia % 28:02d}"
+            yield "llegada", PalletModelo(f"{i:08d}", i, rnd.choice(VARIEDADES), rnd.choice(MERCADOS), fecha)
+
+
+def politica_aleatoria(rnd):
+    def elegir(modelo, pallet):
+        libres = [clave for clave, carril in modelo.carriles.items() if not carril.lleno]
+        return rnd.choice(libres) if libres else None
+    return elegir
+
+
+def politica_recomendador(modelo, pallet):
+    recomendaciones = recomendar_ubicaciones(modelo, pallet, limite=1)
+    return recomendaciones[0][1] if recomendaciones else None
+
+
+def simular(posiciones, eventos, semilla, politica):
+    modelo = ModeloAlmacen.desde_posiciones(posiciones)
+    por_grupo = {}
+    latencias = []
+    movimientos_extra = 0
+    despachos = 0
+    rechazados = 0
+
+    for tipo, dato in flujo_sintetico(eventos, semilla):
+        if tipo == "llegada":
+            inicio = time.perf_counter()
+            clave = politica(modelo, dato)
+            latencias.append(time.perf_counter() - inicio)
+            if clave is None:
+                rechazados += 1
+                continue
+            modelo.ingresar(clave, dato)
+            por_grupo.setdefault((dato.variedad, dato.mercado), []).append(dato)
+        else:
+            pallets = por_grupo.get(dato)
+            if not pallets:
+                continue
+            # FEFO: se despacha el pallet más antiguo del grupo y, entre los de la
+            # misma fecha, el que tiene menos pallets delante
+            fecha_minima = min(orden_fecha_faena(p.fecha_faena) for p in pallets)
+            pallet = min(
+                (p for p in pallets if orden_fecha_faena(p.fecha_faena) == fecha_minima),
+                key=lambda p: modelo.posicion(p.npallet)[1],
+            )
+            pallets.remove(pallet)
+            bloqueantes = modelo.bloqueantes(pallet.npallet)
+            clave = modelo.ubicacion_pallet[pallet.npallet]
+            # Los bloqueantes se sacan y se vuelven a ingresar en el mismo carril
+            for bloqueante in bloqueantes:
+                modelo.retirar(bloqueante.npallet)
+            modelo.retirar(pallet.npallet)
+            for bloqueante in reversed(bloqueantes):
+                modelo.ingresar(clave, bloqueante)
+            movimientos_extra += 2 * len(bloqueantes)
+            despachos += 1
+
+    return {
+        "latencias": latencias,
+        "movimientos_extra": movimientos_extra,
+        "despachos": despachos,
+        "rechazados": rechazados,
+        "ocupacion": modelo.total_ocupadas() / modelo.total_posiciones(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del recomendador de ubicaciones")
+    parser.add_argument("--pisos", type=int, default=4)
+    parser.add_argument("--racks", type=int, default=2)
+    parser.add_argument("--letras", type=int, default=200)
+    parser.add_argument("--profundidad", type=int, default=6)
+    parser.add_argument("--eventos", type=int, default=20000)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    posiciones = generar_layout_sintetico(
+        pisos=args.pisos, racks=args.racks, letras=args.letras, profundidad=args.profundidad
+    )
+    print(f"Layout: {len(posiciones)} posiciones, {args.eventos} eventos")
+
+    for nombre, politica in (
+        ("recomendador", politica_recomendador),
+        ("aleatoria", politica_aleatoria(random.Random(args.semilla))),
+    ):
+        r = simular(posiciones, args.eventos, args.semilla, politica)
+        latencias = sorted(r["latencias"])
+        p50 = statistics.median(latencias) * 1000
+        p99 = latencias[int(len(latencias) * 0.99) - 1] * 1000
+        extra = r["movimientos_extra"] / r["despachos"] if r["despachos"] else 0
+        print(
+            f"{nombre:>13}: p50 {p50:.2f} ms, p99 {p99:.2f} ms, "
+            f"movimientos extra/despacho {extra:.2f}, rechazados {r['rechazados']}, "
+            f"ocupación final {r['ocupacion']:.1%}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/replica_lectura.py
+#
+# Simulación del ruteo de lecturas a la réplica con dos bases SQLite de bd_sqlite.py
+# en lugar de SQL Server. Un hilo escribe asignaciones en el "primario" (ubicaciones +
+# ledger_movimientos), otro las replica con un retraso fijo y varios lectores
+# consultan obtener_todas_las_posiciones() a través de conectar_bd_lectura().
+#
+# Para cada desfase máximo permitido se reporta qué proporción de lecturas atendió
+# la réplica y el atraso máximo observado en los datos leídos, que puede llegar al
+# desfase máximo más el intervalo de medición.
+#
+# Uso:
+#   python benchmarks/replica_lectura.py --retraso 1.0 --desfases 0,0.5,2 --duracion 5 --intervalo-medicion 1
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bd_sqlite  # noqa: E402
+import conexion_bd  # noqa: E402
+import sitios  # noqa: E402
+
+
+def crear_base(ruta, posiciones):
+    bd_sqlite.crear_base(ruta, {("A", 1, 1, f"L{i:05d}"): 1 for i in range(posiciones)}, ocupacion=0)
+    conn = sqlite3.connect(ruta)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.close()
+
+
+def escritor(primario, operaciones, fin, intervalo, posiciones):
+    """Asigna un pallet por intervalo; registra (instante, letra, id_pallet) de cada operación."""
+    conn = sqlite3.connect(primario, timeout=5)
+    id_pallet = 0
+    while time.monotonic() < fin and id_pallet < posiciones:
+        id_pallet += 1
+        letra = f"L{id_pallet - 1:05d}"
+        conn.execute("INSERT INTO pallets VALUES (?, 'd', 'V', 'M', '20240101', ?)", (id_pallet, f"{id_pallet:08d}"))
+        conn.execute("UPDATE ubicaciones SET id_pallet_asignado = ?, status_ubicacion = 'Ocupado' WHERE letra = ?", (id_pallet, letra))
+        # fecha_hora la pone la base, como en SQL Server
+        conn.execute(
+            "INSERT INTO ledger_movimientos (id_movimiento, tipo_movimiento, id_pallet) VALUES (?, 'asignacion', ?)",
+            (id_pallet, id_pallet),
+        )
+        fecha_hora = conn.execute("SELECT fecha_hora FROM ledger_movimientos WHERE id_movimiento = ?", (id_pallet,)).fetchone()[0]
+        conn.commit()
+        operaciones.append((time.monotonic(), letra, id_pallet, fecha_hora))
+        time.sleep(intervalo)
+    conn.close()
+
+
+def replicador(replica, operaciones, fin, retraso):
+    """Aplica en la réplica las operaciones con más de `retraso` segundos."""
+    conn = sqlite3.connect(replica, timeout=5)
+    aplicadas = 0
+    while time.monotonic() < fin + retraso:
+        limite = time.monotonic() - retraso
+        while aplicadas < len(operaciones) and operaciones[aplicadas][0] <= limite:
+            _, letra, id_pallet, fecha_hora = operaciones[aplicadas]
+            conn.execute("INSERT INTO pallets VALUES (?, 'd', 'V', 'M', '20240101', ?)", (id_pallet, f"{id_pallet:08d}"))
+            conn.execute("UPDATE ubicaciones SET id_pallet_asignado = ?, status_ubicacion = 'Ocupado' WHERE letra = ?", (id_pallet, letra))
+            conn.execute(
+                "INSERT INTO ledger_movimientos (id_movimiento, fecha_hora, tipo_movimiento, id_pallet) VALUES (?, ?, 'asignacion', ?)",
+                (id_pallet, fecha_hora, id_pallet),
+            )
+            conn.commit()
+            aplicadas += 1
+        time.sleep(0.01)
+    conn.close()
+
+
+def lector(operaciones, fin, atrasos):
+    """Lee todas las posiciones y mide cuánto tiempo llevaba en el primario la primera operación faltante."""
+    while time.monotonic() < fin:
+        conocidas = len(operaciones)
+        posiciones = conexion_bd.obtener_todas_las_posiciones()
+        ocupadas = sum(1 for fila in posiciones if fila[6] is not None)
+        if ocupadas < conocidas:
+            atrasos.append(time.monotonic() - operaciones[ocupadas][0])
+        else:
+            atrasos.append(0.0)
+
+
+def ejecutar(desfase, retraso, duracion, lectores, intervalo_escritura, intervalo_medicion):
+    directorio = tempfile.mkdtemp(prefix="replica_")
+    primario, replica = os.path.join(directorio, "primario.db"), os.path.join(directorio, "replica.db")
+    posiciones = int(duracion / intervalo_escritura) + 10
+    crear_base(primario, posiciones)
+    crear_base(replica, posiciones)
+
+    bd_sqlite.instalar(primario, replica=replica)
+    sitio = sitios.SITIO_PREDETERMINADO
+    sitios.SITIOS[sitio] = sitios.SITIOS[sitio]._replace(servidor_lectura=replica)
+    conexion_bd._pools.clear()
+    conexion_bd._desfases.clear()
+    conexion_bd.DESFASE_MAXIMO_REPLICA = desfase
+    conexion_bd.INTERVALO_MEDICION_DESFASE = intervalo_medicion
+    conexion_bd.lecturas_por_destino.clear()
+
+    operaciones, atrasos = [], []
+    fin = time.monotonic() + duracion
+    hilos = [
+        threading.Thread(target=escritor, args=(primario, operaciones, fin, intervalo_escritura, posiciones)),
+        threading.Thread(target=replicador, args=(replica, operaciones, fin, retraso)),
+    ] + [threading.Thread(target=lector, args=(operaciones, fin, atrasos)) for _ in range(lectores)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+
+    lecturas = conexion_bd.lecturas_por_destino.get(sitio, {"replica": 0, "primario": 0})
+    total = sum(lecturas.values()) or 1
+    return {
+        "desfase": desfase,
+        "lecturas": len(atrasos),
+        "replica": lecturas["replica"] / total * 100,
+        "atraso_maximo": max(atrasos) if atrasos else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ruteo de lecturas a réplica con SQLite como sustituto")
+    parser.add_argument("--retraso", type=float, default=1.0, help="retraso de replicación en segundos")
+    parser.add_argument("--desfases", default="0,0.5,2", help="desfases máximos permitidos a comparar")
+    parser.add_argument("--duracion", type=float, default=5.0)
+    parser.add_argument("--lectores", type=int, default=4)
+    parser.add_argument("--intervalo-escritura", type=float, default=0.5)
+    parser.add_argument("--intervalo-medicion", type=float, default=conexion_bd.INTERVALO_MEDICION_DESFASE,
+                        help="segundos entre mediciones del desfase de la réplica")
+    args = parser.parse_args()
+
+    print(f"Retraso de replicación: {args.retraso:.2f} s, medición del desfase cada {args.intervalo_medicion:.2f} s")
+    print(f"{'desfase máx':>12} {'lecturas':>9} {'% réplica':>10} {'atraso máx s':>13}")
+    for desfase in (float(d) for d in args.desfases.split(",")):
+        r = ejecutar(desfase, args.retraso, args.duracion, args.lectores, args.intervalo_escritura, args.intervalo_medicion)
+        print(f"{r['desfase']:>12.2f} {r['lecturas']:>9} {r['replica']:>10.1f} {r['atraso_maximo']:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
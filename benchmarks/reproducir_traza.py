@@ -0,0 +1,170 @@
+# benchmarks/reproducir_traza.py
+#
+# Reproduce una traza grabada con TRAZA_ARCHIVO (ver trazas.py) contra la aplicación
+# en proceso, usando la base SQLite de bd_sqlite.py en lugar de SQL Server. Cada
+# callback grabado se envía con el mismo cuerpo a /_dash-update-component, a la
+# velocidad original (--velocidad 1), más rápido (--velocidad 10) o sin esperas
+# (--velocidad 0).
+#
+# La base se genera siempre igual (layout y semilla fijos) y los NPallet consultados
+# en la traza se crean en ella, por lo que dos reproducciones de la misma traza
+# ejecutan el mismo trabajo. Para detectar regresiones se guarda el resultado de la
+# versión actual y se compara la siguiente contra él:
+#
+#   TRAZA_ARCHIVO=/var/log/almacen/traza gunicorn -c gunicorn.conf.py app:app.server
+#   python benchmarks/reproducir_traza.py /var/log/almacen/traza --guardar base.json
+#   python benchmarks/reproducir_traza.py /var/log/almacen/traza --comparar base.json --umbral 1.25
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# La reproducción no debe grabarse a sí misma
+os.environ.pop("TRAZA_ARCHIVO", None)
+
+import bd_sqlite  # noqa: E402
+import sitios  # noqa: E402
+from layout_almacen import generar_layout, leer_layout  # noqa: E402
+from trazas import leer_traza  # noqa: E402
+
+
+def npallets_consultados(registros):
+    """NPallet buscados en la traza que no se ingresan en ella; deben existir en la base."""
+    consultados, ingresados = set(), set()
+    for registro in registros:
+        if registro["tipo"] != "bd" or not registro.get("args"):
+            continue
+        args = registro["args"][0]
+        if registro["funcion"] in ("obtener_id_pallet", "obtener_datos_pallet") and args:
+            consultados.add(str(args[0]))
+        elif registro["funcion"] == "ingresar_pallet" and args:
+            ingresados.add(str(args[0]).split(",")[-1])
+    return sorted(consultados - ingresados)
+
+
+def percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def reproducir(callbacks, velocidad):
+    """Envía los callbacks y retorna {salida: [ms]} y la cantidad de respuestas con error."""
+    import app as aplicacion
+
+    cliente = aplicacion.server.test_client()
+    tiempos = {}
+    errores = 0
+    inicio_traza = callbacks[0]["t"]
+    inicio = time.monotonic()
+    for registro in callbacks:
+        if velocidad > 0:
+            espera = (registro["t"] - inicio_traza) / velocidad - (time.monotonic() - inicio)
+            if espera > 0:
+                time.sleep(espera)
+        t = time.perf_counter()
+        # El sitio va en la URL: la cookie del navegador no se graba
+        sitio = registro.get("sitio")
+        respuesta = cliente.post(
+            "/_dash-update-component", json=registro["cuerpo"], query_string={"sitio": sitio} if sitio else None
+        )
+        tiempos.setdefault(registro["salida"], []).append((time.perf_counter() - t) * 1000)
+        if respuesta.status_code >= 400:
+            errores += 1
+    return tiempos, errores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reproducción de trazas de producción")
+    parser.add_argument("trazas", nargs="+", help="archivos .jsonl.gz o la base TRAZA_ARCHIVO de todos los procesos")
+    parser.add_argument("--velocidad", type=float, default=0, help="1 = tiempo real, 0 = sin esperas")
+    parser.add_argument("--layout", help="layout CSV para la base SQLite; por defecto uno sintético")
+    parser.add_argument("--ocupacion", type=float, default=0.5)
+    parser.add_argument("--guardar", help="guarda los percentiles por callback en JSON")
+    parser.add_argument("--comparar", help="resultado guardado de una reproducción anterior")
+    parser.add_argument("--umbral", type=float, default=1.25, help="razón p50 actual/anterior que se considera regresión")
+    args = parser.parse_args()
+
+    registros = leer_traza(args.trazas)
+    callbacks = [r for r in registros if r["tipo"] == "callback" and r.get("cuerpo")]
+    llamadas_bd = [r for r in registros if r["tipo"] == "bd"]
+    if not callbacks:
+        print("La traza no tiene callbacks.")
+        return 1
+    duracion = callbacks[-1]["t"] - callbacks[0]["t"]
+    print(f"Traza: {len(callbacks)} callbacks y {len(llamadas_bd)} llamadas a conexion_bd en {duracion:.0f} s")
+
+    if args.layout:
+        with open(args.layout, newline="", encoding="utf-8") as archivo:
+            carriles = leer_layout(archivo)
+    else:
+        carriles = generar_layout(pisos=4, racks=2, letras=100)
+    # Una base por sitio de la traza, todas con el mismo layout y la misma semilla
+    faltantes = sorted({r["sitio"] for r in registros if r.get("sitio")} - set(sitios.SITIOS))
+    if faltantes:
+        sitios.configurar(list(sitios.SITIOS) + faltantes)
+    directorio = tempfile.mkdtemp(prefix="traza_")
+    rutas = {}
+    for sitio in sitios.SITIOS:
+        rutas[sitio] = os.path.join(directorio, f"almacen_{sitio}.db")
+        bd_sqlite.crear_base(rutas[sitio], carriles, args.ocupacion, npallets_consultados(registros))
+    bd_sqlite.instalar(rutas)
+
+    inicio = time.perf_counter()
+    tiempos, errores = reproducir(callbacks, args.velocidad)
+    print(f"Reproducción: {time.perf_counter() - inicio:.1f} s, {errores} respuestas con error")
+
+    grabados = {}
+    for registro in callbacks:
+        grabados.setdefault(registro["salida"], []).append(registro["ms"])
+    resultado = {
+        salida: {"n": len(ms), "p50": statistics.median(ms), "p95": percentil(ms, 0.95)}
+        for salida, ms in tiempos.items()
+    }
+    anterior = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            anterior = json.load(archivo)
+
+    regresiones = []
+    print(f"\n{'callback':<50} {'n':>6} {'p50 prod':>9} {'p50':>8} {'p95':>8} {'vs base':>8}")
+    for salida, r in sorted(resultado.items(), key=lambda item: -item[1]["p50"] * item[1]["n"]):
+        razon = ""
+        if salida in anterior:
+            valor = r["p50"] / max(anterior[salida]["p50"], 0.001)
+            razon = f"{valor:.2f}x"
+            if valor > args.umbral:
+                regresiones.append(salida)
+        nombre = (salida or "?").strip(".")[:50]
+        print(
+            f"{nombre:<50} {r['n']:>6} {statistics.median(grabados[salida]):>9.1f} "
+            f"{r['p50']:>8.1f} {r['p95']:>8.1f} {razon:>8}"
+        )
+
+    por_funcion = {}
+    for registro in llamadas_bd:
+        por_funcion.setdefault(registro["funcion"], []).append(registro["ms"])
+    print(f"\n{'conexion_bd (producción)':<50} {'n':>6} {'p50':>8} {'p95':>8}")
+    for funcion, ms in sorted(por_funcion.items(), key=lambda item: -sum(item[1])):
+        print(f"{funcion:<50} {len(ms):>6} {statistics.median(ms):>8.1f} {percentil(ms, 0.95):>8.1f}")
+
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, indent=2)
+
+    if regresiones:
+        print(f"\nRegresiones sobre {args.umbral:.2f}x: {len(regresiones)}")
+        for salida in regresiones:
+            print(f"  {salida}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# busqueda_pallets.py
+#
+# Índice de búsqueda por NPallet de cada proceso, mantenido por cache_almacen.
+#
+# Las actualizaciones incrementales (IndiceNPallet.aplicar) solo cubren las escrituras
+# hechas por el mismo worker: cache_almacen las aplica si la generación compartida
+# avanzó exactamente una vez desde que se construyó el índice. Una escritura de otro
+# worker cambia la generación sin pasar por este proceso, y el índice se reconstruye
+# completo desde el snapshot en la siguiente consulta; también se reconstruye cuando
+# pasan TTL_SNAPSHOT segundos (30) desde su creación. Con varios workers, solo la
+# fracción de escrituras que atiende cada uno se ahorra la reconstrucción.
+
+import bisect
+import itertools
+import threading
+import time
+
+
+# Cantidad máxima de resultados por búsqueda
+LIMITE_RESULTADOS = 20
+
+
+class IndiceNPallet:
+    """
+    Índice de búsqueda de pallets ubicados: arreglo ordenado de NPallet sobre una copia del modelo.
+
+    La búsqueda por prefijo es una bisección sobre el arreglo ordenado; la búsqueda
+    parcial (el texto aparece en cualquier parte) recorre el arreglo solo si faltan
+    resultados. Los movimientos hechos por este proceso se aplican en el lugar con
+    `aplicar`, sin reconstruir el índice.
+    """
+
+    def __init__(self, modelo, generacion):
+        self.modelo = modelo.copiar()
+        self.generacion = generacion
+        self.creado = time.time()
+        self.npallets = sorted(self.modelo.ubicacion_pallet)
+        self.por_id = {
+            pallet.id_pallet: pallet
+            for carril in self.modelo.carriles.values()
+            for pallet in carril.pallets
+        }
+        self._lock = threading.Lock()
+
+    def buscar(self, texto, limite=LIMITE_RESULTADOS):
+        """
+        Retorna hasta `limite` pallets cuyo NPallet comienza con el texto y, si faltan, que lo contienen.
+        """
+        texto = (texto or "").strip()
+        if not texto:
+            return []
+        with self._lock:
+            inicio = bisect.bisect_left(self.npallets, texto)
+            encontrados = []
+            for npallet in itertools.islice(self.npallets, inicio, None):
+                if not npallet.startswith(texto) or len(encontrados) >= limite:
+                    break
+                encontrados.append(npallet)
+
+            if len(encontrados) < limite:
+                vistos = set(encontrados)
+                for npallet in self.npallets:
+                    if texto in npallet and npallet not in vistos:
+                        encontrados.append(npallet)
+                        if len(encontrados) >= limite:
+                            break
+
+            return [self._detalle(npallet) for npallet in encontrados]
+
+    def _detalle(self, npallet):
+        clave, posicion = self.modelo.posicion(npallet)
+        carril = self.modelo.carriles[clave]
+        pallet = carril.pallets[posicion - 1]
+        return {
+            "npallet": npallet,
+            "id_pallet": pallet.id_pallet,
+            "variedad": pallet.variedad,
+            "mercado": pallet.mercado,
+            "fecha_faena": pallet.fecha_faena,
+            "tipo_almacen": clave[0],
+            "piso": clave[1],
+            "rack": clave[2],
+            "letra": clave[3],
+            "posicion_pallet": posicion,
+            "profundidad": carril.profundidad,
+            "ocupados": len(carril.pallets),
+            "bloqueantes": [p.npallet for p in carril.pallets[:posicion - 1]],
+        }
+
+    def aplicar(self, movimientos):
+        """
+        Aplica movimientos (tipo_movimiento, id_pallet, destino, pallet) ya confirmados en la base de datos.
+
+        Un pallet que el índice no conocía se agrega con los datos del movimiento.
+        Retorna False si algún movimiento no se puede reflejar (pallet o carril
+        desconocidos); en ese caso el índice debe reconstruirse.
+        """
+        with self._lock:
+            for tipo_movimiento, id_pallet, destino, pallet in movimientos:
+                if tipo_movimiento == "ingreso":
+                    # Un pallet recién ingresado aún no tiene ubicación
+                    continue
+                pallet = self.por_id.get(id_pallet) or (pallet if tipo_movimiento == "asignacion" else None)
+                if pallet is None:
+                    return False
+                if tipo_movimiento == "retiro":
+                    if self.modelo.quitar(pallet.npallet) is None:
+                        return False
+                    self._quitar_npallet(pallet.npallet)
+                elif tipo_movimiento == "asignacion":
+                    destino = tuple(destino)
+                    carril = self.modelo.carriles.get(destino)
+                    if carril is None or carril.lleno or pallet.npallet in self.modelo.ubicacion_pallet:
+                        return False
+                    self.modelo.ingresar(destino, pallet)
+                    self.por_id[pallet.id_pallet] = pallet
+                    bisect.insort(self.npallets, pallet.npallet)
+                else:
+                    return False
+            return True
+
+    def _quitar_npallet(self, npallet):
+        i = bisect.bisect_left(self.npallets, npallet)
+        if i < len(self.npallets) and self.npallets[i] == npallet:
+            del self.npallets[i]
@@ -0,0 +1,510 @@
+# cache_almacen.py
+
+import bisect
+import copy
+import hashlib
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import cache_compartido
+import series_ocupacion
+import sitios
+from busqueda_pallets import IndiceNPallet
+from circuito_bd import circuito
+from cubo_stock import CuboStock
+from conexion_bd import (
+    obtener_firma_datos,
+    obtener_id_pallet,
+    obtener_todas_las_posiciones,
+    suscribir_cambios_datos,
+    suscribir_movimientos,
+)
+from indices_filtro import IndiceFiltros
+from ledger import asegurar_snapshot_periodico
+from lista_picking import IndicePicking
+from modelo_almacen import ModeloAlmacen
+
+
+# Segundos que se reutiliza un snapshot aunque no haya escrituras registradas.
+# Cubre cambios hechos en la base de datos fuera de la aplicación.
+TTL_SNAPSHOT = 30
+
+# Cantidad máxima de NPallet que se envían al dropdown por cada búsqueda
+LIMITE_BUSQUEDA_NPALLET = 50
+
+# Refresco en segundo plano: cada cuántos segundos se revisa si cambiaron los datos
+# (0 desactiva el hilo) y cada cuántos se reconstruye el snapshot de todas formas.
+INTERVALO_REFRESCO = float(os.getenv("SNAPSHOT_REFRESCO_SEGUNDOS", "0"))
+INTERVALO_RECONSTRUCCION = float(os.getenv("SNAPSHOT_RECONSTRUCCION_SEGUNDOS", "60"))
+
+# Cada cuántos segundos se guarda un snapshot de ocupación en el ledger (0 lo desactiva)
+INTERVALO_SNAPSHOT_LEDGER = float(os.getenv("LEDGER_SNAPSHOT_SEGUNDOS", "3600"))
+
+# NPallet -> id_pallet que recuerda cada proceso por sitio; los menos usados se descartan
+MAXIMO_NPALLET_CACHE = int(os.getenv("NPALLET_CACHE_MAXIMO", "20000"))
+
+
+class SnapshotAlmacen:
+    """
+    Vista inmutable de todas las posiciones del almacén y sus índices de filtro.
+
+    `version` es la generación compartida (cache_compartido) de la que provienen los datos.
+    `obsoleto` indica que no se pudo leer la base de datos y se está sirviendo el último snapshot bueno.
+    """
+
+    def __init__(self, version, posiciones, firma=None, creado=None):
+        self.version = version
+        self.firma = firma
+        self.posiciones = [tuple(fila) for fila in posiciones]
+        self.indice = IndiceFiltros(self.posiciones)
+        self.creado = time.time() if creado is None else creado
+        self.obsoleto = False
+        self._modelo = None
+        self._indice_picking = None
+        self._token_datos = None
+        self._derivados = {}
+
+        # Índice de ubicaciones libres (tipo_almacen, piso, rack, letra)
+        self.libres = sorted(set(fila[:4] for fila in self.posiciones if fila[5] == "Libre"))
+
+        # Valores distintos por campo; son las llaves de los bitmaps del índice
+        self.opciones = {
+            campo: sorted(bitmaps) for campo, bitmaps in self.indice.bitmaps.items()
+        }
+        # Huella de las opciones, igual en todos los workers para los mismos datos
+        self.token_opciones = hashlib.sha1(
+            repr(sorted(self.opciones.items())).encode()
+        ).hexdigest()
+
+    def como_obsoleto(self):
+        """
+        Copia del snapshot marcada como obsoleta; comparte los índices ya construidos.
+        """
+        if self.obsoleto:
+            return self
+        obsoleto = copy.copy(self)
+        obsoleto.obsoleto = True
+        return obsoleto
+
+    def token_datos(self):
+        """
+        Huella de todas las posiciones, igual en todos los workers para los mismos datos.
+        """
+        if self._token_datos is None:
+            self._token_datos = hashlib.sha1(repr(self.posiciones).encode()).hexdigest()
+        return self._token_datos
+
+    def buscar_npallets(self, texto, limite=LIMITE_BUSQUEDA_NPALLET):
+        """
+        Busca NPallet que comienzan con el texto dado y, si faltan resultados, que lo contienen.
+        """
+        npallets = self.opciones["NPallet"]
+        texto = (texto or "").strip()
+        if not texto:
+            return npallets[:limite]
+
+        inicio = bisect.bisect_left(npallets, texto)
+        resultados = []
+        for npallet in itertools.islice(npallets, inicio, None):
+            if not npallet.startswith(texto) or len(resultados) >= limite:
+                break
+            resultados.append(npallet)
+
+        if len(resultados) < limite:
+            encontrados = set(resultados)
+            for npallet in npallets:
+                if texto in npallet and npallet not in encontrados:
+                    resultados.append(npallet)
+                    if len(resultados) >= limite:
+                        break
+        return resultados
+
+    def modelo(self):
+        """
+        Modelo en memoria de los carriles; se construye en el primer uso y no debe modificarse.
+        """
+        if self._modelo is None:
+            self._modelo = ModeloAlmacen.desde_posiciones(self.posiciones)
+        return self._modelo
+
+    def indice_picking(self):
+        """
+        Índice FEFO por (Variedad, Mercado) para generar listas de picking.
+        """
+        if self._indice_picking is None:
+            self._indice_picking = IndicePicking(self.modelo())
+        return self._indice_picking
+
+    def derivado(self, nombre, funcion):
+        """
+        Retorna un cálculo derivado del modelo, hecho una sola vez por snapshot.
+        """
+        if nombre not in self._derivados:
+            self._derivados[nombre] = funcion(self.modelo())
+        return self._derivados[nombre]
+
+    def opciones_disponibles(self, tipo_almacen=None, piso=None, rack=None, letra=None):
+        """
+        Equivalente en memoria de obtener_opciones_disponibles sobre el índice de ubicaciones libres.
+        """
+        libres = [
+            fila for fila in self.libres
+            if (not tipo_almacen or fila[0] == tipo_almacen)
+            and (not piso or fila[1] == piso)
+            and (not rack or fila[2] == rack)
+            and (not letra or fila[3] == letra)
+        ]
+        tipos_almacen = sorted(set(fila[0] for fila in libres))
+        pisos = sorted(set(fila[1] for fila in libres if fila[1]))
+        racks = sorted(set(fila[2] for fila in libres if fila[2]))
+        letras = sorted(set(fila[3] for fila in libres if fila[3]))
+        return tipos_almacen, pisos, racks, letras
+
+
+class EstadoSitio:
+    """
+    Snapshot publicado, hilo de refresco y vistas incrementales de un sitio en este proceso.
+
+    Cada sitio reconstruye su snapshot bajo su propio lock, por lo que la recarga
+    lenta o frecuente de un sitio no bloquea a los lectores de otro.
+    """
+
+    def __init__(self, sitio):
+        self.sitio = sitio
+        self.snapshot = None
+        self.refresco = None
+        self.muestreo = None
+        # Evita que varios hilos reconstruyan el mismo snapshot a la vez
+        self.lock_carga = threading.Lock()
+        self.busqueda = VistaIncremental(lambda snapshot: IndiceNPallet(snapshot.modelo(), snapshot.version))
+        self.cubo = VistaIncremental(lambda snapshot: CuboStock(snapshot.modelo(), snapshot.version))
+        self.id_pallets = OrderedDict()
+        self.lock_id_pallets = threading.Lock()
+
+
+_estados = {}
+_lock_estados = threading.Lock()
+
+
+def estado_sitio(sitio=None):
+    """
+    Retorna el EstadoSitio del sitio indicado o del sitio actual.
+    """
+    sitio = sitio or sitios.sitio_actual()
+    estado = _estados.get(sitio)
+    if estado is None:
+        with _lock_estados:
+            estado = _estados.get(sitio)
+            if estado is None:
+                estado = _estados[sitio] = EstadoSitio(sitio)
+    return estado
+
+
+def obtener_snapshot(ttl=TTL_SNAPSHOT):
+    """
+    Retorna el snapshot vigente del almacén del sitio actual.
+
+    Si el refresco en segundo plano está activo se lee el último snapshot publicado
+    sin bloquear. En caso contrario se reconstruye solo si cambió la versión de los
+    datos o si el snapshot tiene más de `ttl` segundos.
+
+    Si la base de datos no responde se retorna el último snapshot bueno marcado como
+    obsoleto; solo se propaga el error si todavía no hay ninguno.
+    """
+    estado = estado_sitio()
+    snapshot = estado.snapshot
+    if estado.refresco is not None and estado.refresco.is_alive() and snapshot is not None:
+        return snapshot
+
+    generacion = cache_compartido.generacion()
+    if _snapshot_vigente(snapshot, generacion, ttl):
+        return snapshot
+
+    with estado.lock_carga:
+        # Otro hilo pudo haberlo reconstruido mientras se esperaba el lock
+        snapshot = estado.snapshot
+        if not _snapshot_vigente(snapshot, generacion, ttl):
+            try:
+                snapshot = _cargar_snapshot(generacion, ttl)
+            except Exception as e:
+                circuito.registrar_error(e)
+                if snapshot is None:
+                    raise
+                print(f"Error al recargar el snapshot del almacén, se sirven datos obsoletos: {e}")
+                snapshot = snapshot.como_obsoleto()
+            estado.snapshot = snapshot
+    return snapshot
+
+
+def snapshot_publicado(sitio=None):
+    """
+    Retorna el último snapshot publicado del sitio en el proceso sin recargarlo; None si aún no hay.
+    """
+    return estado_sitio(sitio).snapshot
+
+
+def _snapshot_vigente(snapshot, generacion, ttl):
+    return (
+        snapshot is not None
+        and snapshot.version == generacion
+        and time.time() - snapshot.creado <= ttl
+    )
+
+
+def _cargar_snapshot(generacion, ttl, firma=None):
+    """
+    Toma el snapshot publicado por otro worker para la misma generación o lo construye desde la base de datos.
+    """
+    compartido = cache_compartido.obtener("posiciones", generacion)
+    if compartido is not None:
+        posiciones, firma_compartida, creado = compartido
+        if time.time() - creado <= ttl and (firma is None or firma == firma_compartida):
+            return SnapshotAlmacen(generacion, posiciones, firma_compartida, creado)
+
+    snapshot = SnapshotAlmacen(generacion, obtener_todas_las_posiciones(), firma)
+    cache_compartido.guardar("posiciones", (snapshot.posiciones, firma, snapshot.creado), generacion)
+    _muestrear_ocupacion(snapshot)
+    return snapshot
+
+
+def _muestrear_ocupacion(snapshot):
+    try:
+        series_ocupacion.muestrear(snapshot.posiciones)
+    except OSError as e:
+        print(f"Error al registrar la serie de ocupación: {e}")
+
+
+class VistaIncremental:
+    """
+    Estructura derivada del snapshot que las escrituras de este proceso actualizan en el lugar.
+
+    `construir(snapshot)` crea la estructura, que debe tener los atributos `generacion`
+    y `creado` y el método `aplicar(movimientos)`. Se reconstruye desde el snapshot
+    cuando otro worker cambió la generación compartida o cuando pasaron TTL_SNAPSHOT
+    segundos.
+    """
+
+    def __init__(self, construir):
+        self.construir = construir
+        self._actual = None
+        self._base = None
+
+    def obtener(self):
+        actual = self._actual
+        generacion = cache_compartido.generacion()
+        if actual is not None and actual.generacion == generacion and time.time() - actual.creado <= TTL_SNAPSHOT:
+            return actual
+
+        snapshot = obtener_snapshot()
+        if actual is not None and snapshot is self._base:
+            # El snapshot vigente es el mismo del que se construyó la estructura
+            return actual
+        actual = self.construir(snapshot)
+        self._actual, self._base = actual, snapshot
+        return actual
+
+    def aplicar_movimientos(self, movimientos):
+        """
+        Refleja los movimientos recién escritos por este proceso; si no se puede, descarta la estructura.
+        """
+        actual = self._actual
+        if actual is None:
+            return
+        generacion = cache_compartido.generacion()
+        # Solo si la única escritura desde que se construyó la estructura es esta
+        if movimientos is None or generacion != actual.generacion + 1 or not actual.aplicar(movimientos):
+            self._actual = None
+            return
+        actual.generacion = generacion
+
+
+def indice_busqueda():
+    """
+    Retorna el índice de búsqueda de pallets del sitio actual en el proceso.
+    """
+    return estado_sitio().busqueda.obtener()
+
+
+def cubo_stock():
+    """
+    Retorna el cubo de stock por rack, variedad, mercado y fecha de faena del sitio actual en el proceso.
+    """
+    return estado_sitio().cubo.obtener()
+
+
+def _aplicar_movimientos(movimientos):
+    estado = estado_sitio()
+    estado.busqueda.aplicar_movimientos(movimientos)
+    estado.cubo.aplicar_movimientos(movimientos)
+
+
+def buscar_id_pallet(n_pallet):
+    """
+    Retorna el id_pallet de un NPallet usando un cache LRU acotado del sitio; None si no existe.
+    """
+    estado = estado_sitio()
+    with estado.lock_id_pallets:
+        id_pallet = estado.id_pallets.get(n_pallet)
+        if id_pallet is not None:
+            estado.id_pallets.move_to_end(n_pallet)
+            return id_pallet
+    id_pallet = obtener_id_pallet(n_pallet)
+    if id_pallet is not None:
+        # La relación NPallet -> id_pallet no cambia, por lo que no caduca; solo se
+        # acota la cantidad de entradas (cada pallet ingresado agrega una)
+        with estado.lock_id_pallets:
+            estado.id_pallets[n_pallet] = id_pallet
+            estado.id_pallets.move_to_end(n_pallet)
+            while len(estado.id_pallets) > MAXIMO_NPALLET_CACHE:
+                estado.id_pallets.popitem(last=False)
+    return id_pallet
+
+
+class RefrescoSnapshot(threading.Thread):
+    """
+    Hilo que mantiene publicado el snapshot de un sitio para todos los callbacks del proceso.
+
+    Revisa la firma de los datos cada `intervalo` segundos y reconstruye el snapshot
+    cuando cambia, cuando otro worker invalidó la generación compartida o cuando
+    pasaron `reconstruccion` segundos. El snapshot se publica reemplazando la referencia
+    del EstadoSitio, por lo que los lectores nunca toman un lock. Hay un hilo por
+    sitio: un sitio con la base de datos lenta no atrasa el refresco de los demás.
+    """
+
+    def __init__(self, estado, intervalo, reconstruccion):
+        super().__init__(name=f"refresco-snapshot-{estado.sitio}", daemon=True)
+        self.estado = estado
+        self.intervalo = intervalo
+        self.reconstruccion = reconstruccion
+        self.despertar = threading.Event()
+        self.detener = threading.Event()
+
+    def refrescar(self):
+        actual = self.estado.snapshot
+        generacion = cache_compartido.generacion()
+        firma = obtener_firma_datos()
+        if actual is not None and actual.version == generacion and actual.firma not in (None, firma):
+            # Cambio hecho fuera de la aplicación: se avisa al resto de los workers
+            generacion = cache_compartido.invalidar()
+        if (
+            actual is None
+            or actual.obsoleto
+            or actual.version != generacion
+            or actual.firma != firma
+            or time.time() - actual.creado > self.reconstruccion
+        ):
+            self.estado.snapshot = _cargar_snapshot(generacion, self.reconstruccion, firma)
+
+    def run(self):
+        with sitios.en_sitio(self.estado.sitio):
+            self._ciclo()
+
+    def _ciclo(self):
+        estado = self.estado
+        while not self.detener.is_set():
+            try:
+                self.refrescar()
+            except Exception as e:
+                # Se mantiene el último snapshot bueno y se reintenta en el próximo ciclo
+                print(f"Error al refrescar el snapshot del almacén ({estado.sitio}): {e}")
+                circuito.registrar_error(e)
+                if estado.snapshot is not None:
+                    estado.snapshot = estado.snapshot.como_obsoleto()
+            if estado.snapshot is not None and not estado.snapshot.obsoleto:
+                _muestrear_ocupacion(estado.snapshot)
+            try:
+                asegurar_snapshot_periodico(INTERVALO_SNAPSHOT_LEDGER)
+            except Exception as e:
+                print(f"Error al guardar el snapshot del ledger ({estado.sitio}): {e}")
+            self.despertar.wait(self.intervalo)
+            self.despertar.clear()
+
+
+class MuestreoOcupacion(threading.Thread):
+    """
+    Hilo que registra la ocupación de un sitio cada `intervalo` segundos aunque nadie tenga una página abierta.
+
+    Solo se usa con el refresco del snapshot desactivado; el hilo de refresco ya
+    muestrea en cada ciclo. Toma el snapshot con obtener_snapshot(), por lo que
+    reutiliza el vigente y solo consulta la base de datos cuando caducó.
+    """
+
+    def __init__(self, sitio, intervalo):
+        super().__init__(name=f"muestreo-ocupacion-{sitio}", daemon=True)
+        self.sitio = sitio
+        self.intervalo = intervalo
+        self.detener = threading.Event()
+
+    def run(self):
+        with sitios.en_sitio(self.sitio):
+            while not self.detener.is_set():
+                try:
+                    snapshot = obtener_snapshot()
+                except Exception as e:
+                    print(f"Error al muestrear la ocupación ({self.sitio}): {e}")
+                else:
+                    if not snapshot.obsoleto:
+                        _muestrear_ocupacion(snapshot)
+                self.detener.wait(self.intervalo)
+
+
+def iniciar_muestreo_ocupacion(intervalo=None):
+    """
+    Inicia en este proceso un hilo de muestreo de ocupación por sitio si las series están activas.
+    Retorna la lista de hilos.
+    """
+    intervalo = series_ocupacion.INTERVALO_MUESTREO if intervalo is None else intervalo
+    if intervalo <= 0:
+        return []
+
+    hilos = []
+    for sitio in sitios.SITIOS:
+        estado = estado_sitio(sitio)
+        if estado.muestreo is None or not estado.muestreo.is_alive():
+            estado.muestreo = MuestreoOcupacion(sitio, intervalo)
+            estado.muestreo.start()
+        hilos.append(estado.muestreo)
+    return hilos
+
+
+def iniciar_refresco_snapshot(intervalo=None, reconstruccion=None):
+    """
+    Inicia en este proceso un hilo de refresco del snapshot por sitio si está configurado.
+    Retorna la lista de hilos (vacía si el refresco está desactivado).
+
+    Sin refresco, las series de ocupación se muestrean con iniciar_muestreo_ocupacion
+    para que no dependan de que alguien consulte el almacén.
+    """
+    intervalo = INTERVALO_REFRESCO if intervalo is None else intervalo
+    reconstruccion = INTERVALO_RECONSTRUCCION if reconstruccion is None else reconstruccion
+    if intervalo <= 0:
+        iniciar_muestreo_ocupacion()
+        return []
+
+    hilos = []
+    for sitio in sitios.SITIOS:
+        estado = estado_sitio(sitio)
+        if estado.refresco is None or not estado.refresco.is_alive():
+            estado.refresco = RefrescoSnapshot(estado, intervalo, reconstruccion)
+            estado.refresco.start()
+        hilos.append(estado.refresco)
+    return hilos
+
+
+def solicitar_refresco():
+    """
+    Despierta al hilo de refresco del sitio actual para que publique los cambios recién escritos.
+    """
+    refresco = estado_sitio().refresco
+    if refresco is not None:
+        refresco.despertar.set()
+
+
+# Primero se invalida la generación compartida y luego se despierta el refresco local;
+# las escrituras notifican en su propio contexto, por lo que solo se toca su sitio
+suscribir_cambios_datos(cache_compartido.invalidar)
+suscribir_cambios_datos(solicitar_refresco)
+suscribir_movimientos(_aplicar_movimientos)
@@ -0,0 +1,221 @@
+# cache_compartido.py
+
+import fcntl
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+
+import sitios
+
+
+# Backend del cache compartido entre workers: "memoria", "compartido" o "redis".
+# "memoria" es local al proceso y solo sirve con un worker; gunicorn.conf.py usa
+# "compartido" cuando hay varios.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memoria")
+
+# Directorio del backend "compartido"; /dev/shm es memoria compartida en Linux
+CACHE_DIR_COMPARTIDO = os.getenv(
+    "CACHE_DIR_COMPARTIDO",
+    "/dev/shm/almacen_cache" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "almacen_cache"),
+)
+
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+
+class BackendMemoria:
+    """
+    Backend en memoria del proceso. Sirve como reemplazo local y para un solo worker.
+    """
+
+    def __init__(self):
+        self._datos = {}
+        self._generaciones = {}
+        self._lock = threading.Lock()
+
+    def generacion(self, espacio=""):
+        return self._generaciones.get(espacio, 0)
+
+    def incrementar_generacion(self, espacio=""):
+        with self._lock:
+            self._generaciones[espacio] = self._generaciones.get(espacio, 0) + 1
+            return self._generaciones[espacio]
+
+    def obtener(self, clave):
+        return self._datos.get(clave)
+
+    def guardar(self, clave, valor):
+        self._datos[clave] = valor
+
+
+class BackendArchivoCompartido:
+    """
+    Backend compartido entre procesos de la misma máquina.
+
+    La generación de cada espacio vive en un archivo mapeado en memoria (mmap) y cada
+    valor en un archivo propio que se reemplaza de forma atómica con os.replace.
+    """
+
+    def __init__(self, directorio=CACHE_DIR_COMPARTIDO):
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._generaciones = {}
+        self._lock = threading.Lock()
+        self._generacion_espacio("")
+
+    def _generacion_espacio(self, espacio):
+        """(descriptor, mapa) del archivo de generación de un espacio, abierto en el primer uso."""
+        abierto = self._generaciones.get(espacio)
+        if abierto is None:
+            with self._lock:
+                abierto = self._generaciones.get(espacio)
+                if abierto is None:
+                    nombre = "generacion" + (f"_{espacio}" if espacio else "")
+                    fd = os.open(os.path.join(self.directorio, nombre), os.O_RDWR | os.O_CREAT, 0o600)
+                    if os.fstat(fd).st_size < 8:
+                        os.ftruncate(fd, 8)
+                    abierto = (fd, mmap.mmap(fd, 8))
+                    self._generaciones[espacio] = abierto
+        return abierto
+
+    def generacion(self, espacio=""):
+        return struct.unpack_from("<Q", self._generacion_espacio(espacio)[1], 0)[0]
+
+    def incrementar_generacion(self, espacio=""):
+        fd, mapa = self._generacion_espacio(espacio)
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            generacion = struct.unpack_from("<Q", mapa, 0)[0] + 1
+            struct.pack_into("<Q", mapa, 0, generacion)
+            return generacion
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def _ruta(self, clave):
+        return os.path.join(self.directorio, "v_" + clave.replace(os.sep, "_"))
+
+    def obtener(self, clave):
+        try:
+            with open(self._ruta(clave), "rb") as archivo:
+                return archivo.read()
+        except FileNotFoundError:
+            return None
+
+    def guardar(self, clave, valor):
+        fd, temporal = tempfile.mkstemp(dir=self.directorio)
+        with os.fdopen(fd, "wb") as archivo:
+            archivo.write(valor)
+        os.replace(temporal, self._ruta(clave))
+
+
+class BackendRedis:
+    """
+    Backend sobre un servidor compatible con Redis (requiere el paquete redis).
+    """
+
+    def __init__(self, url=CACHE_REDIS_URL):
+        import redis
+
+        self._cliente = redis.Redis.from_url(url)
+
+    def _clave_generacion(self, espacio):
+        return f"almacen:{espacio}:generacion" if espacio else "almacen:generacion"
+
+    def generacion(self, espacio=""):
+        return int(self._cliente.get(self._clave_generacion(espacio)) or 0)
+
+    def incrementar_generacion(self, espacio=""):
+        return self._cliente.incr(self._clave_generacion(espacio))
+
+    def obtener(self, clave):
+        return self._cliente.get("almacen:" + clave)
+
+    def guardar(self, clave, valor):
+        self._cliente.set("almacen:" + clave, valor)
+
+
+_BACKENDS = {
+    "memoria": BackendMemoria,
+    "compartido": BackendArchivoCompartido,
+    "redis": BackendRedis,
+}
+
+_backend = None
+_lock_backend = threading.Lock()
+
+
+def obtener_backend():
+    """
+    Retorna el backend configurado en CACHE_BACKEND, creándolo en el primer uso.
+    """
+    global _backend
+    if _backend is None:
+        with _lock_backend:
+            if _backend is None:
+                try:
+                    _backend = _BACKENDS[CACHE_BACKEND]()
+                except Exception as e:
+                    print(f"Error al iniciar el backend de cache '{CACHE_BACKEND}', se usa memoria: {e}")
+                    _backend = BackendMemoria()
+    return _backend
+
+
+def configurar_backend(backend):
+    """
+    Reemplaza el backend en uso (por ejemplo, por uno en memoria en herramientas locales).
+    """
+    global _backend
+    _backend = backend
+
+
+def _espacio():
+    """
+    Espacio de claves del sitio actual; el sitio predeterminado usa las claves sin prefijo.
+    """
+    return "" if sitios.es_predeterminado() else sitios.sitio_actual()
+
+
+def _clave(clave):
+    espacio = _espacio()
+    return f"{espacio}:{clave}" if espacio else clave
+
+
+def generacion():
+    """
+    Retorna la generación compartida de los datos del sitio actual; cambia con cada escritura en cualquier worker.
+    """
+    return obtener_backend().generacion(_espacio())
+
+
+def invalidar():
+    """
+    Invalida las entradas del sitio actual en todos los workers incrementando su generación compartida.
+    """
+    return obtener_backend().incrementar_generacion(_espacio())
+
+
+def obtener(clave, generacion_requerida=None):
+    """
+    Retorna el valor guardado en la clave del sitio actual, o None si no existe o es de otra generación.
+    """
+    crudo = obtener_backend().obtener(_clave(clave))
+    if crudo is None:
+        return None
+    generacion_valor, valor = pickle.loads(crudo) if isinstance(crudo, bytes) else crudo
+    if generacion_requerida is not None and generacion_valor != generacion_requerida:
+        return None
+    return valor
+
+
+def guardar(clave, valor, generacion_valor=None):
+    """
+    Guarda un valor del sitio actual asociado a una generación (None para valores que no caducan).
+    """
+    backend = obtener_backend()
+    clave = _clave(clave)
+    if isinstance(backend, BackendMemoria):
+        backend.guardar(clave, (generacion_valor, valor))
+    else:
+        backend.guardar(clave, pickle.dumps((generacion_valor, valor), protocol=pickle.HIGHEST_PROTOCOL))
@@ -0,0 +1,128 @@
+# circuito_bd.py
+
+import os
+import threading
+import time
+
+import sitios
+
+
+# Fallos consecutivos de la base de datos que abren el circuito
+FALLOS_PARA_ABRIR = int(os.getenv("BD_FALLOS_PARA_ABRIR", "3"))
+
+# Segundos que el circuito permanece abierto antes de dejar pasar una llamada de prueba
+SEGUNDOS_ABIERTO = float(os.getenv("BD_SEGUNDOS_CIRCUITO_ABIERTO", "30"))
+
+# SQLSTATE de errores que indican que la base de datos no responde (timeouts y conexión)
+_SQLSTATE_INDISPONIBLE = ("HYT00", "HYT01", "08")
+
+
+class CircuitoAbierto(ConnectionError):
+    """
+    La base de datos falló repetidamente; la llamada se rechaza sin intentar conectar.
+    """
+
+
+class CircuitoBD:
+    """
+    Circuit breaker de la base de datos, por proceso y sitio.
+
+    cerrado: las llamadas pasan y se cuentan los fallos consecutivos.
+    abierto: las llamadas se rechazan de inmediato durante `segundos_abierto`.
+    semiabierto: pasa una sola llamada de prueba; si funciona el circuito se cierra,
+    si falla vuelve a abrirse.
+    """
+
+    def __init__(self, fallos_para_abrir=FALLOS_PARA_ABRIR, segundos_abierto=SEGUNDOS_ABIERTO):
+        self.fallos_para_abrir = fallos_para_abrir
+        self.segundos_abierto = segundos_abierto
+        self.fallos = 0
+        self.abierto_desde = None
+        self.ultimo_error = None
+        self._prueba_en_curso = False
+        self._lock = threading.Lock()
+
+    @property
+    def estado(self):
+        if self.abierto_desde is None:
+            return "cerrado"
+        if time.monotonic() - self.abierto_desde < self.segundos_abierto:
+            return "abierto"
+        return "semiabierto"
+
+    def verificar(self):
+        """
+        Lanza CircuitoAbierto si la llamada no debe intentarse.
+        """
+        with self._lock:
+            estado = self.estado
+            if estado == "cerrado":
+                return
+            if estado == "semiabierto" and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return
+        raise CircuitoAbierto(f"Base de datos no disponible, reintentando en unos segundos ({self.ultimo_error}).")
+
+    def registrar_exito(self):
+        with self._lock:
+            self.fallos = 0
+            self.abierto_desde = None
+            self._prueba_en_curso = False
+
+    def registrar_fallo(self, error):
+        with self._lock:
+            self.fallos += 1
+            self.ultimo_error = str(error)
+            if self._prueba_en_curso or self.fallos >= self.fallos_para_abrir:
+                self.abierto_desde = time.monotonic()
+            self._prueba_en_curso = False
+
+    def registrar_error(self, error):
+        """
+        Cuenta como fallo un error de consulta solo si indica que la base de datos no responde.
+        Los errores de conexión ya los registra conectar_bd.
+        """
+        sqlstate = error.args[0] if getattr(error, "args", None) else ""
+        if isinstance(sqlstate, str) and sqlstate.startswith(_SQLSTATE_INDISPONIBLE):
+            self.registrar_fallo(error)
+
+    def resumen(self):
+        return {
+            "estado": self.estado,
+            "fallos_consecutivos": self.fallos,
+            "ultimo_error": self.ultimo_error,
+        }
+
+
+_circuitos = {}
+_lock_circuitos = threading.Lock()
+
+
+def circuito_sitio(sitio, destino="primario"):
+    """
+    Retorna el circuito de un sitio hacia su "primario" o su "replica"; cada sitio falla por separado.
+    """
+    clave = (sitio, destino)
+    circuito_destino = _circuitos.get(clave)
+    if circuito_destino is None:
+        with _lock_circuitos:
+            circuito_destino = _circuitos.setdefault(clave, CircuitoBD())
+    return circuito_destino
+
+
+class CircuitoSitioActual:
+    """
+    Circuito del sitio actual (ver sitios.py), con la misma interfaz que CircuitoBD.
+    """
+
+    def __init__(self, destino):
+        self.destino = destino
+
+    def __getattr__(self, nombre):
+        return getattr(circuito_sitio(sitios.sitio_actual(), self.destino), nombre)
+
+
+circuito = CircuitoSitioActual("primario")
+
+# Circuito independiente para la réplica de lectura: si falla, las lecturas vuelven al primario
+circuito_replica = CircuitoSitioActual("replica")
@@ -0,0 +1,112 @@
+# compactacion.py
+
+from recomendador import puntaje_carril
+
+
+# Cantidad máxima de movimientos que propone un plan de compactación
+MAXIMO_MOVIMIENTOS = 30
+
+
+def fragmentacion_por_rack(modelo):
+    """
+    Calcula la fragmentación por (tipo_almacen, piso, rack).
+
+    Un espacio libre en un carril parcialmente ocupado solo sirve para pallets que
+    no bloqueen a los que ya están, por eso se considera fragmentado. Retorna una
+    lista de diccionarios ordenada de más a menos fragmentado.
+    """
+    grupos = {}
+    for clave, carril in modelo.carriles.items():
+        grupo = grupos.setdefault(clave[:3], {"carriles": 0, "parciales": 0, "vacios": 0, "libres": 0, "libres_parciales": 0})
+        grupo["carriles"] += 1
+        grupo["libres"] += carril.libres
+        if carril.vacio:
+            grupo["vacios"] += 1
+        elif not carril.lleno:
+            grupo["parciales"] += 1
+            grupo["libres_parciales"] += carril.libres
+
+    resultado = []
+    for (tipo_almacen, piso, rack), grupo in grupos.items():
+        fragmentacion = grupo["libres_parciales"] / grupo["libres"] if grupo["libres"] else 0.0
+        resultado.append(dict(grupo, tipo_almacen=tipo_almacen, piso=piso, rack=rack, fragmentacion=fragmentacion))
+    resultado.sort(key=lambda g: (-g["fragmentacion"], str(g["tipo_almacen"]), g["piso"] or 0, g["rack"] or 0))
+    return resultado
+
+
+def _destino_sin_bloqueo(modelo, pallet, excluidos):
+    """
+    Busca un carril parcial donde el pallet no bloquee a ningún otro; None si no existe.
+    """
+    mejor = None
+    for clave, carril in modelo.carriles.items():
+        if clave in excluidos or carril.vacio or carril.lleno:
+            continue
+        puntaje = puntaje_carril(carril, pallet)
+        # Un puntaje positivo significa que algún pallet quedaría bloqueado
+        if puntaje > 0:
+            continue
+        candidato = (puntaje, str(clave), clave)
+        if mejor is None or candidato < mejor:
+            mejor = candidato
+    return mejor[-1] if mejor else None
+
+
+def planificar_compactacion(modelo, maximo_movimientos=MAXIMO_MOVIMIENTOS):
+    """
+    Propone movimientos de consolidación que liberan carriles completos.
+
+    Los carriles parciales se evalúan de mayor a menor ganancia por movimiento
+    (profundidad liberada / pallets a mover). Un carril solo se incluye si todos sus
+    pallets caben en otros carriles parciales sin bloquear pallets; en caso contrario
+    sus movimientos se deshacen. El modelo recibido no se modifica.
+
+    Retorna un diccionario con los pasos (formato de ejecutar_lote_movimientos), los
+    carriles liberados y la capacidad ganada en posiciones.
+    """
+    modelo = modelo.copiar()
+    parciales = [carril for carril in modelo.carriles.values() if not carril.vacio and not carril.lleno]
+    parciales.sort(key=lambda c: (-c.profundidad / len(c.pallets), str(c.clave)))
+
+    pasos = []
+    liberados = []
+    usados = set()
+    for carril in parciales:
+        if carril.clave in usados or carril.vacio:
+            continue
+        if len(pasos) + len(carril.pallets) > maximo_movimientos:
+            continue
+
+        movimientos = []
+        for pallet in list(carril.pallets):
+            destino = _destino_sin_bloqueo(modelo, pallet, {carril.clave})
+            if destino is None:
+                break
+            modelo.retirar(pallet.npallet)
+            modelo.ingresar(destino, pallet)
+            movimientos.append({
+                "accion": "reubicar",
+                "npallet": pallet.npallet,
+                "id_pallet": pallet.id_pallet,
+                "origen": carril.clave,
+                "destino": destino,
+            })
+
+        if not carril.vacio:
+            # Algún pallet no cupo: se deshacen los movimientos en orden inverso
+            for movimiento in reversed(movimientos):
+                pallet = modelo.retirar(movimiento["npallet"])
+                modelo.ingresar(carril.clave, pallet)
+            continue
+
+        pasos.extend(movimientos)
+        liberados.append(carril.clave)
+        # Ni el carril liberado ni los que recibieron pallets se usan como origen
+        usados.add(carril.clave)
+        usados.update(movimiento["destino"] for movimiento in movimientos)
+
+    return {
+        "pasos": pasos,
+        "carriles_liberados": liberados,
+        "capacidad_ganada": sum(modelo.carriles[clave].profundidad for clave in liberados),
+    }
@@ -1,28 +1,270 @@
 # conexion_bd.py
 
-import pyodbc
 import hashlib
-import dash_bootstrap_components as dbc
 import os
+import random
+import threading
+import time
+from datetime import datetime
 
+from circuito_bd import circuito_sitio
+from importacion_diferida import ModuloDiferido
+from modelo_almacen import PalletModelo, orden_fecha_faena
+from pool_conexiones import PoolConexiones
+from qr_pallet import validar_lote, validar_qr
+import sitios
+import trazas
 
-# Función para conectar a la base de datos
-def conectar_bd():
+# Se importan en el primer uso para no alargar el arranque de cada proceso
+pyodbc = ModuloDiferido("pyodbc")
+dbc = ModuloDiferido("dash_bootstrap_components")
+
+
+# Versión de los datos de ubicaciones y pallets de cada sitio vista por este proceso.
+# Se incrementa después de cada escritura exitosa para invalidar los caches.
+_version_datos = {}
+_lock_version = threading.Lock()
+
+# Funciones a notificar cuando cambian los datos (por ejemplo, refresco de caches)
+_suscriptores_cambio = []
+
+# Funciones que reciben los movimientos de cada escritura para actualizar índices en el lugar
+_suscriptores_movimientos = []
+
+
+def suscribir_cambios_datos(funcion):
+    """
+    Registra una función sin argumentos que se llama después de cada escritura exitosa.
+    """
+    if funcion not in _suscriptores_cambio:
+        _suscriptores_cambio.append(funcion)
+
+
+def suscribir_movimientos(funcion):
+    """
+    Registra una función que recibe la lista de movimientos (tipo_movimiento, id_pallet, destino, pallet)
+    de cada escritura, o None si la escritura no se puede describir como movimientos.
+    `pallet` es el PalletModelo leído en la misma transacción, o None si no existe.
+    Se llama después de los suscriptores de suscribir_cambios_datos.
+    """
+    if funcion not in _suscriptores_movimientos:
+        _suscriptores_movimientos.append(funcion)
+
+
+def marcar_cambio_datos(movimientos=None):
+    """
+    Registra que los datos de ubicaciones o pallets del sitio actual fueron modificados.
+
+    Los suscriptores se llaman en el contexto de la escritura, por lo que leen el
+    mismo sitio con sitios.sitio_actual().
+    """
+    sitio = sitios.sitio_actual()
+    with _lock_version:
+        _version_datos[sitio] = _version_datos.get(sitio, 0) + 1
+    for funcion in _suscriptores_cambio:
+        try:
+            funcion()
+        except Exception as e:
+            print(f"Error al notificar cambio de datos: {e}")
+    for funcion in _suscriptores_movimientos:
+        try:
+            funcion(movimientos)
+        except Exception as e:
+            print(f"Error al notificar movimientos: {e}")
+
+
+def obtener_version_datos():
+    """
+    Retorna la versión actual de los datos de ubicaciones y pallets del sitio actual.
+    """
+    return _version_datos.get(sitios.sitio_actual(), 0)
+
+
+# Segundos máximos para establecer la conexión y para cada consulta. Una base de datos
+# lenta produce un error (HYT00) en vez de dejar el hilo bloqueado.
+TIEMPO_CONEXION = int(os.getenv("BD_TIEMPO_CONEXION", "5"))
+TIEMPO_CONSULTA = int(os.getenv("BD_TIEMPO_CONSULTA", "30"))
+
+
+# Réplica de lectura opcional para dashboards y exportaciones, por sitio
+# (SQL_SERVER_LECTURA, ver sitios.py). Sin réplica todas las lecturas van al primario.
+
+# Atraso máximo tolerado de la réplica en segundos, medido con ledger_movimientos.
+# Con 0 la réplica solo se usa si tiene todos los movimientos del primario.
+DESFASE_MAXIMO_REPLICA = float(os.getenv("REPLICA_DESFASE_MAXIMO_SEGUNDOS", "5"))
+
+# Cada cuántos segundos se mide el atraso de la réplica (la medición consulta el
+# primario). Entre mediciones se usa la última, por lo que el atraso de los datos
+# leídos puede llegar a DESFASE_MAXIMO_REPLICA + INTERVALO_MEDICION_DESFASE.
+INTERVALO_MEDICION_DESFASE = float(os.getenv("REPLICA_MEDICION_SEGUNDOS", "1"))
+
+# Última medición por sitio: {sitio: (instante monotónico, desfase o None)}
+_desfases = {}
+_lock_desfases = threading.Lock()
+
+# Lecturas atendidas por cada destino en este proceso: {sitio: {"replica": n, "primario": n}}
+lecturas_por_destino = {}
+
+# Pools de conexiones del proceso por (sitio, destino)
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def _contar_lectura(destino):
+    lecturas = lecturas_por_destino.setdefault(sitios.sitio_actual(), {"replica": 0, "primario": 0})
+    lecturas[destino] += 1
+
+
+def _conectar(sitio, servidor, circuito_destino):
+    circuito_destino.verificar()
     try:
         conn = pyodbc.connect(
             f'DRIVER={{ODBC Driver 17 for SQL Server}};'
-            f'SERVER={os.getenv("SQL_SERVER")};'
-            f'DATABASE={os.getenv("SQL_DATABASE")};'
-            f'UID={os.getenv("SQL_USER")};'
-            f'PWD={os.getenv("SQL_PASSWORD")};'
+            f'SERVER={servidor};'
+            f'DATABASE={sitio.base_datos};'
+            f'UID={sitio.usuario};'
+            f'PWD={sitio.password};'
             'Encrypt=yes;'
-            'TrustServerCertificate=no;'
+            'TrustServerCertificate=no;',
+            timeout=TIEMPO_CONEXION,
         )
-        return conn
     except pyodbc.Error as e:
+        circuito_destino.registrar_fallo(e)
         raise ConnectionError(f"Error al conectar a la base de datos: {e}")
+    circuito_destino.registrar_exito()
+    conn.timeout = TIEMPO_CONSULTA
+    return conn
 
 
+def pool_sitio(destino="primario", sitio=None):
+    """
+    Retorna el pool de conexiones del sitio (el actual si no se indica) a su "primario" o su "replica".
+    """
+    configuracion = sitios.configuracion(sitio)
+    clave = (configuracion.nombre, destino)
+    pool = _pools.get(clave)
+    if pool is None:
+        with _lock_pools:
+            pool = _pools.get(clave)
+            if pool is None:
+                servidor = configuracion.servidor if destino == "primario" else configuracion.servidor_lectura
+                circuito_destino = circuito_sitio(configuracion.nombre, destino)
+                pool = PoolConexiones(lambda: _conectar(configuracion, servidor, circuito_destino), circuito_destino)
+                _pools[clave] = pool
+    return pool
+
+
+# Función para conectar a la base de datos
+def conectar_bd():
+    """
+    Presta una conexión al primario del sitio actual desde su pool.
+
+    Con el circuito abierto lanza CircuitoAbierto sin intentar conectar y con todas
+    las conexiones del sitio en uso lanza PoolAgotado; ambos son ConnectionError.
+    close() devuelve la conexión al pool.
+    """
+    return pool_sitio("primario").obtener()
+
+
+def conectar_replica():
+    """
+    Presta una conexión a la réplica de lectura del sitio actual (SQL_SERVER_LECTURA).
+    """
+    return pool_sitio("replica").obtener()
+
+
+def _como_fecha(valor):
+    return datetime.fromisoformat(valor) if isinstance(valor, str) else valor
+
+
+def desfase_replica(primario, replica):
+    """
+    Segundos de atraso de la réplica: antigüedad del primer movimiento del ledger que
+    aún no llegó a la réplica (0 si tiene todos).
+
+    Ambas fechas son del reloj del primario, el mismo que registra los movimientos;
+    el reloj del servidor de la aplicación no interviene.
+    """
+    cursor_replica = replica.cursor()
+    cursor_replica.execute("SELECT MAX(id_movimiento) FROM ledger_movimientos")
+    ultimo_replica = cursor_replica.fetchone()[0] or 0
+
+    cursor = primario.cursor()
+    cursor.execute(
+        "SELECT MIN(fecha_hora), SYSDATETIME() FROM ledger_movimientos WHERE id_movimiento > ?", (ultimo_replica,)
+    )
+    pendiente, ahora = cursor.fetchone()
+    if pendiente is None:
+        return 0.0
+    return max((_como_fecha(ahora) - _como_fecha(pendiente)).total_seconds(), 0.0)
+
+
+def _desfase_vigente(replica):
+    """
+    Atraso de la réplica del sitio actual, medido como máximo una vez por
+    INTERVALO_MEDICION_DESFASE en cada proceso; None si no se pudo medir.
+    """
+    sitio = sitios.sitio_actual()
+    with _lock_desfases:
+        medido, desfase = _desfases.get(sitio, (None, None))
+        if medido is not None and time.monotonic() - medido < INTERVALO_MEDICION_DESFASE:
+            return desfase
+        # Mientras un hilo mide, los demás siguen usando la medición anterior
+        _desfases[sitio] = (time.monotonic(), desfase)
+
+    try:
+        primario = conectar_bd()
+    except ConnectionError as e:
+        print(f"Primario no disponible para medir el desfase de la réplica: {e}")
+        desfase = None
+    else:
+        try:
+            desfase = desfase_replica(primario, replica)
+        except pyodbc.Error as e:
+            print(f"Error al medir el desfase de la réplica: {e}")
+            desfase = None
+        finally:
+            primario.close()
+
+    with _lock_desfases:
+        _desfases[sitio] = (time.monotonic(), desfase)
+    return desfase
+
+
+def conectar_bd_lectura():
+    """
+    Conexión para lecturas que toleran datos levemente atrasados (dashboards, exportaciones, historial).
+
+    Usa la réplica si está configurada, responde y su último atraso medido no supera
+    DESFASE_MAXIMO_REPLICA; en cualquier otro caso usa el primario, salvo que el
+    primario no responda. Las validaciones de las escrituras siempre leen del primario
+    con conectar_bd().
+    """
+    if not sitios.configuracion().servidor_lectura:
+        return conectar_bd()
+
+    try:
+        replica = conectar_replica()
+    except ConnectionError:
+        _contar_lectura("primario")
+        return conectar_bd()
+
+    desfase = _desfase_vigente(replica)
+    if desfase is not None and desfase <= DESFASE_MAXIMO_REPLICA:
+        _contar_lectura("replica")
+        return replica
+
+    try:
+        primario = conectar_bd()
+    except ConnectionError as e:
+        # Con el primario caído la réplica es el mejor dato disponible
+        print(f"Primario no disponible, se lee de la réplica: {e}")
+        _contar_lectura("replica")
+        return replica
+    replica.close()
+    _contar_lectura("primario")
+    return primario
+
 
 def crear_usuario(username, password):
     """
@@ -71,41 +313,167 @@ def verificar_credenciales(username, password):
         conn.close()
 
 
+def _registrar_movimiento(cursor, tipo_movimiento, id_pallet=None, n_pallet=None, destino=None):
+    """
+    Agrega un movimiento al registro append-only ledger_movimientos, en la transacción del cursor.
+    Retorna (tipo_movimiento, id_pallet, destino, pallet) para notificarlo con marcar_cambio_datos;
+    con los datos del pallet los índices en memoria agregan pallets que aún no conocían.
+    """
+    tipo_almacen, piso, rack, letra = destino or (None, None, None, None)
+    columna, valor = ("id_pallet", id_pallet) if id_pallet is not None else ("NPallet", n_pallet)
+    cursor.execute(
+        f"SELECT id_pallet, NPallet, Variedad, Mercado, fechafaena FROM pallets WHERE {columna} = ?",
+        (valor,)
+    )
+    fila = cursor.fetchone()
+    if fila is None:
+        return tipo_movimiento, id_pallet, destino, None
+    pallet = PalletModelo(fila[1], fila[0], fila[2], fila[3], str(fila[4]) if fila[4] is not None else None)
+    cursor.execute(
+        """
+        INSERT INTO ledger_movimientos (tipo_movimiento, id_pallet, NPallet, tipo_almacen, piso, rack, letra)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (tipo_movimiento, pallet.id_pallet, pallet.npallet, tipo_almacen, piso, rack, letra)
+    )
+    return tipo_movimiento, pallet.id_pallet, destino, pallet
+
+
+# Reintentos cuando otro worker modifica el mismo carril entre la lectura y la escritura
+REINTENTOS_CONCURRENCIA = int(os.getenv("REINTENTOS_CONCURRENCIA", "5"))
+ESPERA_REINTENTO = 0.02
+
+
+class ConflictoConcurrencia(Exception):
+    """
+    La versión de un carril cambió entre la lectura y la escritura.
+    """
+
+
+def _version_carril(cursor, piso, rack, letra):
+    """
+    Retorna (versión, posiciones libres) del carril. La versión es la suma de version_fila.
+    """
+    cursor.execute(
+        """
+        SELECT ISNULL(SUM(version_fila), 0), SUM(CASE WHEN id_pallet_asignado IS NULL THEN 1 ELSE 0 END)
+        FROM ubicaciones WHERE piso = ? AND rack = ? AND letra = ?
+        """,
+        (piso, rack, letra)
+    )
+    version, libres = cursor.fetchone()
+    return version, libres or 0
+
+
+def _comparar_y_bloquear_carril(cursor, piso, rack, letra, version):
+    """
+    Compare-and-swap: incrementa la versión del carril solo si sigue siendo `version`.
+
+    Las filas del carril quedan bloqueadas hasta el commit, por lo que ningún otro
+    worker puede modificarlo mientras dura la transacción.
+    """
+    cursor.execute(
+        """
+        UPDATE ubicaciones SET version_fila = version_fila + 1
+        WHERE piso = ? AND rack = ? AND letra = ?
+          AND ? = (SELECT SUM(version_fila) FROM ubicaciones WITH (UPDLOCK, HOLDLOCK)
+                   WHERE piso = ? AND rack = ? AND letra = ?)
+        """,
+        (piso, rack, letra, version, piso, rack, letra)
+    )
+    if cursor.rowcount == 0:
+        raise ConflictoConcurrencia(f"El carril {piso}-{rack}-{letra} fue modificado por otro proceso.")
+
+
+# Índice único que impide asignar un pallet a dos posiciones (sql/version_ubicaciones.sql)
+INDICE_PALLET_ASIGNADO = "ux_ubicaciones_pallet_asignado"
+
+
+def _es_reintentable(error):
+    """
+    Conflicto de versión, víctima de deadlock (40001) o dos asignaciones cruzadas del
+    mismo pallet (error 2601/2627 sobre el índice único de pallet asignado).
+
+    Otras violaciones de integridad (FK, NOT NULL, CHECK) no se reintentan.
+    """
+    if isinstance(error, ConflictoConcurrencia):
+        return True
+    if not isinstance(error, pyodbc.Error) or not error.args:
+        return False
+    if error.args[0] == "40001":
+        return True
+    mensaje = str(error.args[-1])
+    return (
+        error.args[0] == "23000"
+        and INDICE_PALLET_ASIGNADO in mensaje
+        and ("(2601)" in mensaje or "(2627)" in mensaje)
+    )
+
+
+def _esperar_reintento(intento):
+    # Backoff exponencial con jitter para que los workers en conflicto no choquen de nuevo
+    time.sleep(ESPERA_REINTENTO * (2 ** intento) * random.random())
+
+
 # Funciones relacionadas con ubicaciones y pallets
 def asignar_ubicacion(pallet_id, tipo_almacen, piso, rack, letra):
     """
     Asigna una ubicación a un pallet en el almacén.
+
+    Las validaciones se repiten en cada reintento, por lo que si otro worker llenó
+    el carril o asignó el mismo pallet se retorna el error correspondiente.
     """
-    conn = conectar_bd()
+    # Con la base de datos caída la escritura se rechaza de inmediato (circuito abierto)
+    try:
+        conn = conectar_bd()
+    except ConnectionError as e:
+        return f"Error al asignar ubicación: {e}"
     cursor = conn.cursor()
 
     try:
         # Validar que el pallet ID sea un entero
         pallet_id = int(pallet_id)
 
-        # Verificar si el pallet existe
-        cursor.execute("SELECT 1 FROM pallets WHERE id_pallet = ?", (pallet_id,))
-        if cursor.fetchone() is None:
-            return f"Error: El Pallet con ID {pallet_id} no existe."
+        for intento in range(REINTENTOS_CONCURRENCIA + 1):
+            try:
+                # Verificar si el pallet existe
+                cursor.execute("SELECT 1 FROM pallets WHERE id_pallet = ?", (pallet_id,))
+                if cursor.fetchone() is None:
+                    return f"Error: El Pallet con ID {pallet_id} no existe."
 
-        # Verificar si el pallet ya tiene una ubicación asignada
-        cursor.execute(
-            "SELECT ubicacion_key FROM ubicaciones WHERE id_pallet_asignado = ?",
-            (pallet_id,)
-        )
-        ubicacion_actual = cursor.fetchone()
-        if ubicacion_actual:
-            return f"Error: El Pallet ya tiene una ubicación asignada: {ubicacion_actual[0]}."
+                # Verificar si el pallet ya tiene una ubicación asignada
+                cursor.execute(
+                    "SELECT ubicacion_key FROM ubicaciones WHERE id_pallet_asignado = ?",
+                    (pallet_id,)
+                )
+                ubicacion_actual = cursor.fetchone()
+                if ubicacion_actual:
+                    return f"Error: El Pallet ya tiene una ubicación asignada: {ubicacion_actual[0]}."
 
-        # Asignar ubicación mediante procedimientos almacenados
-        cursor.execute(
-            "EXEC reasignar_pallet @piso=?, @rack=?, @letra=?, @id_pallet=?",
-            (piso, rack, letra, pallet_id)
-        )
-        conn.commit()
+                version, libres = _version_carril(cursor, piso, rack, letra)
+                if libres == 0:
+                    return f"Error: La ubicación {tipo_almacen}, {piso}, {rack}, {letra} no tiene posiciones libres."
+
+                # Asignar ubicación mediante procedimientos almacenados, si el carril no cambió
+                _comparar_y_bloquear_carril(cursor, piso, rack, letra, version)
+                cursor.execute(
+                    "EXEC reasignar_pallet @piso=?, @rack=?, @letra=?, @id_pallet=?",
+                    (piso, rack, letra, pallet_id)
+                )
+                movimiento = _registrar_movimiento(cursor, "asignacion", id_pallet=pallet_id, destino=(tipo_almacen, piso, rack, letra))
+                conn.commit()
+                break
+            except (ConflictoConcurrencia, pyodbc.Error) as e:
+                if not _es_reintentable(e):
+                    raise
+                conn.rollback()
+                if intento == REINTENTOS_CONCURRENCIA:
+                    return "Error: La ubicación está siendo modificada por otro usuario, intente nuevamente."
+                _esperar_reintento(intento)
 
         cursor.execute("EXEC actualizar_status_ubicacion")
         conn.commit()
+        marcar_cambio_datos([movimiento])
 
         return f"Pallet {pallet_id} asignado a la ubicación {tipo_almacen}, {piso}, {rack}, {letra}."
     except ValueError:
@@ -120,7 +488,10 @@ def liberar_ubicacion(pallet_id):
     """
     Libera una ubicación ocupada por un pallet y reorganiza posiciones.
     """
-    conn = conectar_bd()
+    try:
+        conn = conectar_bd()
+    except ConnectionError as e:
+        return f"Error al liberar ubicación: {e}"
     cursor = conn.cursor()
 
     try:
@@ -132,27 +503,48 @@ def liberar_ubicacion(pallet_id):
         if cursor.fetchone() is None:
             return f"Error: El Pallet con ID {pallet_id} no existe."
 
-        # Verificar si el pallet tiene una ubicación asignada
-        cursor.execute(
-            "SELECT id_ubicacion, posicion_pallet FROM asignacion_pallet WHERE id_pallet = ?",
-            (pallet_id,)
-        )
-        result = cursor.fetchone()
-        if result is None:
-            return f"Error: El Pallet con ID {pallet_id} no está asignado a ninguna ubicación."
+        for intento in range(REINTENTOS_CONCURRENCIA + 1):
+            try:
+                # Verificar si el pallet tiene una ubicación asignada
+                cursor.execute(
+                    "SELECT piso, rack, letra, posicion_pallet FROM ubicaciones WHERE id_pallet_asignado = ?",
+                    (pallet_id,)
+                )
+                result = cursor.fetchone()
+                if result is None:
+                    return f"Error: El Pallet con ID {pallet_id} no está asignado a ninguna ubicación."
 
-        id_ubicacion, posicion_actual = result
+                piso, rack, letra, posicion_actual = result
 
-        # Verificar si el pallet está en la posición 1
-        if posicion_actual != 1:
-            return "Error: Solo se puede retirar el pallet de la posición 1."
+                # Verificar si el pallet está en la posición 1
+                if posicion_actual != 1:
+                    return "Error: Solo se puede retirar el pallet de la posición 1."
 
-        # Retirar el pallet
-        cursor.execute("EXEC retirar_pallet @id_pallet = ?", (pallet_id,))
-        conn.commit()
+                # Retirar el pallet, si el carril no cambió desde la validación
+                version, _ = _version_carril(cursor, piso, rack, letra)
+                _comparar_y_bloquear_carril(cursor, piso, rack, letra, version)
+                cursor.execute(
+                    "SELECT posicion_pallet FROM ubicaciones WHERE id_pallet_asignado = ?",
+                    (pallet_id,)
+                )
+                fila = cursor.fetchone()
+                if fila is None or fila[0] != posicion_actual:
+                    raise ConflictoConcurrencia(f"El Pallet {pallet_id} fue movido por otro proceso.")
+                cursor.execute("EXEC retirar_pallet @id_pallet = ?", (pallet_id,))
+                movimiento = _registrar_movimiento(cursor, "retiro", id_pallet=pallet_id)
+                conn.commit()
+                break
+            except (ConflictoConcurrencia, pyodbc.Error) as e:
+                if not _es_reintentable(e):
+                    raise
+                conn.rollback()
+                if intento == REINTENTOS_CONCURRENCIA:
+                    return "Error: La ubicación está siendo modificada por otro usuario, intente nuevamente."
+                _esperar_reintento(intento)
 
         cursor.execute("EXEC actualizar_status_ubicacion")
         conn.commit()
+        marcar_cambio_datos([movimiento])
 
         return f"Ubicación liberada y reorganizada para el Pallet {pallet_id}."
     except ValueError:
@@ -164,11 +556,123 @@ def liberar_ubicacion(pallet_id):
         conn.close()
 
 
+def ejecutar_lote_movimientos(pasos, carriles_esperados=None):
+    """
+    Ejecuta un lote de movimientos en una sola transacción.
+
+    Cada paso es un diccionario con "accion" ("retirar", "reubicar" o "asignar"),
+    "id_pallet" y, para reubicar/asignar, "destino" = (tipo_almacen, piso, rack, letra).
+    Si algún paso falla se revierte el lote completo.
+
+    Los carriles de origen y destino se bloquean con compare-and-swap antes de
+    ejecutar. `carriles_esperados` ([[clave, [id_pallet desde la posición 1]]], ver
+    ModeloAlmacen.contenido_carriles) es el contenido con el que se calculó el plan:
+    si algún carril ya no lo tiene, el plan quedó desactualizado y no se ejecuta.
+    Además, cada pallet que se retira debe estar en la posición 1 de su carril de
+    origen en ese momento del lote.
+    """
+    if not pasos:
+        return "No hay movimientos para ejecutar."
+
+    try:
+        conn = conectar_bd()
+    except ConnectionError as e:
+        return f"Error al ejecutar el lote de movimientos: {e}"
+    cursor = conn.cursor()
+
+    try:
+        carriles = set()
+        for paso in pasos:
+            if paso.get("origen"):
+                carriles.add(tuple(paso["origen"][1:]))
+            if paso.get("destino"):
+                carriles.add(tuple(paso["destino"][1:]))
+        for clave, _ in carriles_esperados or []:
+            carriles.add(tuple(clave[1:]))
+        # Orden fijo de bloqueo para que dos lotes no se bloqueen mutuamente
+        carriles = sorted(carriles, key=lambda c: tuple(str(x) for x in c))
+
+        for intento in range(REINTENTOS_CONCURRENCIA + 1):
+            try:
+                versiones = [_version_carril(cursor, *carril)[0] for carril in carriles]
+                for carril, version in zip(carriles, versiones):
+                    _comparar_y_bloquear_carril(cursor, *carril, version)
+                break
+            except (ConflictoConcurrencia, pyodbc.Error) as e:
+                if not _es_reintentable(e):
+                    raise
+                conn.rollback()
+                if intento == REINTENTOS_CONCURRENCIA:
+                    return "Error: Los carriles del lote están siendo modificados por otro usuario, intente nuevamente."
+                _esperar_reintento(intento)
+
+        # Con los carriles bloqueados, su contenido debe ser el que usó el plan
+        for clave, esperados in carriles_esperados or []:
+            _, piso, rack, letra = clave
+            cursor.execute(
+                """
+                SELECT id_pallet_asignado FROM ubicaciones
+                WHERE piso = ? AND rack = ? AND letra = ? AND id_pallet_asignado IS NOT NULL
+                ORDER BY posicion_pallet
+                """,
+                (piso, rack, letra)
+            )
+            if [fila[0] for fila in cursor.fetchall()] != [int(id_pallet) for id_pallet in esperados]:
+                conn.rollback()
+                return f"Error: La ubicación {piso}-{rack}-{letra} cambió desde que se calculó el plan. Actualice el plan."
+
+        movimientos = []
+        for paso in pasos:
+            id_pallet = int(paso["id_pallet"])
+            if paso["accion"] in ("retirar", "reubicar"):
+                # retirar_pallet saca el pallet de cualquier posición; solo se permite la 1
+                cursor.execute(
+                    "SELECT piso, rack, letra, posicion_pallet FROM ubicaciones WHERE id_pallet_asignado = ?",
+                    (id_pallet,)
+                )
+                ubicacion = cursor.fetchone()
+                if (
+                    ubicacion is None
+                    or ubicacion[3] != 1
+                    or (paso.get("origen") and tuple(ubicacion[:3]) != tuple(paso["origen"][1:]))
+                ):
+                    conn.rollback()
+                    return (
+                        f"Error: El pallet {paso.get('npallet') or id_pallet} ya no está en la posición 1 "
+                        "de la ubicación planificada. Actualice el plan."
+                    )
+                cursor.execute("EXEC retirar_pallet @id_pallet = ?", (id_pallet,))
+                movimientos.append(_registrar_movimiento(cursor, "retiro", id_pallet=id_pallet))
+            if paso["accion"] in ("reubicar", "asignar"):
+                tipo_almacen, piso, rack, letra = paso["destino"]
+                cursor.execute(
+                    "EXEC reasignar_pallet @piso=?, @rack=?, @letra=?, @id_pallet=?",
+                    (piso, rack, letra, id_pallet)
+                )
+                movimientos.append(
+                    _registrar_movimiento(cursor, "asignacion", id_pallet=id_pallet, destino=(tipo_almacen, piso, rack, letra))
+                )
+
+        cursor.execute("EXEC actualizar_status_ubicacion")
+        conn.commit()
+        marcar_cambio_datos(movimientos)
+
+        return f"Lote de {len(pasos)} movimientos ejecutado correctamente."
+    except (KeyError, TypeError, ValueError) as e:
+        conn.rollback()
+        return f"Error: Movimiento inválido en el lote: {e}"
+    except pyodbc.Error as e:
+        conn.rollback()
+        return f"Error al ejecutar el lote de movimientos: {e}"
+    finally:
+        conn.close()
+
+
 def obtener_todas_las_posiciones():
     """
     Recupera todas las posiciones del almacén, incluyendo id_pallet_asignado, descripción, variedad, mercado, fecha de faena y NPallet.
     """
-    conn = conectar_bd()
+    conn = conectar_bd_lectura()
     cursor = conn.cursor()
 
     try:
@@ -196,11 +700,349 @@ def obtener_todas_las_posiciones():
 
 
 
+# Columnas de la exportación de inventario, en el orden del SELECT
+COLUMNAS_EXPORTACION = [
+    "tipo_almacen", "piso", "rack", "letra", "posicion_pallet", "status_ubicacion",
+    "id_pallet", "NPallet", "descripcion", "Variedad", "Mercado", "fechafaena",
+]
+
+
+# fechafaena como texto AAAAMMDD comparable, igual que modelo_almacen.orden_fecha_faena:
+# las fechas DDMMAAAA se invierten y las de tipo fecha pierden los guiones
+_FECHA_FAENA_TEXTO = "REPLACE(CAST(p.fechafaena AS varchar(10)), '-', '')"
+_FECHA_FAENA_AAAAMMDD = f"""
+    CASE WHEN p.fechafaena IS NULL THEN NULL
+        WHEN SUBSTRING({_FECHA_FAENA_TEXTO}, 1, 2) IN ('19', '20')
+        THEN SUBSTRING({_FECHA_FAENA_TEXTO}, 1, 8)
+        ELSE CONCAT(SUBSTRING({_FECHA_FAENA_TEXTO}, 5, 4), SUBSTRING({_FECHA_FAENA_TEXTO}, 3, 2), SUBSTRING({_FECHA_FAENA_TEXTO}, 1, 2))
+    END
+"""
+
+
+def iterar_posiciones_exportacion(rack=None, variedad=None, mercado=None, fecha_desde=None, fecha_hasta=None, tamano_lote=5000):
+    """
+    Recorre el join ubicaciones/pallets en lotes de `tamano_lote` filas usando fetchmany.
+
+    `fecha_desde` y `fecha_hasta` son fechas de faena de 8 dígitos (AAAAMMDD o DDMMAAAA)
+    y se comparan como AAAAMMDD contra la fecha normalizada de cada pallet.
+
+    Es un generador: la conexión permanece abierta (y fuera del pool del sitio)
+    mientras se consumen los lotes, es decir, durante toda la descarga, y se cierra
+    al terminar o al abandonar la iteración.
+    """
+    query = """
+        SELECT
+            u.tipo_almacen, u.piso, u.rack, u.letra, u.posicion_pallet, u.status_ubicacion,
+            u.id_pallet_asignado, p.NPallet, p.descripcion, p.Variedad, p.Mercado, p.fechafaena
+        FROM ubicaciones u
+        LEFT JOIN pallets p ON u.id_pallet_asignado = p.id_pallet
+    """
+    conditions = []
+    params = []
+
+    if rack:
+        conditions.append("u.rack = ?")
+        params.append(rack)
+    if variedad:
+        conditions.append("p.Variedad = ?")
+        params.append(variedad)
+    if mercado:
+        conditions.append("p.Mercado = ?")
+        params.append(mercado)
+    if fecha_desde:
+        conditions.append(f"{_FECHA_FAENA_AAAAMMDD} >= ?")
+        params.append(orden_fecha_faena(fecha_desde))
+    if fecha_hasta:
+        conditions.append(f"{_FECHA_FAENA_AAAAMMDD} <= ?")
+        params.append(orden_fecha_faena(fecha_hasta))
+
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY u.tipo_almacen, u.piso, u.rack, u.letra, u.posicion_pallet"
+
+    conn = conectar_bd_lectura()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(query, params)
+        while True:
+            filas = cursor.fetchmany(tamano_lote)
+            if not filas:
+                break
+            yield filas
+    finally:
+        conn.close()
+
+
+def aplicar_layout(slots, tamano_lote=10000, aplicar=True):
+    """
+    Compara un layout completo con la tabla ubicaciones y, con `aplicar`, lo aplica
+    con operaciones por conjuntos.
+
+    `slots` es la lista de posiciones (tipo_almacen, piso, rack, letra, posicion_pallet)
+    deseadas. Se cargan en una tabla temporal y, en la misma transacción y con la
+    tabla bloqueada, se calculan las diferencias en el primario y se insertan las
+    nuevas y se retiran las que sobran, excepto las ocupadas, que se mantienen y se
+    informan. Sin `aplicar` la transacción se deshace.
+
+    Retorna un dict con insertar, retirar (cantidades), protegidas (posiciones),
+    aplicado y mensaje; si falla, un dict con error.
+    """
+    try:
+        conn = conectar_bd()
+    except ConnectionError as e:
+        return {"error": f"Error al aplicar el layout: {e}"}
+    cursor = conn.cursor()
+
+    try:
+        # Nadie asigna ni retira mientras se comparan y aplican las diferencias
+        cursor.execute("SELECT COUNT(*) FROM ubicaciones WITH (TABLOCKX, HOLDLOCK)")
+        cursor.fetchone()
+        cursor.execute("""
+            CREATE TABLE #layout_deseado (
+                tipo_almacen VARCHAR(50), piso INT, rack INT, letra VARCHAR(5), posicion_pallet INT
+            )
+        """)
+        cursor.fast_executemany = True
+        for inicio in range(0, len(slots), tamano_lote):
+            cursor.executemany(
+                "INSERT INTO #layout_deseado (tipo_almacen, piso, rack, letra, posicion_pallet) VALUES (?, ?, ?, ?, ?)",
+                slots[inicio:inicio + tamano_lote]
+            )
+        cursor.fast_executemany = False
+
+        coincide = """
+            l.tipo_almacen = u.tipo_almacen AND l.piso = u.piso AND l.rack = u.rack
+            AND l.letra = u.letra AND l.posicion_pallet = u.posicion_pallet
+        """
+        cursor.execute(f"""
+            SELECT u.tipo_almacen, u.piso, u.rack, u.letra, u.posicion_pallet FROM ubicaciones u
+            WHERE u.id_pallet_asignado IS NOT NULL
+              AND NOT EXISTS (SELECT 1 FROM #layout_deseado l WHERE {coincide})
+            ORDER BY u.tipo_almacen, u.piso, u.rack, u.letra, u.posicion_pallet
+        """)
+        protegidas = [tuple(fila) for fila in cursor.fetchall()]
+
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM #layout_deseado l
+            WHERE NOT EXISTS (SELECT 1 FROM ubicaciones u WHERE {coincide})
+        """)
+        insertar = cursor.fetchone()[0]
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM ubicaciones u
+            WHERE u.id_pallet_asignado IS NULL
+              AND NOT EXISTS (SELECT 1 FROM #layout_deseado l WHERE {coincide})
+        """)
+        retirar = cursor.fetchone()[0]
+
+        resultado = {"insertar": insertar, "retirar": retirar, "protegidas": protegidas, "aplicado": False}
+        if not aplicar:
+            conn.rollback()
+            resultado["mensaje"] = "No se aplicaron cambios."
+            return resultado
+        if not insertar and not retirar:
+            conn.rollback()
+            resultado["mensaje"] = "El layout ya está aplicado."
+            return resultado
+
+        cursor.execute(f"""
+            INSERT INTO ubicaciones (tipo_almacen, piso, rack, letra, posicion_pallet, status_ubicacion)
+            SELECT l.tipo_almacen, l.piso, l.rack, l.letra, l.posicion_pallet, 'Libre'
+            FROM #layout_deseado l
+            WHERE NOT EXISTS (SELECT 1 FROM ubicaciones u WHERE {coincide})
+        """)
+        insertadas = cursor.rowcount
+
+        cursor.execute(f"""
+            DELETE u FROM ubicaciones u
+            WHERE u.id_pallet_asignado IS NULL
+              AND NOT EXISTS (SELECT 1 FROM #layout_deseado l WHERE {coincide})
+        """)
+        retiradas = cursor.rowcount
+
+        cursor.execute("EXEC actualizar_status_ubicacion")
+        # La tabla temporal vive lo que la sesión, y la conexión vuelve al pool
+        cursor.execute("DROP TABLE #layout_deseado")
+        conn.commit()
+        marcar_cambio_datos()
+
+        mensaje = f"Layout aplicado: {insertadas} posiciones insertadas, {retiradas} retiradas."
+        if protegidas:
+            mensaje += f" {len(protegidas)} posiciones ocupadas fuera del layout se mantuvieron."
+        resultado.update(aplicado=True, mensaje=mensaje)
+        return resultado
+    except pyodbc.Error as e:
+        conn.rollback()
+        return {"error": f"Error al aplicar el layout: {e}"}
+    finally:
+        conn.close()
+
+
+def obtener_id_pallet(n_pallet):
+    """
+    Retorna el id_pallet correspondiente a un NPallet, o None si no existe.
+    """
+    conn = conectar_bd()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT id_pallet FROM pallets WHERE NPallet = ?", (n_pallet,))
+        result = cursor.fetchone()
+        return result[0] if result else None
+    finally:
+        conn.close()
+
+
+def obtener_datos_pallet(n_pallet):
+    """
+    Retorna (id_pallet, Variedad, Mercado, fechafaena) de un NPallet, o None si no existe.
+    """
+    conn = conectar_bd()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "SELECT id_pallet, Variedad, Mercado, fechafaena FROM pallets WHERE NPallet = ?",
+            (n_pallet,)
+        )
+        result = cursor.fetchone()
+        return tuple(result) if result else None
+    finally:
+        conn.close()
+
+
+def obtener_firma_datos():
+    """
+    Recupera una firma barata del contenido de ubicaciones y pallets para detectar cambios.
+    """
+    conn = conectar_bd()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("""
+            SELECT
+                (SELECT CHECKSUM_AGG(CHECKSUM(*)) FROM ubicaciones),
+                (SELECT COUNT(*) FROM pallets),
+                (SELECT MAX(id_pallet) FROM pallets)
+        """)
+        return tuple(cursor.fetchone())
+    finally:
+        conn.close()
+
+
+def obtener_snapshot_ledger(fecha_hora):
+    """
+    Retorna (id_movimiento, fecha_hora, contenido) del último snapshot de ocupación hasta la fecha dada, o None.
+    """
+    conn = conectar_bd_lectura()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """
+            SELECT TOP 1 id_movimiento, fecha_hora, contenido
+            FROM ledger_snapshots
+            WHERE fecha_hora <= ?
+            ORDER BY fecha_hora DESC, id_snapshot DESC
+            """,
+            (fecha_hora,)
+        )
+        result = cursor.fetchone()
+        return tuple(result) if result else None
+    finally:
+        conn.close()
+
+
+def obtener_movimientos_ledger(desde_id_movimiento, hasta_fecha_hora):
+    """
+    Recupera los movimientos posteriores a un id y hasta una fecha, en orden de registro.
+    Retorna (movimientos, fecha y hora actual de la base de datos).
+    """
+    conn = conectar_bd_lectura()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            """
+            SELECT id_movimiento, tipo_movimiento, NPallet, tipo_almacen, piso, rack, letra
+            FROM ledger_movimientos
+            WHERE id_movimiento > ? AND fecha_hora <= ?
+            ORDER BY id_movimiento
+            """,
+            (desde_id_movimiento, hasta_fecha_hora)
+        )
+        movimientos = cursor.fetchall()
+        cursor.execute("SELECT SYSDATETIME()")
+        return movimientos, _como_fecha(cursor.fetchone()[0])
+    finally:
+        conn.close()
+
+
+def obtener_ultimo_snapshot_ledger():
+    """
+    Retorna (fecha del snapshot de ocupación más reciente o None, fecha y hora actual de la base de datos).
+    """
+    conn = conectar_bd()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT MAX(fecha_hora), SYSDATETIME() FROM ledger_snapshots")
+        ultimo, ahora = cursor.fetchone()
+        return _como_fecha(ultimo), _como_fecha(ahora)
+    finally:
+        conn.close()
+
+
+def guardar_snapshot_ledger(fecha_hora, id_movimiento, contenido):
+    """
+    Guarda un snapshot de ocupación que incluye los movimientos hasta id_movimiento.
+    """
+    conn = conectar_bd()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "INSERT INTO ledger_snapshots (fecha_hora, id_movimiento, contenido) VALUES (?, ?, ?)",
+            (fecha_hora, id_movimiento, contenido)
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def obtener_posiciones_y_ultimo_movimiento():
+    """
+    Recupera todas las posiciones junto con el último id del ledger, de forma consistente.
+
+    El lock sobre ledger_movimientos impide que se registren movimientos mientras
+    se leen las posiciones.
+    """
+    conn = conectar_bd()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute(
+            "SELECT ISNULL(MAX(id_movimiento), 0), SYSDATETIME() FROM ledger_movimientos WITH (TABLOCKX, HOLDLOCK)"
+        )
+        id_movimiento, fecha_hora = cursor.fetchone()
+        cursor.execute("""
+            SELECT
+                u.tipo_almacen, u.piso, u.rack, u.letra, u.posicion_pallet, u.status_ubicacion,
+                u.id_pallet_asignado, p.descripcion, p.Variedad, p.Mercado, p.fechafaena, p.NPallet
+            FROM ubicaciones u
+            LEFT JOIN pallets p ON u.id_pallet_asignado = p.id_pallet
+        """)
+        posiciones = cursor.fetchall()
+        conn.commit()
+        return posiciones, id_movimiento, fecha_hora
+    finally:
+        conn.close()
+
+
 def obtener_opciones_campo():
     """
     Recupera las opciones únicas de cada campo desde la base de datos.
     """
-    conn = conectar_bd()
+    conn = conectar_bd_lectura()
     cursor = conn.cursor()
 
     try:
@@ -225,7 +1067,7 @@ def obtener_opciones_disponibles(tipo_almacen=None, piso=None, rack=None, letra=
     """
     Recupera las opciones disponibles basadas en los filtros seleccionados.
     """
-    conn = conectar_bd()
+    conn = conectar_bd_lectura()
     cursor = conn.cursor()
 
     try:
@@ -281,28 +1123,15 @@ def ingresar_pallet(qr_data):
         str: Un mensaje indicando si el ingreso fue exitoso o si hubo un error.
     """
     if qr_data:
-        # Dividir los datos del QR
-        datos = qr_data.split(',')
-        
-        if len(datos) != 5:
-            return dbc.Alert(f"Error: El formato del QR no es válido. Debe tener 5 campos separados por comas.", color="danger")
-        
-        # Extraer cada campo
-        variedad = datos[0]
-        descripcion = datos[1]
-        mercado = datos[2]
-        fecha_faena = datos[3]
-        n_pallet = datos[4]
-        
-        # Verificar la longitud de FechaFaena
-        if len(fecha_faena) != 8 or not fecha_faena.isdigit():
-            return dbc.Alert(f"Error: La Fecha Faena debe tener exactamente 8 caracteres numéricos. Valor proporcionado: {fecha_faena}", color="danger")
-
-        # Verificar la longitud de NPallet
-        if len(n_pallet) != 8:
-            return dbc.Alert(f"Error: El NPallet debe tener exactamente 8 caracteres. Valor proporcionado: {n_pallet}", color="danger")
-        
-        conn = conectar_bd()
+        registro, error = validar_qr(qr_data)
+        if error:
+            return dbc.Alert(f"Error: {error}", color="danger")
+        n_pallet = registro.n_pallet
+
+        try:
+            conn = conectar_bd()
+        except ConnectionError as e:
+            return dbc.Alert(f"Error al ingresar pallet: {e}", color="danger")
         cursor = conn.cursor()
         try:
             # Verificar si el NPallet ya existe
@@ -312,7 +1141,9 @@ def ingresar_pallet(qr_data):
             
             # Ejecutar el procedimiento almacenado para insertar el pallet desde el QR
             cursor.execute("EXEC InsertPalletFromQR @qrData = ?", (qr_data,))
+            movimiento = _registrar_movimiento(cursor, "ingreso", n_pallet=n_pallet)
             conn.commit()
+            marcar_cambio_datos([movimiento])
             return dbc.Alert(f"Pallet ingresado exitosamente con datos: {qr_data}", color="success")
         except pyodbc.Error as e:
             return dbc.Alert(f"Error al ingresar pallet: {e}", color="danger")
@@ -321,6 +1152,65 @@ def ingresar_pallet(qr_data):
     return ""
 
 
+# Parámetros por consulta al buscar los NPallet existentes de un lote (SQL Server admite 2100)
+TAMANO_CONSULTA_LOTE = 1000
+
+
+def ingresar_lote_pallets(texto):
+    """
+    Ingresa un lote de códigos QR, uno por línea, en una sola transacción.
+
+    El lote se valida con validar_lote. Las líneas inválidas, los NPallet repetidos
+    dentro del lote y los que ya existen en la base no se ingresan y se informan con
+    su número de línea. Retorna {"ingresados": cantidad, "errores": [(línea, mensaje)]}
+    o {"error": mensaje} si el lote no se pudo escribir.
+    """
+    lote = validar_lote(texto or "")
+    errores = list(lote.errores)
+    registros, vistos = [], set()
+    for numero, registro in lote.registros():
+        if registro.n_pallet in vistos:
+            errores.append((numero, f"El NPallet '{registro.n_pallet}' está repetido en el lote."))
+            continue
+        vistos.add(registro.n_pallet)
+        registros.append((numero, registro))
+    if not registros:
+        return {"ingresados": 0, "errores": sorted(errores)}
+
+    try:
+        conn = conectar_bd()
+    except ConnectionError as e:
+        return {"error": f"Error al ingresar el lote: {e}"}
+    cursor = conn.cursor()
+    try:
+        npallets = [registro.n_pallet for _, registro in registros]
+        existentes = set()
+        for inicio in range(0, len(npallets), TAMANO_CONSULTA_LOTE):
+            parte = npallets[inicio:inicio + TAMANO_CONSULTA_LOTE]
+            cursor.execute(
+                f"SELECT NPallet FROM pallets WHERE NPallet IN ({', '.join('?' * len(parte))})", parte
+            )
+            existentes.update(fila[0] for fila in cursor.fetchall())
+
+        movimientos = []
+        for numero, registro in registros:
+            if registro.n_pallet in existentes:
+                errores.append((numero, f"El NPallet '{registro.n_pallet}' ya existe en la base de datos."))
+                continue
+            cursor.execute("EXEC InsertPalletFromQR @qrData = ?", (",".join(registro),))
+            movimientos.append(_registrar_movimiento(cursor, "ingreso", n_pallet=registro.n_pallet))
+        conn.commit()
+    except pyodbc.Error as e:
+        conn.rollback()
+        return {"error": f"Error al ingresar el lote: {e}"}
+    finally:
+        conn.close()
+
+    if movimientos:
+        marcar_cambio_datos(movimientos)
+    return {"ingresados": len(movimientos), "errores": sorted(errores)}
+
+
 
 # Función para cerrar la conexión a la base de datos
 def cerrar_conexion_bd(conn):
@@ -333,4 +1223,8 @@ def cerrar_conexion_bd(conn):
             conn.close()
             print("Conexión a la base de datos cerrada correctamente.")
     except Exception as e:
-        print(f"Error al cerrar la conexión a la base de datos: {e}")
\ No newline at end of file
+        print(f"Error al cerrar la conexión a la base de datos: {e}")
+
+
+# Con TRAZA_ARCHIVO definido se graba cada llamada a las funciones públicas del módulo
+trazas.instrumentar_modulo(globals())
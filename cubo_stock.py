@@ -0,0 +1,147 @@
+# cubo_stock.py
+#
+# Cubo de stock de cada proceso, mantenido por cache_almacen para /api/stock y el tablero.
+#
+# Como el índice de busqueda_pallets, el cubo solo se actualiza en el lugar
+# (CuboStock.aplicar) con las escrituras del mismo worker, y solo si la generación
+# compartida avanzó exactamente una vez desde que se construyó. Las escrituras de
+# otros workers y el vencimiento de TTL_SNAPSHOT (30 s) hacen que se reconstruya
+# completo desde el snapshot en la siguiente consulta.
+
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+from modelo_almacen import orden_fecha_faena
+
+
+# Dimensiones del cubo, en el orden de las llaves de sus celdas
+DIMENSIONES = ("tipo_almacen", "piso", "rack", "variedad", "mercado", "tramo")
+
+# Tramos de antigüedad según los días desde la fecha de faena: (días máximos, etiqueta)
+TRAMOS_EDAD = (
+    (7, "0-7 días"),
+    (30, "8-30 días"),
+    (90, "31-90 días"),
+    (None, "Más de 90 días"),
+)
+SIN_FECHA = "Sin fecha"
+_ORDEN_TRAMO = {etiqueta: i for i, (_, etiqueta) in enumerate(TRAMOS_EDAD + ((None, SIN_FECHA),))}
+
+
+def _orden(dimension, valor):
+    """
+    Llave de orden de un valor: tramos de menor a mayor edad, números antes que textos.
+    """
+    if dimension == "tramo":
+        return (0, _ORDEN_TRAMO[valor], "")
+    if isinstance(valor, int):
+        return (0, valor, "")
+    return (1, 0, str(valor))
+
+
+def tramo_edad(fecha_faena, hoy):
+    """
+    Retorna la etiqueta del tramo de antigüedad de una fecha de faena AAAAMMDD.
+    """
+    try:
+        fecha = date(int(fecha_faena[:4]), int(fecha_faena[4:6]), int(fecha_faena[6:8]))
+    except ValueError:
+        return SIN_FECHA
+    dias = (hoy - fecha).days
+    for maximo, etiqueta in TRAMOS_EDAD:
+        if maximo is None or dias <= maximo:
+            return etiqueta
+
+
+class CuboStock:
+    """
+    Conteo de pallets ubicados por (tipo_almacen, piso, rack, variedad, mercado, fecha de faena).
+
+    Cada celda agrupa todos los pallets con la misma combinación, por lo que el cubo
+    tiene muchas menos celdas que posiciones el almacén; las consultas recorren solo
+    las celdas. La fecha de faena se guarda tal cual y se convierte a tramo de edad al
+    consultar, así el cubo no envejece. Igual que IndiceNPallet, los movimientos de
+    este proceso se aplican en el lugar con `aplicar`.
+    """
+
+    def __init__(self, modelo, generacion):
+        self.generacion = generacion
+        self.creado = time.time()
+        self.celdas = Counter()
+        # Celda de cada pallet ubicado y datos de cada pallet visto (para reasignaciones)
+        self.celda_pallet = {}
+        self.pallets = {}
+        for clave, carril in modelo.carriles.items():
+            for pallet in carril.pallets:
+                self._sumar(clave, pallet)
+        self._lock = threading.Lock()
+
+    def _sumar(self, clave, pallet):
+        celda = clave[:3] + (pallet.variedad, pallet.mercado, orden_fecha_faena(pallet.fecha_faena))
+        self.celdas[celda] += 1
+        self.celda_pallet[pallet.id_pallet] = celda
+        self.pallets[pallet.id_pallet] = pallet
+
+    def _restar(self, id_pallet):
+        celda = self.celda_pallet.pop(id_pallet, None)
+        if celda is None:
+            return False
+        self.celdas[celda] -= 1
+        if not self.celdas[celda]:
+            del self.celdas[celda]
+        return True
+
+    def aplicar(self, movimientos):
+        """
+        Aplica movimientos (tipo_movimiento, id_pallet, destino, pallet) ya confirmados en la base de datos.
+
+        Un pallet que el cubo no había visto se suma con los datos del movimiento.
+        Retorna False si algún movimiento no se puede reflejar; en ese caso el cubo debe reconstruirse.
+        """
+        with self._lock:
+            for tipo_movimiento, id_pallet, destino, pallet in movimientos:
+                if tipo_movimiento == "ingreso":
+                    continue
+                if tipo_movimiento == "retiro":
+                    if not self._restar(id_pallet):
+                        return False
+                elif tipo_movimiento == "asignacion":
+                    pallet = self.pallets.get(id_pallet) or pallet
+                    if pallet is None or id_pallet in self.celda_pallet:
+                        return False
+                    self._sumar(tuple(destino), pallet)
+                else:
+                    return False
+            return True
+
+    def consultar(self, por, filtros=None, hoy=None):
+        """
+        Suma los pallets agrupados por las dimensiones `por`, solo en las celdas que cumplen `filtros`.
+
+        `filtros` es un diccionario {dimensión: valor}. Retorna una lista ordenada de
+        (valores de las dimensiones, cantidad).
+        """
+        hoy = hoy or date.today()
+        indices = [DIMENSIONES.index(dimension) for dimension in por]
+        condiciones = [(DIMENSIONES.index(dimension), valor) for dimension, valor in (filtros or {}).items()]
+        tramos = {}
+        resultado = Counter()
+        with self._lock:
+            for celda, cantidad in self.celdas.items():
+                fecha_faena = celda[5]
+                if fecha_faena not in tramos:
+                    tramos[fecha_faena] = tramo_edad(fecha_faena, hoy)
+                fila = celda[:5] + (tramos[fecha_faena],)
+                if all(fila[i] == valor for i, valor in condiciones):
+                    resultado[tuple(fila[i] for i in indices)] += cantidad
+        return sorted(resultado.items(), key=lambda item: [_orden(d, v) for d, v in zip(por, item[0])])
+
+    def valores(self, dimension):
+        """
+        Valores distintos de una dimensión presentes en el cubo (sin tramo).
+        """
+        i = DIMENSIONES.index(dimension)
+        with self._lock:
+            return sorted(set(celda[i] for celda in self.celdas), key=lambda valor: _orden(dimension, valor))
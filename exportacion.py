@@ -0,0 +1,86 @@
+# exportacion.py
+
+import csv
+import io
+
+
+def generar_csv(columnas, lotes):
+    """
+    Genera el CSV por partes: el encabezado y luego un bloque de texto por cada lote de filas.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+
+    escritor.writerow(columnas)
+    yield buffer.getvalue()
+
+    for filas in lotes:
+        buffer.seek(0)
+        buffer.truncate()
+        escritor.writerows(filas)
+        yield buffer.getvalue()
+
+
+class _SalidaIncremental(io.RawIOBase):
+    """
+    Archivo de solo escritura que acumula bytes hasta que se retiran con `vaciar`.
+    """
+
+    def __init__(self):
+        self._partes = []
+        self._posicion = 0
+
+    def writable(self):
+        return True
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        self._posicion += len(datos)
+        return len(datos)
+
+    def tell(self):
+        return self._posicion
+
+    def vaciar(self):
+        datos = b"".join(self._partes)
+        self._partes = []
+        return datos
+
+
+def parquet_disponible():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def generar_parquet(columnas, lotes):
+    """
+    Genera un archivo Parquet por partes: un row group por lote (requiere pyarrow).
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    salida = _SalidaIncremental()
+    escritor = None
+    try:
+        for filas in lotes:
+            valores = list(zip(*filas))
+            tabla = pa.table({
+                # Los valores se exportan como texto para no depender de los tipos de SQL Server
+                columna: pa.array([None if v is None else str(v) for v in valores[i]], type=pa.string())
+                for i, columna in enumerate(columnas)
+            })
+            if escritor is None:
+                escritor = pq.ParquetWriter(salida, tabla.schema)
+            escritor.write_table(tabla)
+            yield salida.vaciar()
+
+        if escritor is None:
+            esquema = pa.schema([(columna, pa.string()) for columna in columnas])
+            escritor = pq.ParquetWriter(salida, esquema)
+    finally:
+        if escritor is not None:
+            escritor.close()
+    yield salida.vaciar()
@@ -0,0 +1,65 @@
+# gunicorn.conf.py
+#
+# Configuración de producción para servir la aplicación con gunicorn.
+#
+# Modelo de concurrencia:
+#   - Con preload_app el layout de Dash y los callbacks se construyen una sola vez en
+#     el proceso maestro y los workers los heredan con fork.
+#   - Cada worker atiende varias solicitudes a la vez (hilos "gthread" por defecto).
+#     Un handshake lento de conectar_bd() o un callback largo ocupa un hilo, no el
+#     worker completo.
+#   - La capa de datos es segura entre hilos: cada llamada de conexion_bd toma su
+#     propia conexión del pool del sitio (pool_conexiones.py) y la devuelve al terminar,
+#     el snapshot del almacén se publica reemplazando una referencia inmutable (lectura
+#     sin locks) y su reconstrucción se hace en un solo hilo a la vez.
+#   - Los hilos no sobreviven al fork, por eso el refresco del snapshot (un hilo por
+#     sitio) y el backend del cache compartido se inician en cada worker (post_fork).
+#     Los pools de conexiones de cada sitio se vacían solos en el primer uso después
+#     del fork.
+#   - Cada worker abre hasta BD_POOL_MAXIMO conexiones por sitio; con varios workers
+#     y sitios conviene revisar el máximo de sesiones de SQL Server.
+#   - "gevent" está disponible con GUNICORN_WORKER_CLASS=gevent, pero pyodbc es una
+#     extensión en C que bloquea el event loop; solo conviene si la base de datos
+#     responde rápido y hay muchas conexiones inactivas (long-polling).
+
+import multiprocessing
+import os
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("WEB_CONCURRENCY", str(min(multiprocessing.cpu_count() + 1, 8))))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "200"))
+
+# Con varios workers el cache debe ser compartido: una escritura en un worker tiene que
+# invalidar el snapshot de los demás. Se fija antes de que preload_app importe la
+# aplicación (cache_compartido lee CACHE_BACKEND al importarse).
+if workers > 1:
+    os.environ.setdefault("CACHE_BACKEND", "compartido")
+
+preload_app = True
+
+# Los callbacks pueden esperar a SQL Server; se da margen antes de reiniciar el worker
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+
+# Reciclar workers de a poco evita que la memoria crezca sin límite
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = 200
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    """Inicializa en cada worker los recursos que no se heredan con fork."""
+    import cache_almacen
+    import cache_compartido
+
+    # Cada worker abre su propio descriptor del backend (los locks flock son por descriptor)
+    cache_compartido.configurar_backend(None)
+    # Un hilo de refresco por sitio configurado en SITIOS (o, sin refresco, uno de muestreo de ocupación)
+    cache_almacen.iniciar_refresco_snapshot()
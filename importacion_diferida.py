@@ -0,0 +1,22 @@
+# importacion_diferida.py
+
+import importlib
+
+
+class ModuloDiferido:
+    """
+    Módulo que se importa recién en el primer acceso a uno de sus atributos.
+
+    `pd = ModuloDiferido("pandas")` se usa igual que `import pandas as pd`, pero el
+    costo de la importación se paga en la primera llamada que lo necesita y no al
+    arrancar el proceso.
+    """
+
+    def __init__(self, nombre):
+        self._nombre = nombre
+        self._modulo = None
+
+    def __getattr__(self, atributo):
+        if self._modulo is None:
+            self._modulo = importlib.import_module(self._nombre)
+        return getattr(self._modulo, atributo)
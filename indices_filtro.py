@@ -0,0 +1,78 @@
+# indices_filtro.py
+
+# Columnas de obtener_todas_las_posiciones() usadas por los filtros de visualización
+CAMPOS_FILTRO = {
+    "NPallet": 11,
+    "Variedad": 8,
+    "Mercado": 9,
+    "Fecha Faena": 10,
+}
+
+
+def _bitmap_desde_posiciones(posiciones_slot, total_slots):
+    """
+    Convierte una lista de índices de slot en un bitmap (entero de Python).
+    """
+    buffer = bytearray((total_slots + 7) // 8)
+    for i in posiciones_slot:
+        buffer[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buffer, "little")
+
+
+class IndiceFiltros:
+    """
+    Índices bitmap por atributo sobre los slots del almacén.
+
+    Cada slot es una fila de obtener_todas_las_posiciones(). Para cada campo de
+    CAMPOS_FILTRO se guarda un bitmap por valor, de modo que una combinación de
+    filtros se resuelve con OR bit a bit sin volver a consultar la base de datos.
+    """
+
+    def __init__(self, posiciones):
+        self.total_slots = len(posiciones)
+        self.npallets = [fila[11] for fila in posiciones]
+        self.bitmaps = {}
+
+        for campo, columna in CAMPOS_FILTRO.items():
+            postings = {}
+            for i, fila in enumerate(posiciones):
+                valor = fila[columna]
+                if valor is None:
+                    continue
+                # Las fechas de faena se comparan como texto, igual que en los dropdowns
+                postings.setdefault(str(valor), []).append(i)
+            self.bitmaps[campo] = {
+                valor: _bitmap_desde_posiciones(slots, self.total_slots)
+                for valor, slots in postings.items()
+            }
+
+    def seleccionar(self, npallets=None, variedades=None, mercados=None, fechas_faena=None):
+        """
+        Retorna el bitmap de slots que cumplen con al menos uno de los filtros.
+        """
+        mascara = 0
+        for campo, valores in (
+            ("NPallet", npallets),
+            ("Variedad", variedades),
+            ("Mercado", mercados),
+            ("Fecha Faena", fechas_faena),
+        ):
+            if not valores:
+                continue
+            bitmaps_campo = self.bitmaps[campo]
+            for valor in valores:
+                mascara |= bitmaps_campo.get(str(valor), 0)
+        return mascara
+
+    def npallets_resaltados(self, npallets=None, variedades=None, mercados=None, fechas_faena=None):
+        """
+        Retorna el conjunto de NPallet ubicados en los slots seleccionados por los filtros.
+        """
+        mascara = self.seleccionar(npallets, variedades, mercados, fechas_faena)
+        resaltados = set()
+        while mascara:
+            bit_bajo = mascara & -mascara
+            resaltados.add(self.npallets[bit_bajo.bit_length() - 1])
+            mascara ^= bit_bajo
+        resaltados.discard(None)
+        return resaltados
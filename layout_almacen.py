@@ -0,0 +1,122 @@
+# layout_almacen.py
+#
+# Definición del layout del almacén en CSV, una fila por carril:
+#
+#   tipo_almacen,piso,rack,letra,profundidad
+#   Camara,1,1,A,6
+#   Camara,1,1,B,6
+#
+# Uso:
+#   python layout_almacen.py generar --pisos 4 --racks 10 --letras 100 --profundidad 6 > layout.csv
+#   python layout_almacen.py importar layout.csv              # solo muestra los cambios
+#   python layout_almacen.py importar layout.csv --aplicar    # muestra los cambios y los aplica
+
+import argparse
+import csv
+import sys
+
+from modelo_almacen import _nombre_letra
+
+
+COLUMNAS_LAYOUT = ["tipo_almacen", "piso", "rack", "letra", "profundidad"]
+
+
+def leer_layout(archivo):
+    """
+    Lee un layout CSV y retorna {(tipo_almacen, piso, rack, letra): profundidad}.
+    Lanza ValueError indicando la línea si el archivo no es válido.
+    """
+    lector = csv.DictReader(archivo)
+    faltantes = [c for c in COLUMNAS_LAYOUT if c not in (lector.fieldnames or [])]
+    if faltantes:
+        raise ValueError(f"Faltan columnas en el layout: {', '.join(faltantes)}")
+
+    carriles = {}
+    for numero, fila in enumerate(lector, start=2):
+        try:
+            clave = (fila["tipo_almacen"].strip(), int(fila["piso"]), int(fila["rack"]), fila["letra"].strip())
+            profundidad = int(fila["profundidad"])
+        except (TypeError, ValueError):
+            raise ValueError(f"Línea {numero}: piso, rack y profundidad deben ser números enteros.")
+        if not clave[0] or not clave[3] or profundidad < 1:
+            raise ValueError(f"Línea {numero}: tipo_almacen y letra son obligatorios y la profundidad debe ser mayor a 0.")
+        if clave in carriles:
+            raise ValueError(f"Línea {numero}: el carril {clave} está repetido.")
+        carriles[clave] = profundidad
+    return carriles
+
+
+def escribir_layout(carriles, archivo):
+    escritor = csv.writer(archivo)
+    escritor.writerow(COLUMNAS_LAYOUT)
+    for clave, profundidad in sorted(carriles.items(), key=lambda c: tuple(str(x) for x in c[0])):
+        escritor.writerow(list(clave) + [profundidad])
+
+
+def generar_layout(tipos=("A",), pisos=3, racks=2, letras=20, profundidad=6):
+    """
+    Genera un layout sintético de carriles (por ejemplo, para benchmarks).
+    """
+    return {
+        (tipo, piso, rack, _nombre_letra(i)): profundidad
+        for tipo in tipos
+        for piso in range(1, pisos + 1)
+        for rack in range(1, racks + 1)
+        for i in range(letras)
+    }
+
+
+def slots_layout(carriles):
+    """
+    Expande los carriles a posiciones (tipo_almacen, piso, rack, letra, posicion_pallet).
+    """
+    return [clave + (posicion,) for clave, profundidad in carriles.items() for posicion in range(1, profundidad + 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación y generación de layouts del almacén")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    generar = sub.add_parser("generar", help="genera un layout sintético en CSV")
+    generar.add_argument("--tipos", default="A")
+    generar.add_argument("--pisos", type=int, default=3)
+    generar.add_argument("--racks", type=int, default=2)
+    generar.add_argument("--letras", type=int, default=20)
+    generar.add_argument("--profundidad", type=int, default=6)
+
+    importar = sub.add_parser("importar", help="muestra los cambios del layout y, con --aplicar, los aplica")
+    importar.add_argument("archivo")
+    importar.add_argument("--aplicar", action="store_true", help="aplica los cambios en la base de datos")
+
+    args = parser.parse_args()
+
+    if args.comando == "generar":
+        carriles = generar_layout(args.tipos.split(","), args.pisos, args.racks, args.letras, args.profundidad)
+        escribir_layout(carriles, sys.stdout)
+        return
+
+    with open(args.archivo, newline="", encoding="utf-8") as archivo:
+        carriles = leer_layout(archivo)
+
+    from conexion_bd import aplicar_layout
+
+    # Las diferencias se calculan en el primario, en la misma transacción que las aplica
+    resultado = aplicar_layout(slots_layout(carriles), aplicar=args.aplicar)
+    if "error" in resultado:
+        print(resultado["error"])
+        sys.exit(1)
+
+    print(f"Posiciones a insertar: {resultado['insertar']}")
+    print(f"Posiciones a retirar: {resultado['retirar']}")
+    print(f"Posiciones ocupadas fuera del layout (se mantienen): {len(resultado['protegidas'])}")
+    for slot in resultado["protegidas"][:20]:
+        print(f"  {slot}")
+
+    if args.aplicar:
+        print(resultado["mensaje"])
+    else:
+        print("No se aplicaron cambios; use --aplicar para aplicarlos.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# ledger.py
+
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from conexion_bd import (
+    guardar_snapshot_ledger,
+    obtener_movimientos_ledger,
+    obtener_posiciones_y_ultimo_movimiento,
+    obtener_snapshot_ledger,
+    obtener_ultimo_snapshot_ledger,
+)
+from modelo_almacen import Carril, ModeloAlmacen, PalletModelo
+import sitios
+
+
+# Si una reconstrucción reproduce más movimientos que esto, se guarda un snapshot nuevo
+UMBRAL_MOVIMIENTOS_SNAPSHOT = 2000
+
+# Reconstrucciones recientes que se mantienen en memoria
+TAMANO_CACHE_RECONSTRUCCIONES = 64
+
+# Reconstrucciones por (sitio, instante) y última revisión de snapshots por sitio
+_cache_reconstrucciones = OrderedDict()
+_lock_cache = threading.Lock()
+_ultimo_snapshot_periodico = {}
+
+
+def clave_texto(clave):
+    return "|".join(str(parte) for parte in clave)
+
+
+def contenido_desde_modelo(modelo):
+    """
+    Serializa la ocupación de un modelo como {"tipo|piso|rack|letra": [NPallet desde la posición 1]}.
+    """
+    return {
+        clave_texto(clave): [pallet.npallet for pallet in carril.pallets]
+        for clave, carril in modelo.carriles.items()
+        if carril.pallets
+    }
+
+
+def reconstruir_modelo(layout, contenido, movimientos):
+    """
+    Reconstruye la ocupación aplicando los movimientos del ledger sobre un snapshot.
+
+    `layout` es un ModeloAlmacen del que solo se usan los carriles y sus profundidades.
+    Los movimientos ya ocurrieron en la base de datos, por lo que se aplican sin
+    validar la regla de la posición 1.
+    """
+    modelo = ModeloAlmacen([Carril(clave, carril.profundidad) for clave, carril in layout.carriles.items()])
+    claves = {clave_texto(clave): clave for clave in modelo.carriles}
+
+    for texto, npallets in (contenido or {}).items():
+        clave = claves.get(texto)
+        if clave is None:
+            continue
+        modelo.carriles[clave].pallets = [PalletModelo(n, None, None, None, None) for n in npallets]
+        for npallet in npallets:
+            modelo.ubicacion_pallet[npallet] = clave
+
+    for _, tipo_movimiento, npallet, tipo_almacen, piso, rack, letra in movimientos:
+        if tipo_movimiento == "retiro":
+            modelo.quitar(npallet)
+        elif tipo_movimiento == "asignacion":
+            clave = claves.get(clave_texto((tipo_almacen, piso, rack, letra)))
+            if clave is None:
+                continue
+            modelo.quitar(npallet)
+            carril = modelo.carriles[clave]
+            carril.pallets.insert(0, PalletModelo(npallet, None, None, None, None))
+            modelo.ubicacion_pallet[npallet] = clave
+    return modelo
+
+
+def ocupacion_en(fecha_hora, layout):
+    """
+    Retorna un ModeloAlmacen con la ocupación del almacén en la fecha y hora indicadas.
+
+    Retorna None si el instante es anterior al primer snapshot: el ledger no registra
+    dónde estaban los pallets ubicados antes de su creación.
+    """
+    llave = fecha_hora.replace(microsecond=0)
+    llave_cache = (sitios.sitio_actual(), llave)
+    with _lock_cache:
+        if llave_cache in _cache_reconstrucciones:
+            _cache_reconstrucciones.move_to_end(llave_cache)
+            return _cache_reconstrucciones[llave_cache]
+
+    snapshot = obtener_snapshot_ledger(llave)
+    if snapshot is None:
+        # Sin ningún snapshot se toma el primero ahora; reconstruir desde un almacén
+        # vacío omitiría todos los pallets ubicados antes del ledger
+        if obtener_ultimo_snapshot_ledger()[0] is not None:
+            return None
+        crear_snapshot_ledger()
+        snapshot = obtener_snapshot_ledger(llave)
+        if snapshot is None:
+            return None
+    desde_id, _, contenido_json = snapshot
+    contenido = json.loads(contenido_json)
+
+    movimientos, ahora = obtener_movimientos_ledger(desde_id, llave)
+    modelo = reconstruir_modelo(layout, contenido, movimientos)
+
+    if len(movimientos) > UMBRAL_MOVIMIENTOS_SNAPSHOT:
+        # La próxima reconstrucción cercana parte desde aquí
+        guardar_snapshot_ledger(llave, movimientos[-1][0], json.dumps(contenido_desde_modelo(modelo)))
+
+    # Solo se guardan en cache los instantes pasados según el reloj de la base de datos,
+    # que es el que registra los movimientos; el presente todavía puede cambiar
+    if llave < ahora.replace(microsecond=0):
+        with _lock_cache:
+            _cache_reconstrucciones[llave_cache] = modelo
+            while len(_cache_reconstrucciones) > TAMANO_CACHE_RECONSTRUCCIONES:
+                _cache_reconstrucciones.popitem(last=False)
+    return modelo
+
+
+def crear_snapshot_ledger():
+    """
+    Guarda un snapshot de la ocupación actual junto con el último movimiento registrado.
+    """
+    posiciones, id_movimiento, fecha_hora = obtener_posiciones_y_ultimo_movimiento()
+    modelo = ModeloAlmacen.desde_posiciones(posiciones)
+    guardar_snapshot_ledger(fecha_hora, id_movimiento, json.dumps(contenido_desde_modelo(modelo)))
+
+
+def asegurar_snapshot_periodico(intervalo):
+    """
+    Crea un snapshot si el más reciente tiene más de `intervalo` segundos.
+
+    Se revisa la base de datos del sitio actual como máximo una vez por intervalo en cada proceso.
+    """
+    sitio = sitios.sitio_actual()
+    if intervalo <= 0 or time.monotonic() - _ultimo_snapshot_periodico.get(sitio, 0.0) < intervalo:
+        return
+    _ultimo_snapshot_periodico[sitio] = time.monotonic()
+
+    ultimo, ahora = obtener_ultimo_snapshot_ledger()
+    if ultimo is None or (ahora - ultimo).total_seconds() > intervalo:
+        crear_snapshot_ledger()
@@ -0,0 +1,40 @@
+# limite_tasa.py
+
+import threading
+import time
+
+
+class LimitadorTasa:
+    """
+    Token bucket por cliente: permite ráfagas de `capacidad` solicitudes y luego `tasa` solicitudes por segundo.
+
+    El estado es por proceso, por lo que con varios workers el límite efectivo de
+    un cliente es a lo sumo `tasa` multiplicado por la cantidad de workers.
+    """
+
+    def __init__(self, tasa, capacidad, expiracion=600):
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.expiracion = expiracion
+        self._cubetas = {}
+        self._lock = threading.Lock()
+        self._ultima_limpieza = time.monotonic()
+
+    def permitir(self, cliente):
+        """
+        Consume un token del cliente; retorna False si no le quedan.
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            tokens, ultimo = self._cubetas.get(cliente, (self.capacidad, ahora))
+            tokens = min(self.capacidad, tokens + (ahora - ultimo) * self.tasa)
+            permitido = tokens >= 1
+            self._cubetas[cliente] = (tokens - 1 if permitido else tokens, ahora)
+
+            # Olvidar clientes inactivos para que el diccionario no crezca sin límite
+            if ahora - self._ultima_limpieza > self.expiracion:
+                self._cubetas = {
+                    c: valor for c, valor in self._cubetas.items() if ahora - valor[1] <= self.expiracion
+                }
+                self._ultima_limpieza = ahora
+        return permitido
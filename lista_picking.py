@@ -0,0 +1,65 @@
+# lista_picking.py
+
+import heapq
+import itertools
+
+from modelo_almacen import orden_fecha_faena
+
+
+class IndicePicking:
+    """
+    Índice de pallets por (Variedad, Mercado) ordenado por Fecha Faena y pallets bloqueantes.
+
+    Cada entrada es (orden_fecha, bloqueantes, clave_carril, posicion, pallet). Se
+    construye una vez por snapshot; una consulta solo recorre los primeros elementos
+    de las listas de los grupos pedidos.
+    """
+
+    def __init__(self, modelo):
+        self.grupos = {}
+        for clave, carril in modelo.carriles.items():
+            for i, pallet in enumerate(carril.pallets):
+                entrada = (orden_fecha_faena(pallet.fecha_faena), i, clave, i + 1, pallet)
+                self.grupos.setdefault((pallet.variedad, pallet.mercado), []).append(entrada)
+        for entradas in self.grupos.values():
+            entradas.sort(key=lambda e: (e[0], e[1], str(e[2])))
+
+    def candidatos(self, variedad=None, mercado=None):
+        """
+        Itera los pallets del grupo pedido (None = cualquiera), del más antiguo al más reciente.
+        """
+        listas = [
+            entradas for (v, m), entradas in self.grupos.items()
+            if (variedad is None or v == variedad) and (mercado is None or m == mercado)
+        ]
+        if len(listas) == 1:
+            return iter(listas[0])
+        return heapq.merge(*listas, key=lambda e: (e[0], e[1], str(e[2])))
+
+
+def generar_lista_picking(indice, modelo, cantidad, variedad=None, mercado=None):
+    """
+    Genera la lista de picking FEFO: los `cantidad` pallets más antiguos y más fáciles de alcanzar.
+
+    Retorna una lista de diccionarios con la ubicación de cada pallet y los pallets
+    que hay que mover para llegar a él (sin contar los que también están en la lista).
+    """
+    seleccion = list(itertools.islice(indice.candidatos(variedad, mercado), cantidad))
+    elegidos = {entrada[4].npallet for entrada in seleccion}
+
+    lista = []
+    for _, _, clave, posicion, pallet in seleccion:
+        delante = modelo.carriles[clave].pallets[:posicion - 1]
+        lista.append({
+            "npallet": pallet.npallet,
+            "variedad": pallet.variedad,
+            "mercado": pallet.mercado,
+            "fecha_faena": pallet.fecha_faena,
+            "tipo_almacen": clave[0],
+            "piso": clave[1],
+            "rack": clave[2],
+            "letra": clave[3],
+            "posicion_pallet": posicion,
+            "bloqueantes": [p.npallet for p in delante if p.npallet not in elegidos],
+        })
+    return lista
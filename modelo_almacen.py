@@ -0,0 +1,226 @@
+# modelo_almacen.py
+
+from collections import namedtuple
+
+
+# Índices de las columnas de obtener_todas_las_posiciones()
+COL_TIPO_ALMACEN = 0
+COL_PISO = 1
+COL_RACK = 2
+COL_LETRA = 3
+COL_POSICION = 4
+COL_ID_PALLET = 6
+COL_VARIEDAD = 8
+COL_MERCADO = 9
+COL_FECHA_FAENA = 10
+COL_NPALLET = 11
+
+
+PalletModelo = namedtuple("PalletModelo", ["npallet", "id_pallet", "variedad", "mercado", "fecha_faena"])
+
+
+def orden_fecha_faena(fecha_faena):
+    """
+    Retorna una llave AAAAMMDD comparable para una fecha de faena (AAAAMMDD, DDMMAAAA o fecha de SQL).
+    """
+    if fecha_faena is None:
+        return ""
+    texto = str(fecha_faena).replace("-", "")[:8]
+    if len(texto) == 8 and texto[:2] not in ("19", "20"):
+        # DDMMAAAA
+        return texto[4:] + texto[2:4] + texto[:2]
+    return texto
+
+
+class Carril:
+    """
+    Carril LIFO de un rack: (tipo_almacen, piso, rack, letra) con `profundidad` posiciones.
+
+    `pallets` se guarda desde el frente: pallets[0] está en la posición 1, la única
+    que se puede retirar, y un pallet nuevo entra por el frente empujando al resto.
+    """
+
+    __slots__ = ("clave", "profundidad", "pallets")
+
+    def __init__(self, clave, profundidad, pallets=None):
+        self.clave = clave
+        self.profundidad = profundidad
+        self.pallets = list(pallets or [])
+
+    @property
+    def libres(self):
+        return self.profundidad - len(self.pallets)
+
+    @property
+    def lleno(self):
+        return len(self.pallets) >= self.profundidad
+
+    @property
+    def vacio(self):
+        return not self.pallets
+
+    def copiar(self):
+        return Carril(self.clave, self.profundidad, self.pallets)
+
+
+class ModeloAlmacen:
+    """
+    Modelo en memoria del almacén con la misma semántica que reasignar_pallet/retirar_pallet.
+    """
+
+    def __init__(self, carriles):
+        self.carriles = {carril.clave: carril for carril in carriles}
+        self.ubicacion_pallet = {}
+        for carril in self.carriles.values():
+            for pallet in carril.pallets:
+                self.ubicacion_pallet[pallet.npallet] = carril.clave
+
+    @classmethod
+    def desde_posiciones(cls, posiciones):
+        """
+        Construye el modelo a partir de las filas de obtener_todas_las_posiciones().
+        """
+        profundidades = {}
+        ocupados = {}
+        for fila in posiciones:
+            clave = (fila[COL_TIPO_ALMACEN], fila[COL_PISO], fila[COL_RACK], fila[COL_LETRA])
+            posicion = fila[COL_POSICION] or 0
+            profundidades[clave] = max(profundidades.get(clave, 0), posicion)
+            if fila[COL_NPALLET] is not None:
+                pallet = PalletModelo(
+                    fila[COL_NPALLET],
+                    fila[COL_ID_PALLET],
+                    fila[COL_VARIEDAD],
+                    fila[COL_MERCADO],
+                    str(fila[COL_FECHA_FAENA]) if fila[COL_FECHA_FAENA] is not None else None,
+                )
+                ocupados.setdefault(clave, []).append((posicion, pallet))
+
+        carriles = []
+        for clave, profundidad in profundidades.items():
+            pallets = [pallet for _, pallet in sorted(ocupados.get(clave, []), key=lambda x: x[0])]
+            carriles.append(Carril(clave, profundidad, pallets))
+        return cls(carriles)
+
+    def copiar(self):
+        return ModeloAlmacen([carril.copiar() for carril in self.carriles.values()])
+
+    def posicion(self, npallet):
+        """
+        Retorna (clave del carril, posicion_pallet) de un pallet, o None si no está ubicado.
+        """
+        clave = self.ubicacion_pallet.get(npallet)
+        if clave is None:
+            return None
+        for i, pallet in enumerate(self.carriles[clave].pallets):
+            if pallet.npallet == npallet:
+                return clave, i + 1
+        return None
+
+    def bloqueantes(self, npallet):
+        """
+        Retorna los pallets que están delante del pallet indicado en su carril.
+        """
+        ubicacion = self.posicion(npallet)
+        if ubicacion is None:
+            return []
+        clave, posicion = ubicacion
+        return self.carriles[clave].pallets[:posicion - 1]
+
+    def ingresar(self, clave, pallet):
+        """
+        Ingresa un pallet por el frente del carril. Lanza ValueError si no es posible.
+        """
+        carril = self.carriles.get(clave)
+        if carril is None:
+            raise ValueError(f"La ubicación {clave} no existe.")
+        if carril.lleno:
+            raise ValueError(f"La ubicación {clave} no tiene espacios libres.")
+        if pallet.npallet in self.ubicacion_pallet:
+            raise ValueError(f"El Pallet {pallet.npallet} ya tiene una ubicación asignada.")
+        carril.pallets.insert(0, pallet)
+        self.ubicacion_pallet[pallet.npallet] = clave
+
+    def retirar(self, npallet):
+        """
+        Retira un pallet de la posición 1 de su carril y lo retorna. Lanza ValueError si no es posible.
+        """
+        clave = self.ubicacion_pallet.get(npallet)
+        if clave is None:
+            raise ValueError(f"El Pallet {npallet} no está asignado a ninguna ubicación.")
+        carril = self.carriles[clave]
+        if carril.pallets[0].npallet != npallet:
+            raise ValueError("Solo se puede retirar el pallet de la posición 1.")
+        del self.ubicacion_pallet[npallet]
+        return carril.pallets.pop(0)
+
+    def quitar(self, npallet):
+        """
+        Quita un pallet de su carril sin validar la posición (para reproducir movimientos ya hechos).
+        """
+        clave = self.ubicacion_pallet.pop(npallet, None)
+        if clave is None:
+            return None
+        carril = self.carriles[clave]
+        for i, pallet in enumerate(carril.pallets):
+            if pallet.npallet == npallet:
+                return carril.pallets.pop(i)
+        return None
+
+    def contenido_carriles(self, claves):
+        """
+        Retorna [[clave, [id_pallet desde la posición 1]]] de los carriles indicados (serializable a JSON).
+        """
+        return [
+            [list(clave), [pallet.id_pallet for pallet in self.carriles[clave].pallets]]
+            for clave in claves if clave in self.carriles
+        ]
+
+    def posiciones(self):
+        """
+        Retorna las filas del modelo con el formato de obtener_todas_las_posiciones().
+        """
+        filas = []
+        for (tipo_almacen, piso, rack, letra), carril in self.carriles.items():
+            for posicion in range(1, carril.profundidad + 1):
+                if posicion <= len(carril.pallets):
+                    p = carril.pallets[posicion - 1]
+                    filas.append((tipo_almacen, piso, rack, letra, posicion, "Ocupado", p.id_pallet,
+                                  None, p.variedad, p.mercado, p.fecha_faena, p.npallet))
+                else:
+                    filas.append((tipo_almacen, piso, rack, letra, posicion, "Libre", None,
+                                  None, None, None, None, None))
+        return filas
+
+    def total_posiciones(self):
+        return sum(carril.profundidad for carril in self.carriles.values())
+
+    def total_ocupadas(self):
+        return len(self.ubicacion_pallet)
+
+
+def generar_layout_sintetico(tipos=("A",), pisos=3, racks=2, letras=20, profundidad=6):
+    """
+    Genera las filas de un layout sintético con el formato de obtener_todas_las_posiciones().
+    """
+    nombres_letras = [_nombre_letra(i) for i in range(letras)]
+    posiciones = []
+    for tipo in tipos:
+        for piso in range(1, pisos + 1):
+            for rack in range(1, racks + 1):
+                for letra in nombres_letras:
+                    for posicion in range(1, profundidad + 1):
+                        posiciones.append(
+                            (tipo, piso, rack, letra, posicion, "Libre", None, None, None, None, None, None)
+                        )
+    return posiciones
+
+
+def _nombre_letra(i):
+    # A..Z, AA..AZ, BA.. para layouts con más de 26 letras por rack
+    nombre = ""
+    i += 1
+    while i:
+        i, resto = divmod(i - 1, 26)
+        nombre = chr(65 + resto) + nombre
+    return nombre
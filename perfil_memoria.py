@@ -0,0 +1,193 @@
+# perfil_memoria.py
+#
+# Medición opcional de memoria por callback de Dash con tracemalloc.
+#
+# Con PERFIL_MEMORIA=1 cada invocación de un callback registra:
+#   - el pico de memoria asignada durante la solicitud, sobre lo que ya estaba asignado
+#     al empezar (DataFrames, tablas cruzadas, componentes y la respuesta JSON),
+#   - la memoria que quedó retenida al terminar,
+#   - los sitios (archivo:línea) que más memoria retienen, con PERFIL_MEMORIA_SITIOS > 0.
+# El resumen por callback se consulta en /debug/memoria.
+#
+# tracemalloc es global al proceso: con varios hilos por worker las asignaciones de
+# solicitudes simultáneas se suman a la medición en curso, y las que empiezan mientras
+# otra se mide no se miden (cuentan como "omitidas"). Para perfiles exactos conviene
+# GUNICORN_THREADS=1. tracemalloc hace más lenta cada asignación; no se activa por
+# defecto. benchmarks/memoria_callbacks.py usa medir() para los presupuestos de memoria.
+
+import os
+import threading
+import time
+import tracemalloc
+from collections import namedtuple
+
+
+PERFIL_MEMORIA = os.getenv("PERFIL_MEMORIA") == "1"
+
+# Sitios de asignación que se guardan por medición (tomar los snapshots tiene su costo)
+SITIOS_POR_MEDICION = int(os.getenv("PERFIL_MEMORIA_SITIOS", "10"))
+
+# Cuadros de la pila que guarda tracemalloc por bloque asignado
+PROFUNDIDAD_PILA = 1
+
+Medicion = namedtuple("Medicion", ["pico", "retenido", "sitios"])
+
+# Asignaciones del propio tracemalloc, que no son del código medido
+_FILTROS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+)
+
+
+def _mb(bytes_):
+    return round(bytes_ / 1024 / 1024, 3)
+
+
+def iniciar_medicion(sitios=SITIOS_POR_MEDICION):
+    """
+    Empieza a medir; retorna el estado que recibe terminar_medicion.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(PROFUNDIDAD_PILA)
+    anterior = tracemalloc.take_snapshot().filter_traces(_FILTROS) if sitios else None
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0], anterior, sitios
+
+
+def terminar_medicion(estado):
+    """
+    Retorna la Medicion (bytes) desde iniciar_medicion: pico, retenido y los sitios que más crecieron.
+    """
+    base, anterior, sitios = estado
+    actual, pico = tracemalloc.get_traced_memory()
+    principales = []
+    if anterior is not None:
+        diferencias = tracemalloc.take_snapshot().filter_traces(_FILTROS).compare_to(anterior, "lineno")
+        for diferencia in diferencias[:sitios]:
+            if diferencia.size_diff <= 0:
+                break
+            cuadro = diferencia.traceback[0]
+            principales.append((f"{cuadro.filename}:{cuadro.lineno}", diferencia.size_diff, diferencia.count_diff))
+    return Medicion(max(0, pico - base), actual - base, principales)
+
+
+def medir(funcion, *args, **kwargs):
+    """
+    Ejecuta funcion(*args, **kwargs) midiendo su memoria; retorna (resultado, Medicion).
+
+    El resultado sigue vivo al terminar la medición, así que lo que retorna la
+    función (por ejemplo, los componentes de Dash) cuenta como retenido.
+    """
+    estado = iniciar_medicion()
+    resultado = funcion(*args, **kwargs)
+    return resultado, terminar_medicion(estado)
+
+
+class RegistroMemoria:
+    """
+    Acumula las mediciones de cada callback: cantidad, pico máximo y promedio, y los
+    sitios de asignación de la invocación con el mayor pico.
+    """
+
+    def __init__(self):
+        self._callbacks = {}
+        self._lock = threading.Lock()
+
+    def _datos(self, nombre):
+        if nombre not in self._callbacks:
+            self._callbacks[nombre] = {
+                "n": 0, "omitidas": 0, "pico_max": 0, "suma_picos": 0, "retenido_max": 0, "ms_max": 0, "sitios": [],
+            }
+        return self._callbacks[nombre]
+
+    def registrar(self, nombre, medicion, ms):
+        with self._lock:
+            datos = self._datos(nombre)
+            datos["n"] += 1
+            datos["suma_picos"] += medicion.pico
+            datos["retenido_max"] = max(datos["retenido_max"], medicion.retenido)
+            datos["ms_max"] = max(datos["ms_max"], ms)
+            if medicion.pico >= datos["pico_max"]:
+                datos["pico_max"] = medicion.pico
+                datos["sitios"] = medicion.sitios
+
+    def omitir(self, nombre):
+        with self._lock:
+            self._datos(nombre)["omitidas"] += 1
+
+    def resumen(self):
+        """
+        Estado por callback en MB, ordenado por pico máximo.
+        """
+        with self._lock:
+            callbacks = sorted(self._callbacks.items(), key=lambda item: -item[1]["pico_max"])
+            return {
+                "pid": os.getpid(),
+                "memoria_trazada_mb": _mb(tracemalloc.get_traced_memory()[0]) if tracemalloc.is_tracing() else None,
+                "callbacks": [
+                    {
+                        "callback": nombre,
+                        "n": datos["n"],
+                        "omitidas": datos["omitidas"],
+                        "pico_max_mb": _mb(datos["pico_max"]),
+                        "pico_promedio_mb": _mb(datos["suma_picos"] / datos["n"]) if datos["n"] else None,
+                        "retenido_max_mb": _mb(datos["retenido_max"]),
+                        "ms_max": round(datos["ms_max"], 1),
+                        "sitios": [
+                            {"sitio": sitio, "mb": _mb(tamano), "bloques": bloques}
+                            for sitio, tamano, bloques in datos["sitios"]
+                        ],
+                    }
+                    for nombre, datos in callbacks
+                ],
+            }
+
+
+registro = RegistroMemoria()
+
+# Una sola medición a la vez por proceso: tracemalloc no distingue hilos
+_lock_medicion = threading.Lock()
+
+
+def _nombre_callback(app, salida):
+    """Nombre de la función del callback que atiende `salida`; si no se encuentra, la salida."""
+    funcion = app.callback_map.get(salida, {}).get("callback")
+    return getattr(funcion, "__name__", None) or salida or "?"
+
+
+def instrumentar_dash(app):
+    """
+    Mide la memoria de cada invocación de callback de `app` y publica /debug/memoria. Sin PERFIL_MEMORIA no hace nada.
+    """
+    if not PERFIL_MEMORIA:
+        return
+
+    from flask import g, jsonify, request
+
+    server = app.server
+    tracemalloc.start(PROFUNDIDAD_PILA)
+
+    @server.before_request
+    def _inicio_medicion():
+        if request.path != "/_dash-update-component":
+            return
+        nombre = _nombre_callback(app, (request.get_json(silent=True) or {}).get("output"))
+        if not _lock_medicion.acquire(blocking=False):
+            registro.omitir(nombre)
+            return
+        g.medicion_memoria = (nombre, time.perf_counter(), iniciar_medicion())
+
+    @server.teardown_request
+    def _fin_medicion(_error):
+        medicion = g.pop("medicion_memoria", None)
+        if medicion is None:
+            return
+        nombre, inicio, estado = medicion
+        try:
+            registro.registrar(nombre, terminar_medicion(estado), (time.perf_counter() - inicio) * 1000)
+        finally:
+            _lock_medicion.release()
+
+    @server.route("/debug/memoria")
+    def debug_memoria():
+        return jsonify(registro.resumen())
@@ -0,0 +1,97 @@
+# planificador_retiro.py
+
+import time
+
+from recomendador import puntaje_carril
+
+
+# Tiempo máximo para elegir destinos óptimos; después se usa el primer carril válido
+PRESUPUESTO_PLANIFICACION = 0.5
+
+
+def _pallets_a_mover(carril, objetivos):
+    """
+    Cantidad de pallets que no son objetivos y están delante del objetivo más profundo del carril.
+    """
+    mas_profundo = max(i for i, p in enumerate(carril.pallets) if p.npallet in objetivos)
+    return sum(1 for p in carril.pallets[:mas_profundo] if p.npallet not in objetivos)
+
+
+def _elegir_destino(modelo, pallet, origen, carriles_con_objetivos, limite_tiempo):
+    """
+    Elige el carril donde reubicar un pallet bloqueante sin tapar pallets por despachar.
+    """
+    mejor = None
+    for clave, carril in modelo.carriles.items():
+        if clave == origen or carril.lleno or clave in carriles_con_objetivos:
+            continue
+        if time.perf_counter() > limite_tiempo:
+            return clave
+        # Preferir carriles cercanos: mismo tipo, piso y rack que el origen
+        distancia = (clave[0] != origen[0], abs((clave[1] or 0) - (origen[1] or 0)), clave[2] != origen[2])
+        candidato = (puntaje_carril(carril, pallet), distancia, str(clave), clave)
+        if mejor is None or candidato < mejor:
+            mejor = candidato
+    return mejor[-1] if mejor else None
+
+
+def planificar_retiro(modelo, npallets, presupuesto=PRESUPUESTO_PLANIFICACION):
+    """
+    Calcula la secuencia de movimientos para despachar una lista de NPallet respetando la regla de la posición 1.
+
+    Cada pallet que no se despacha y está delante de uno que sí se despacha se
+    reubica una sola vez en un carril sin pallets pendientes, por lo que la cantidad
+    de reubicaciones es la mínima posible mientras haya espacio libre. El modelo
+    recibido no se modifica.
+
+    Retorna un diccionario con:
+        pasos: lista de {"accion": "retirar" | "reubicar", "npallet", "id_pallet", "origen", "destino"}
+        faltantes: NPallet que no están ubicados en el almacén
+        completo: False si no hubo espacio para reubicar algún pallet bloqueante
+    """
+    limite_tiempo = time.perf_counter() + presupuesto
+    modelo = modelo.copiar()
+
+    faltantes = [n for n in npallets if n not in modelo.ubicacion_pallet]
+    por_carril = {}
+    for npallet in npallets:
+        clave = modelo.ubicacion_pallet.get(npallet)
+        if clave is not None:
+            por_carril.setdefault(clave, set()).add(npallet)
+
+    # Primero los carriles más baratos: al vaciarse quedan disponibles como destino
+    orden = sorted(por_carril, key=lambda c: (_pallets_a_mover(modelo.carriles[c], por_carril[c]), str(c)))
+    pasos = []
+
+    for clave in orden:
+        carril = modelo.carriles[clave]
+        objetivos = por_carril[clave]
+        while objetivos:
+            frente = carril.pallets[0]
+            if frente.npallet in objetivos:
+                modelo.retirar(frente.npallet)
+                objetivos.discard(frente.npallet)
+                pasos.append({
+                    "accion": "retirar",
+                    "npallet": frente.npallet,
+                    "id_pallet": frente.id_pallet,
+                    "origen": clave,
+                    "destino": None,
+                })
+                continue
+
+            destino = _elegir_destino(modelo, frente, clave, por_carril, limite_tiempo)
+            if destino is None:
+                return {"pasos": pasos, "faltantes": faltantes, "completo": False}
+            modelo.retirar(frente.npallet)
+            modelo.ingresar(destino, frente)
+            pasos.append({
+                "accion": "reubicar",
+                "npallet": frente.npallet,
+                "id_pallet": frente.id_pallet,
+                "origen": clave,
+                "destino": destino,
+            })
+        del por_carril[clave]
+
+    return {"pasos": pasos, "faltantes": faltantes, "completo": True}
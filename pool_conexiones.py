@@ -0,0 +1,156 @@
+# pool_conexiones.py
+
+import os
+import threading
+import time
+
+
+# Conexiones abiertas a la vez por sitio y destino. Cuando un sitio las ocupa todas,
+# sus solicitudes esperan (y luego fallan) sin tomar las conexiones de otro sitio.
+MAXIMO_CONEXIONES = int(os.getenv("BD_POOL_MAXIMO", "16"))
+
+# Conexiones sin uso que se mantienen abiertas para la próxima solicitud
+MAXIMO_INACTIVAS = int(os.getenv("BD_POOL_INACTIVAS", "4"))
+
+# Segundos que una solicitud espera una conexión libre antes de fallar
+ESPERA_CONEXION = float(os.getenv("BD_POOL_ESPERA_SEGUNDOS", "5"))
+
+# Una conexión inactiva por más de estos segundos se cierra en vez de reutilizarse
+INACTIVIDAD_MAXIMA = float(os.getenv("BD_POOL_INACTIVIDAD_SEGUNDOS", "300"))
+
+
+class PoolAgotado(ConnectionError):
+    """
+    Todas las conexiones del pool siguen en uso después de ESPERA_CONEXION segundos.
+    """
+
+
+def _cerrar(conexion):
+    try:
+        conexion.close()
+    except Exception as e:
+        print(f"Error al cerrar una conexión del pool: {e}")
+
+
+class ConexionPool:
+    """
+    Conexión prestada por un PoolConexiones; close() la devuelve al pool en vez de cerrarla.
+    """
+
+    def __init__(self, pool, conexion):
+        self._pool = pool
+        self._conexion = conexion
+        self._pid = os.getpid()
+
+    def __getattr__(self, nombre):
+        return getattr(self._conexion, nombre)
+
+    def close(self):
+        conexion, self._conexion = self._conexion, None
+        # Prestada antes de un fork: su cupo pertenece al pool del proceso padre
+        if conexion is not None and self._pid == os.getpid():
+            self._pool.devolver(conexion)
+
+    def __del__(self):
+        # Una conexión que nadie cerró igual libera su cupo
+        self.close()
+
+
+class PoolConexiones:
+    """
+    Pool acotado de conexiones a una base de datos, por proceso.
+
+    `conectar()` abre una conexión nueva (y registra el resultado en `circuito`). Al
+    devolverse, la conexión se deshace con rollback y queda inactiva para la siguiente
+    solicitud. Mientras el circuito no está cerrado no se reutilizan conexiones: cada
+    solicitud pasa por `conectar()` para que el circuito decida.
+    """
+
+    def __init__(self, conectar, circuito, maximo=MAXIMO_CONEXIONES, inactivas=MAXIMO_INACTIVAS,
+                 espera=ESPERA_CONEXION, inactividad=INACTIVIDAD_MAXIMA):
+        self.conectar = conectar
+        self.circuito = circuito
+        self.maximo = maximo
+        self.maximo_inactivas = inactivas
+        self.espera = espera
+        self.inactividad = inactividad
+        self._lock = threading.Lock()
+        self._reiniciar()
+
+    def _reiniciar(self):
+        # Las conexiones y los cupos del proceso padre no sirven después de un fork
+        self._pid = os.getpid()
+        self._inactivas = []
+        self._cupos = threading.BoundedSemaphore(self.maximo)
+        self.en_uso = 0
+        self.rechazadas = 0
+
+    def _tomar_inactiva(self):
+        if self.circuito.estado != "cerrado":
+            self._vaciar()
+            return None
+        limite = time.monotonic() - self.inactividad
+        vencidas = []
+        conexion = None
+        with self._lock:
+            while self._inactivas:
+                candidata, devuelta = self._inactivas.pop()
+                if devuelta >= limite:
+                    conexion = candidata
+                    break
+                vencidas.append(candidata)
+        for vencida in vencidas:
+            _cerrar(vencida)
+        return conexion
+
+    def _vaciar(self):
+        with self._lock:
+            inactivas, self._inactivas = self._inactivas, []
+        for conexion, _ in inactivas:
+            _cerrar(conexion)
+
+    def obtener(self):
+        """
+        Presta una conexión; lanza PoolAgotado si no se libera ninguna a tiempo.
+        """
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._reiniciar()
+        cupos = self._cupos
+        if not cupos.acquire(timeout=self.espera):
+            with self._lock:
+                self.rechazadas += 1
+            raise PoolAgotado(f"Las {self.maximo} conexiones a la base de datos están en uso, intente nuevamente.")
+        try:
+            conexion = self._tomar_inactiva() or self.conectar()
+        except BaseException:
+            cupos.release()
+            raise
+        with self._lock:
+            self.en_uso += 1
+        return ConexionPool(self, conexion)
+
+    def devolver(self, conexion):
+        try:
+            conexion.rollback()
+        except Exception:
+            # La conexión quedó inservible (por ejemplo, la base de datos se reinició)
+            _cerrar(conexion)
+            conexion = None
+        with self._lock:
+            self.en_uso -= 1
+            if conexion is not None and len(self._inactivas) < self.maximo_inactivas:
+                self._inactivas.append((conexion, time.monotonic()))
+                conexion = None
+        if conexion is not None:
+            _cerrar(conexion)
+        self._cupos.release()
+
+    def resumen(self):
+        return {
+            "en_uso": self.en_uso,
+            "inactivas": len(self._inactivas),
+            "maximo": self.maximo,
+            "rechazadas": self.rechazadas,
+        }
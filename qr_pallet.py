@@ -0,0 +1,114 @@
+# qr_pallet.py
+#
+# Formato del código QR de un pallet: Variedad,Descripción,Mercado,FechaFaena,NPallet
+# con FechaFaena de 8 dígitos y NPallet de 8 caracteres.
+
+from collections import namedtuple
+from itertools import repeat
+
+
+RegistroQR = namedtuple("RegistroQR", ["variedad", "descripcion", "mercado", "fecha_faena", "n_pallet"])
+
+
+def _es_numero(texto):
+    return texto.isascii() and texto.isdigit()
+
+
+def _error_qr(datos):
+    """
+    Retorna el mensaje de error de los campos de un QR, o None si son válidos.
+    """
+    if len(datos) != 5:
+        return "El formato del QR no es válido. Debe tener 5 campos separados por comas."
+    fecha_faena, n_pallet = datos[3], datos[4]
+    if len(fecha_faena) != 8 or not _es_numero(fecha_faena):
+        return f"La Fecha Faena debe tener exactamente 8 caracteres numéricos. Valor proporcionado: {fecha_faena}"
+    if len(n_pallet) != 8:
+        return f"El NPallet debe tener exactamente 8 caracteres. Valor proporcionado: {n_pallet}"
+    return None
+
+
+def validar_qr(linea):
+    """
+    Valida un código QR y retorna (RegistroQR, None) o (None, mensaje de error).
+    """
+    datos = linea.split(",")
+    error = _error_qr(datos)
+    if error:
+        return None, error
+    return RegistroQR._make(datos), None
+
+
+def extraer_npallet(texto):
+    """
+    Extrae el NPallet (último campo) de un QR completo o de un NPallet escaneado solo.
+    Retorna (n_pallet, None) o (None, mensaje de error).
+    """
+    n_pallet = (texto or "").rsplit(",", 1)[-1].strip()
+    if len(n_pallet) != 8 or not _es_numero(n_pallet):
+        return None, "El NPallet extraído no es válido."
+    return n_pallet, None
+
+
+class LoteQR:
+    """
+    Resultado de validar un lote de códigos QR, guardado por columnas.
+
+    `lineas` tiene el número de línea de cada registro válido y `variedad`,
+    `descripcion`, `mercado`, `fecha_faena` y `n_pallet` sus campos, en el mismo
+    orden. `errores` es una lista de (número de línea, mensaje).
+    """
+
+    def __init__(self, lineas, columnas, errores):
+        self.lineas = lineas
+        self.variedad, self.descripcion, self.mercado, self.fecha_faena, self.n_pallet = columnas
+        self.errores = errores
+
+    def __len__(self):
+        return len(self.lineas)
+
+    def registros(self):
+        """
+        Itera (número de línea, RegistroQR) de los registros válidos.
+        """
+        columnas = zip(self.variedad, self.descripcion, self.mercado, self.fecha_faena, self.n_pallet)
+        return zip(self.lineas, map(RegistroQR._make, columnas))
+
+
+def validar_lote(texto):
+    """
+    Valida un lote de códigos QR, uno por línea (las líneas vacías se ignoran), y retorna un LoteQR.
+
+    El lote se valida por columnas: se parte el texto completo en campos una sola vez
+    y cada regla se comprueba sobre la columna entera con operaciones de str, set y
+    map que recorren los datos en C, sin crear un objeto por línea. Solo si alguna
+    regla falla se revisa línea por línea para saber cuáles son las erróneas.
+    """
+    lineas = texto.replace("\r\n", "\n").split("\n")
+    no_vacias = list(filter(None, lineas))
+    if not no_vacias:
+        return LoteQR([], ([], [], [], [], []), [])
+
+    if set(map(str.count, no_vacias, repeat(","))) == {4}:
+        campos = ",".join(no_vacias).split(",")
+        fechas, npallets = campos[3::5], campos[4::5]
+        if set(map(len, fechas)) == {8} and _es_numero("".join(fechas)) and set(map(len, npallets)) == {8}:
+            if len(no_vacias) == len(lineas):
+                numeros = range(1, len(lineas) + 1)
+            else:
+                numeros = [numero for numero, linea in enumerate(lineas, start=1) if linea]
+            return LoteQR(numeros, (campos[0::5], campos[1::5], campos[2::5], fechas, npallets), [])
+
+    numeros, validos, errores = [], [], []
+    for numero, linea in enumerate(lineas, start=1):
+        if not linea:
+            continue
+        datos = linea.split(",")
+        error = _error_qr(datos)
+        if error:
+            errores.append((numero, error))
+        else:
+            numeros.append(numero)
+            validos.append(datos)
+    columnas = [list(columna) for columna in zip(*validos)] if validos else ([], [], [], [], [])
+    return LoteQR(numeros, columnas, errores)
@@ -0,0 +1,60 @@
+# recomendador.py
+
+import heapq
+
+from modelo_almacen import orden_fecha_faena
+
+
+# Pesos del puntaje de un carril (menor es mejor)
+PESO_CARRIL_VACIO = 3.0      # usar un carril vacío consume un carril completo
+PESO_BLOQUEO = 5.0           # por cada pallet que quedaría bloqueado detrás del nuevo
+PESO_LLENADO = 1.0           # bonificación por completar carriles ya empezados
+
+
+def puntaje_carril(carril, pallet, orden_fecha=None):
+    """
+    Retorna el puntaje de ingresar `pallet` en `carril`, o None si el carril está lleno.
+
+    Un pallet queda bloqueado si es de otra Variedad/Mercado (se despacha por separado)
+    o si es del mismo grupo pero con una Fecha Faena más antigua (debe salir primero).
+    """
+    if carril.lleno:
+        return None
+    if carril.vacio:
+        return PESO_CARRIL_VACIO
+
+    if orden_fecha is None:
+        orden_fecha = orden_fecha_faena(pallet.fecha_faena)
+
+    bloqueados = 0
+    for p in carril.pallets:
+        if p.variedad != pallet.variedad or p.mercado != pallet.mercado:
+            bloqueados += 1
+        elif orden_fecha and p.fecha_faena is not None and orden_fecha_faena(p.fecha_faena) < orden_fecha:
+            bloqueados += 1
+
+    return PESO_BLOQUEO * bloqueados - PESO_LLENADO * len(carril.pallets) / carril.profundidad
+
+
+def recomendar_ubicaciones(modelo, pallet, limite=3, tipo_almacen=None, piso=None, rack=None):
+    """
+    Recomienda los mejores carriles libres para ingresar un pallet.
+
+    Retorna una lista de (puntaje, clave) ordenada de mejor a peor, donde clave es
+    (tipo_almacen, piso, rack, letra). A igual puntaje se prefieren pisos bajos.
+    """
+    orden_fecha = orden_fecha_faena(pallet.fecha_faena)
+    candidatos = []
+    for clave, carril in modelo.carriles.items():
+        if (
+            (tipo_almacen and clave[0] != tipo_almacen)
+            or (piso and clave[1] != piso)
+            or (rack and clave[2] != rack)
+        ):
+            continue
+        puntaje = puntaje_carril(carril, pallet, orden_fecha)
+        if puntaje is not None:
+            candidatos.append((puntaje, clave[1], clave))
+
+    mejores = heapq.nsmallest(limite, candidatos, key=lambda c: (c[0], c[1], str(c[2])))
+    return [(puntaje, clave) for puntaje, _, clave in mejores]
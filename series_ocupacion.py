@@ -0,0 +1,167 @@
+# series_ocupacion.py
+
+import fcntl
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+import sitios
+
+
+# Directorio de los archivos de series; debe ser persistente para comparar temporadas.
+# Las series del sitio predeterminado van en él y las de otros sitios en un subdirectorio.
+SERIES_OCUPACION_DIR = os.getenv(
+    "SERIES_OCUPACION_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos_series"),
+)
+
+# Segundos entre muestras de un mismo proceso (0 desactiva las series). Las muestras se
+# toman con un hilo por sitio, haya o no páginas abiertas (ver cache_almacen).
+INTERVALO_MUESTREO = float(os.getenv("SERIES_MUESTREO_SEGUNDOS", "60"))
+
+# Resoluciones de los rollups: nombre -> (segundos por bucket, cantidad de buckets del ring buffer)
+RESOLUCIONES = {
+    "1m": (60, 7 * 1440),       # una semana por minuto
+    "1h": (3600, 180 * 24),     # seis meses por hora
+    "1d": (86400, 5 * 366),     # cinco años por día
+}
+
+# Un bucket: inicio (epoch), cantidad de muestras, suma, mínimo y máximo
+_REGISTRO = struct.Struct("<qIddd")
+
+
+class SerieRing:
+    """
+    Ring buffer de buckets de tamaño fijo en un archivo mapeado en memoria.
+
+    Cada bucket acumula las muestras de su intervalo, por lo que el rollup se
+    mantiene al escribir y leer nunca recorre muestras crudas. Varios workers pueden
+    escribir en el mismo archivo; cada actualización se hace bajo flock.
+    """
+
+    def __init__(self, ruta, segundos, capacidad):
+        self.segundos = segundos
+        self.capacidad = capacidad
+        self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o644)
+        tamano = capacidad * _REGISTRO.size
+        if os.fstat(self._fd).st_size < tamano:
+            os.ftruncate(self._fd, tamano)
+        self._mapa = mmap.mmap(self._fd, tamano)
+
+    def agregar(self, instante, valor):
+        inicio = int(instante) // self.segundos * self.segundos
+        desplazamiento = (inicio // self.segundos) % self.capacidad * _REGISTRO.size
+
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            actual, cantidad, suma, minimo, maximo = _REGISTRO.unpack_from(self._mapa, desplazamiento)
+            if actual != inicio or cantidad == 0:
+                # El bucket pertenece a una vuelta anterior del ring: se reinicia
+                registro = (inicio, 1, valor, valor, valor)
+            else:
+                registro = (inicio, cantidad + 1, suma + valor, min(minimo, valor), max(maximo, valor))
+            _REGISTRO.pack_into(self._mapa, desplazamiento, *registro)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def leer(self, desde=None, hasta=None):
+        """
+        Retorna [(inicio, promedio, mínimo, máximo)] ordenados por inicio.
+        """
+        puntos = []
+        for inicio, cantidad, suma, minimo, maximo in _REGISTRO.iter_unpack(self._mapa):
+            if cantidad == 0:
+                continue
+            if (desde is not None and inicio < desde) or (hasta is not None and inicio > hasta):
+                continue
+            puntos.append((inicio, suma / cantidad, minimo, maximo))
+        puntos.sort()
+        return puntos
+
+
+_series = {}
+_lock_series = threading.Lock()
+_ultimo_muestreo = {}
+
+
+def _directorio():
+    """
+    Directorio de las series del sitio actual.
+    """
+    if sitios.es_predeterminado():
+        return SERIES_OCUPACION_DIR
+    return os.path.join(SERIES_OCUPACION_DIR, sitios.sitio_actual())
+
+
+def _nombre_archivo(serie, resolucion):
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", serie) + f".{resolucion}.ring"
+
+
+def _obtener_serie(serie, resolucion):
+    directorio = _directorio()
+    llave = (directorio, serie, resolucion)
+    with _lock_series:
+        if llave not in _series:
+            os.makedirs(directorio, exist_ok=True)
+            segundos, capacidad = RESOLUCIONES[resolucion]
+            ruta = os.path.join(directorio, _nombre_archivo(serie, resolucion))
+            _series[llave] = SerieRing(ruta, segundos, capacidad)
+        return _series[llave]
+
+
+def registrar(serie, valor, instante=None):
+    """
+    Agrega una muestra a todos los rollups de una serie.
+    """
+    instante = time.time() if instante is None else instante
+    for resolucion in RESOLUCIONES:
+        _obtener_serie(serie, resolucion).agregar(instante, valor)
+
+
+def leer(serie, resolucion, desde=None, hasta=None):
+    """
+    Lee los buckets de una serie en la resolución pedida ("1m", "1h" o "1d").
+    """
+    return _obtener_serie(serie, resolucion).leer(desde, hasta)
+
+
+def series_disponibles():
+    """
+    Retorna los nombres de las series del sitio actual que tienen archivos en el directorio.
+    """
+    directorio = _directorio()
+    if not os.path.isdir(directorio):
+        return []
+    sufijo = ".1m.ring"
+    return sorted(nombre[:-len(sufijo)] for nombre in os.listdir(directorio) if nombre.endswith(sufijo))
+
+
+def utilizacion_por_serie(posiciones):
+    """
+    Calcula el porcentaje de utilización general, por tipo de almacén y por rack.
+    """
+    totales = {}
+    for fila in posiciones:
+        ocupada = fila[11] is not None
+        for serie in ("general", f"tipo_{fila[0]}", f"rack_{fila[0]}_{fila[2]}"):
+            total, ocupadas = totales.get(serie, (0, 0))
+            totales[serie] = (total + 1, ocupadas + ocupada)
+    return {serie: ocupadas / total * 100 for serie, (total, ocupadas) in totales.items() if total}
+
+
+def muestrear(posiciones):
+    """
+    Registra la utilización actual del sitio, como máximo una vez cada INTERVALO_MUESTREO segundos por proceso.
+    """
+    if INTERVALO_MUESTREO <= 0:
+        return
+    sitio = sitios.sitio_actual()
+    ahora = time.time()
+    if ahora - _ultimo_muestreo.get(sitio, 0.0) < INTERVALO_MUESTREO:
+        return
+    _ultimo_muestreo[sitio] = ahora
+    for serie, valor in utilizacion_por_serie(posiciones).items():
+        registrar(serie, valor, ahora)
@@ -0,0 +1,387 @@
+# simulador_almacen.py
+#
+# Simulador de eventos discretos del almacén para planificar capacidad y throughput.
+# Usa el mismo modelo de carriles LIFO que la aplicación (ModeloAlmacen): un pallet
+# entra por el frente del carril y solo se retira desde la posición 1, por lo que
+# despachar un pallet tapado obliga a mover antes los que tiene delante.
+#
+# El flujo de eventos puede ser sintético (una temporada de llegadas y despachos) o
+# grabado en un CSV con las columnas:
+#
+#   fecha_hora,evento,npallet,variedad,mercado,fecha_faena
+#   2024-03-01 08:15:00,llegada,00012345,Cerdo,China,20240229
+#   2024-03-01 09:40:00,despacho,,Cerdo,China,
+#
+# En un despacho el npallet es opcional: sin él se despacha el pallet más antiguo
+# (FEFO) de la Variedad y Mercado indicados.
+#
+# Uso:
+#   python simulador_almacen.py --dias 180 --llegadas-dia 400 --politicas lotes,recomendador
+#   python simulador_almacen.py --layout layout.csv --flujo eventos.csv --bloqueantes devolver
+
+import argparse
+import csv
+import heapq
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from layout_almacen import generar_layout, leer_layout
+from modelo_almacen import Carril, ModeloAlmacen, PalletModelo, orden_fecha_faena
+from recomendador import recomendar_ubicaciones
+
+
+VARIEDADES = ["Cerdo", "Pollo", "Pavo", "Vacuno", "Cordero"]
+MERCADOS = ["Nacional", "China", "Corea", "USA"]
+
+POLITICAS = ("lotes", "recomendador", "aleatoria")
+
+# Al despachar un pallet tapado, los que están delante se reubican en otro carril
+# ("reubicar") o se sacan y se vuelven a ingresar en el mismo ("devolver")
+MODOS_BLOQUEANTES = ("reubicar", "devolver")
+
+# Pallets de la misma fecha que se comparan para despachar el menos tapado
+CANDIDATOS_FEFO = 32
+
+
+def flujo_sintetico(dias, llegadas_por_dia, despachos_por_dia=None, semilla=7, horas_turno=(8, 20)):
+    """
+    Genera eventos (segundos desde el inicio, "llegada" | "despacho", dato) ordenados por instante.
+
+    En una llegada el dato es un PalletModelo; en un despacho es (variedad, mercado).
+    Las llegadas traen fecha de faena de hasta dos días antes de su ingreso.
+    """
+    rnd = random.Random(semilla)
+    despachos_por_dia = llegadas_por_dia if despachos_por_dia is None else despachos_por_dia
+    inicio_turno, fin_turno = horas_turno[0] * 3600, horas_turno[1] * 3600
+    primer_dia = date(2024, 1, 1)
+    numero = 0
+    for dia in range(dias):
+        eventos = []
+        for _ in range(llegadas_por_dia):
+            numero += 1
+            fecha = primer_dia + timedelta(days=dia - rnd.randint(0, 2))
+            pallet = PalletModelo(f"{numero:08d}", numero, rnd.choice(VARIEDADES), rnd.choice(MERCADOS), f"{fecha:%Y%m%d}")
+            eventos.append((dia * 86400 + rnd.uniform(inicio_turno, fin_turno), "llegada", pallet))
+        for _ in range(despachos_por_dia):
+            grupo = (rnd.choice(VARIEDADES), rnd.choice(MERCADOS))
+            eventos.append((dia * 86400 + rnd.uniform(inicio_turno, fin_turno), "despacho", grupo))
+        eventos.sort(key=lambda evento: evento[0])
+        yield from eventos
+
+
+def leer_flujo(archivo):
+    """
+    Lee un flujo grabado en CSV y genera los mismos eventos que flujo_sintetico.
+    Lanza ValueError indicando la línea si el archivo no es válido.
+    """
+    inicio = None
+    numero = 0
+    for linea, fila in enumerate(csv.DictReader(archivo), start=2):
+        try:
+            instante = datetime.fromisoformat(fila["fecha_hora"].strip())
+            evento = fila["evento"].strip()
+        except (KeyError, AttributeError, ValueError):
+            raise ValueError(f"Línea {linea}: se esperaba fecha_hora ISO y evento.")
+        if inicio is None:
+            inicio = instante
+        segundos = (instante - inicio).total_seconds()
+        npallet = (fila.get("npallet") or "").strip()
+        grupo = ((fila.get("variedad") or "").strip(), (fila.get("mercado") or "").strip())
+
+        if evento == "llegada":
+            numero += 1
+            fecha_faena = (fila.get("fecha_faena") or "").strip() or None
+            yield segundos, "llegada", PalletModelo(npallet or f"S{numero:07d}", numero, grupo[0], grupo[1], fecha_faena)
+        elif evento == "despacho":
+            yield segundos, "despacho", npallet or grupo
+        else:
+            raise ValueError(f"Línea {linea}: evento desconocido '{evento}'.")
+
+
+class Simulador:
+    """
+    Reproduce un flujo de llegadas y despachos sobre un layout y acumula las métricas.
+
+    Cada llegada y cada despacho ocupa un montacargas durante `segundos_movimiento`
+    por cada pallet que mueve; si todos están ocupados la operación espera al primero
+    que se libere.
+    """
+
+    def __init__(self, carriles, politica="lotes", bloqueantes="reubicar", montacargas=2,
+                 segundos_movimiento=90.0, semilla=7):
+        if politica not in POLITICAS:
+            raise ValueError(f"Política desconocida '{politica}'. Use {', '.join(POLITICAS)}.")
+        if bloqueantes not in MODOS_BLOQUEANTES:
+            raise ValueError(f"Modo de bloqueantes desconocido '{bloqueantes}'. Use {', '.join(MODOS_BLOQUEANTES)}.")
+        self.modelo = ModeloAlmacen([Carril(clave, profundidad) for clave, profundidad in carriles.items()])
+        self.politica = politica
+        self.bloqueantes = bloqueantes
+        self.segundos_movimiento = segundos_movimiento
+        self.rnd = random.Random(semilla)
+        self.claves = list(self.modelo.carriles)
+
+        # Política "lotes": carril abierto por (variedad, mercado, fecha) y carriles vacíos, pisos bajos primero
+        self.abiertos = {}
+        self.vacios = [(clave[1] or 0, str(clave), clave) for clave in self.claves]
+        heapq.heapify(self.vacios)
+
+        # Stock por (variedad, mercado): heap de (fecha, secuencia, npallet) con borrado perezoso
+        self.stock = {}
+        self.secuencia = 0
+
+        # Instante en que se libera cada montacargas
+        self.montacargas = [0.0] * montacargas
+
+        self.llegadas = self.ubicados = self.rechazados = 0
+        self.despachos = self.sin_stock = 0
+        self.movimientos = self.movimientos_bloqueo = 0
+        self.espera_total = self.espera_maxima = 0.0
+        self.ocupado_total = 0.0
+        self.area_ocupacion = 0.0
+        self.ocupacion_maxima = 0
+        self.ultimo_instante = 0.0
+
+    # --- Ubicación ---
+
+    def ubicar(self, pallet, excluido=None):
+        """
+        Elige un carril con espacio para el pallet según la política; None si no hay.
+        """
+        if self.politica == "lotes":
+            clave = self._ubicar_lotes(pallet, excluido)
+            if clave is not None:
+                return clave
+        elif self.politica == "aleatoria":
+            return self._ubicar_aleatoria(excluido)
+
+        for _, clave in recomendar_ubicaciones(self.modelo, pallet, limite=2):
+            if clave != excluido:
+                return clave
+        return None
+
+    def _ubicar_lotes(self, pallet, excluido):
+        lote = (pallet.variedad, pallet.mercado, orden_fecha_faena(pallet.fecha_faena))
+        clave = self.abiertos.get(lote)
+        if clave is not None and clave != excluido:
+            carril = self.modelo.carriles[clave]
+            frente = carril.pallets[0] if carril.pallets else None
+            if (
+                not carril.lleno and frente is not None
+                and (frente.variedad, frente.mercado, orden_fecha_faena(frente.fecha_faena)) == lote
+            ):
+                return clave
+
+        while self.vacios:
+            _, _, clave = self.vacios[0]
+            if not self.modelo.carriles[clave].vacio:
+                heapq.heappop(self.vacios)
+                continue
+            if clave == excluido:
+                break
+            heapq.heappop(self.vacios)
+            self.abiertos[lote] = clave
+            return clave
+        return None
+
+    def _ubicar_aleatoria(self, excluido):
+        for _ in range(20):
+            clave = self.rnd.choice(self.claves)
+            if clave != excluido and not self.modelo.carriles[clave].lleno:
+                return clave
+        libres = [c for c in self.claves if c != excluido and not self.modelo.carriles[c].lleno]
+        return self.rnd.choice(libres) if libres else None
+
+    def _ingresar(self, clave, pallet):
+        self.modelo.ingresar(clave, pallet)
+        self.secuencia += 1
+        heapq.heappush(
+            self.stock.setdefault((pallet.variedad, pallet.mercado), []),
+            (orden_fecha_faena(pallet.fecha_faena), self.secuencia, pallet.npallet),
+        )
+
+    def _retirar(self, npallet):
+        clave = self.modelo.ubicacion_pallet[npallet]
+        pallet = self.modelo.retirar(npallet)
+        if self.modelo.carriles[clave].vacio:
+            heapq.heappush(self.vacios, (clave[1] or 0, str(clave), clave))
+        return pallet
+
+    # --- Despacho ---
+
+    def _elegir_fefo(self, grupo):
+        """
+        NPallet más antiguo del grupo y, entre los de la misma fecha, el que tiene menos pallets delante.
+        """
+        heap = self.stock.get(grupo)
+        candidatos = []
+        while heap and len(candidatos) < CANDIDATOS_FEFO:
+            entrada = heap[0]
+            if entrada[2] not in self.modelo.ubicacion_pallet:
+                heapq.heappop(heap)
+                continue
+            if candidatos and entrada[0] != candidatos[0][0]:
+                break
+            candidatos.append(heapq.heappop(heap))
+        if not candidatos:
+            return None
+        elegido = min(candidatos, key=lambda entrada: self.modelo.posicion(entrada[2])[1])
+        for entrada in candidatos:
+            if entrada is not elegido:
+                heapq.heappush(heap, entrada)
+        return elegido[2]
+
+    def despachar(self, npallet):
+        """
+        Retira un pallet moviendo antes los que tiene delante. Retorna la cantidad de movimientos.
+        """
+        clave, posicion = self.modelo.posicion(npallet)
+        delante = self.modelo.carriles[clave].pallets[:posicion - 1]
+        movimientos = 1
+        devueltos = []
+        for bloqueante in delante:
+            self._retirar(bloqueante.npallet)
+            destino = self.ubicar(bloqueante, excluido=clave) if self.bloqueantes == "reubicar" else None
+            if destino is None:
+                devueltos.append(bloqueante)
+                movimientos += 2
+            else:
+                self._ingresar(destino, bloqueante)
+                movimientos += 1
+        self._retirar(npallet)
+        for bloqueante in reversed(devueltos):
+            self._ingresar(clave, bloqueante)
+        self.movimientos_bloqueo += movimientos - 1
+        return movimientos
+
+    # --- Ejecución ---
+
+    def _operar(self, instante, movimientos):
+        libre = heapq.heappop(self.montacargas)
+        inicio = max(instante, libre)
+        duracion = movimientos * self.segundos_movimiento
+        heapq.heappush(self.montacargas, inicio + duracion)
+        espera = inicio - instante
+        self.espera_total += espera
+        self.espera_maxima = max(self.espera_maxima, espera)
+        self.ocupado_total += duracion
+        self.movimientos += movimientos
+
+    def procesar(self, instante, tipo, dato):
+        ocupadas = self.modelo.total_ocupadas()
+        self.area_ocupacion += ocupadas * (instante - self.ultimo_instante)
+        self.ultimo_instante = instante
+
+        if tipo == "llegada":
+            self.llegadas += 1
+            clave = self.ubicar(dato)
+            if clave is None or dato.npallet in self.modelo.ubicacion_pallet:
+                self.rechazados += 1
+                return
+            self._ingresar(clave, dato)
+            self.ubicados += 1
+            self.ocupacion_maxima = max(self.ocupacion_maxima, ocupadas + 1)
+            self._operar(instante, 1)
+        else:
+            npallet = dato if isinstance(dato, str) else self._elegir_fefo(dato)
+            if npallet is None or npallet not in self.modelo.ubicacion_pallet:
+                self.sin_stock += 1
+                return
+            self.despachos += 1
+            self._operar(instante, self.despachar(npallet))
+
+    def ejecutar(self, eventos):
+        """
+        Procesa todos los eventos y retorna el resumen de la simulación.
+        """
+        inicio = time.perf_counter()
+        cantidad = 0
+        for instante, tipo, dato in eventos:
+            self.procesar(instante, tipo, dato)
+            cantidad += 1
+        return self.resumen(cantidad, time.perf_counter() - inicio)
+
+    def resumen(self, eventos, segundos_cpu):
+        horas = max(self.ultimo_instante, max(self.montacargas)) / 3600 or 1
+        total_posiciones = self.modelo.total_posiciones()
+        operaciones = self.ubicados + self.despachos
+        return {
+            "eventos": eventos,
+            "llegadas": self.llegadas,
+            "ubicados": self.ubicados,
+            "rechazados": self.rechazados,
+            "despachos": self.despachos,
+            "sin_stock": self.sin_stock,
+            "movimientos": self.movimientos,
+            "movimientos_bloqueo": self.movimientos_bloqueo,
+            "bloqueo_por_despacho": self.movimientos_bloqueo / self.despachos if self.despachos else 0.0,
+            "ocupacion_promedio": self.area_ocupacion / (self.ultimo_instante or 1) / total_posiciones,
+            "ocupacion_maxima": self.ocupacion_maxima / total_posiciones,
+            "ocupacion_final": self.modelo.total_ocupadas() / total_posiciones,
+            "horas": horas,
+            "pallets_por_hora": operaciones / horas,
+            "utilizacion_montacargas": self.ocupado_total / (len(self.montacargas) * horas * 3600),
+            "espera_promedio": self.espera_total / operaciones if operaciones else 0.0,
+            "espera_maxima": self.espera_maxima,
+            "segundos_cpu": segundos_cpu,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulador de operaciones del almacén")
+    parser.add_argument("--layout", help="layout CSV (layout_almacen.py); por defecto uno sintético")
+    parser.add_argument("--pisos", type=int, default=4)
+    parser.add_argument("--racks", type=int, default=2)
+    parser.add_argument("--letras", type=int, default=200)
+    parser.add_argument("--profundidad", type=int, default=6)
+    parser.add_argument("--flujo", help="flujo grabado en CSV; por defecto uno sintético")
+    parser.add_argument("--dias", type=int, default=180)
+    parser.add_argument("--llegadas-dia", type=int, default=400)
+    parser.add_argument("--despachos-dia", type=int, help="por defecto igual a las llegadas")
+    parser.add_argument("--politicas", default="lotes", help=f"políticas a comparar: {','.join(POLITICAS)}")
+    parser.add_argument("--bloqueantes", default="reubicar", choices=MODOS_BLOQUEANTES)
+    parser.add_argument("--montacargas", type=int, default=2)
+    parser.add_argument("--segundos-movimiento", type=float, default=90.0)
+    parser.add_argument("--semilla", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.layout:
+        with open(args.layout, newline="", encoding="utf-8") as archivo:
+            carriles = leer_layout(archivo)
+    else:
+        carriles = generar_layout(pisos=args.pisos, racks=args.racks, letras=args.letras, profundidad=args.profundidad)
+    print(f"Layout: {len(carriles)} carriles, {sum(carriles.values())} posiciones")
+
+    for politica in args.politicas.split(","):
+        if args.flujo:
+            archivo = open(args.flujo, newline="", encoding="utf-8")
+            eventos = leer_flujo(archivo)
+        else:
+            archivo = None
+            eventos = flujo_sintetico(args.dias, args.llegadas_dia, args.despachos_dia, args.semilla)
+        simulador = Simulador(
+            carriles, politica, args.bloqueantes, args.montacargas, args.segundos_movimiento, args.semilla
+        )
+        try:
+            r = simulador.ejecutar(eventos)
+        finally:
+            if archivo is not None:
+                archivo.close()
+
+        print(f"\nPolítica {politica} ({r['eventos']} eventos en {r['segundos_cpu']:.1f} s)")
+        print(f"  llegadas {r['llegadas']}, ubicadas {r['ubicados']}, rechazadas por falta de espacio {r['rechazados']}")
+        print(f"  despachos {r['despachos']}, sin stock {r['sin_stock']}")
+        print(f"  movimientos por bloqueo {r['movimientos_bloqueo']} ({r['bloqueo_por_despacho']:.2f} por despacho)")
+        print(
+            f"  ocupación promedio {r['ocupacion_promedio']:.1%}, máxima {r['ocupacion_maxima']:.1%}, "
+            f"final {r['ocupacion_final']:.1%}"
+        )
+        print(
+            f"  throughput {r['pallets_por_hora']:.1f} pallets/hora, utilización de montacargas "
+            f"{r['utilizacion_montacargas']:.1%}, espera promedio {r['espera_promedio'] / 60:.1f} min "
+            f"(máxima {r['espera_maxima'] / 60:.1f} min)"
+        )
+
+
+if __name__ == "__main__":
+    main()
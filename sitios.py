@@ -0,0 +1,131 @@
+# sitios.py
+#
+# Sitios (plantas) que atiende la aplicación. Cada sitio tiene su propia base de datos
+# y, en cada proceso, su propio pool de conexiones, circuito, snapshot y caches, de
+# modo que el tráfico o las escrituras de un sitio no invalidan ni demoran los datos
+# de otro.
+#
+# Sin SITIOS se atiende un solo sitio con SQL_SERVER, SQL_DATABASE, SQL_USER,
+# SQL_PASSWORD y SQL_SERVER_LECTURA, como siempre. Con SITIOS=norte,sur cada sitio
+# lee esas variables con su nombre en mayúsculas como sufijo (SQL_SERVER_SUR,
+# SQL_DATABASE_SUR, ...); SQL_USER y SQL_PASSWORD sin sufijo sirven como valor común.
+# El primero de la lista es el sitio predeterminado y conserva los nombres de cache y
+# de archivos de la instalación de un solo sitio.
+#
+# El sitio de cada solicitud lo fija app.py (parámetro ?sitio= o cookie) en una
+# variable de contexto que lee la capa de datos; los hilos propios deben fijarlo con
+# en_sitio().
+
+import contextvars
+import os
+import re
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+
+
+ConfiguracionSitio = namedtuple(
+    "ConfiguracionSitio", ["nombre", "servidor", "base_datos", "usuario", "password", "servidor_lectura"]
+)
+
+# Nombre del sitio cuando no se configura SITIOS
+SITIO_UNICO = "principal"
+
+_NOMBRE_VALIDO = re.compile(r"[A-Za-z0-9_-]+")
+
+
+def _configuracion_sitio(nombre, unico):
+    sufijo = "" if unico else "_" + nombre.upper().replace("-", "_")
+
+    def variable(base, comun=False):
+        valor = os.getenv(base + sufijo)
+        if valor is None and comun:
+            valor = os.getenv(base)
+        return valor
+
+    return ConfiguracionSitio(
+        nombre=nombre,
+        servidor=variable("SQL_SERVER"),
+        base_datos=variable("SQL_DATABASE"),
+        usuario=variable("SQL_USER", comun=True),
+        password=variable("SQL_PASSWORD", comun=True),
+        servidor_lectura=variable("SQL_SERVER_LECTURA"),
+    )
+
+
+def _leer_sitios():
+    nombres = []
+    for nombre in os.getenv("SITIOS", "").split(","):
+        nombre = nombre.strip()
+        if not nombre:
+            continue
+        if not _NOMBRE_VALIDO.fullmatch(nombre):
+            print(f"Error: nombre de sitio no válido en SITIOS: '{nombre}' (solo letras, números, '_' y '-').")
+            continue
+        if nombre not in nombres:
+            nombres.append(nombre)
+    if not nombres:
+        return OrderedDict([(SITIO_UNICO, _configuracion_sitio(SITIO_UNICO, unico=True))])
+    return OrderedDict((nombre, _configuracion_sitio(nombre, unico=False)) for nombre in nombres)
+
+
+# {nombre: ConfiguracionSitio}, en el orden de SITIOS
+SITIOS = _leer_sitios()
+SITIO_PREDETERMINADO = next(iter(SITIOS))
+
+_sitio_actual = contextvars.ContextVar("sitio_actual", default=None)
+
+
+def configurar(nombres):
+    """
+    Reemplaza los sitios configurados (herramientas locales y reproducción de trazas).
+    """
+    global SITIOS, SITIO_PREDETERMINADO
+    SITIOS = OrderedDict((nombre, _configuracion_sitio(nombre, unico=False)) for nombre in nombres)
+    SITIO_PREDETERMINADO = next(iter(SITIOS))
+
+
+def sitio_actual():
+    """
+    Retorna el nombre del sitio de la solicitud o del hilo en curso.
+    """
+    return _sitio_actual.get() or SITIO_PREDETERMINADO
+
+
+def es_sitio(nombre):
+    return nombre in SITIOS
+
+
+def es_predeterminado(nombre=None):
+    return (nombre or sitio_actual()) == SITIO_PREDETERMINADO
+
+
+def configuracion(nombre=None):
+    """
+    Retorna la ConfiguracionSitio del sitio indicado o del sitio actual.
+    """
+    return SITIOS[nombre or sitio_actual()]
+
+
+def usar_sitio(nombre):
+    """
+    Fija el sitio del contexto actual; retorna el token para restaurar() el anterior.
+    """
+    if nombre not in SITIOS:
+        raise KeyError(f"Sitio desconocido: {nombre}")
+    return _sitio_actual.set(nombre)
+
+
+def restaurar(token):
+    _sitio_actual.reset(token)
+
+
+@contextmanager
+def en_sitio(nombre):
+    """
+    Ejecuta el bloque con `nombre` como sitio actual (hilos de fondo, herramientas).
+    """
+    token = usar_sitio(nombre)
+    try:
+        yield configuracion(nombre)
+    finally:
+        restaurar(token)
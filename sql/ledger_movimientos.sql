@@ -0,0 +1,51 @@
+-- Registro append-only de movimientos de pallets y snapshots periódicos de ocupación.
+-- Se escribe desde conexion_bd en la misma transacción que cada movimiento.
+
+CREATE TABLE ledger_movimientos (
+    id_movimiento   BIGINT IDENTITY(1,1) PRIMARY KEY,
+    fecha_hora      DATETIME2(3) NOT NULL DEFAULT SYSDATETIME(),
+    tipo_movimiento VARCHAR(20)  NOT NULL,  -- 'ingreso', 'asignacion', 'retiro'
+    id_pallet       INT          NOT NULL,
+    NPallet         VARCHAR(8)   NULL,
+    tipo_almacen    VARCHAR(50)  NULL,      -- destino, solo para 'asignacion'
+    piso            INT          NULL,
+    rack            INT          NULL,
+    letra           VARCHAR(5)   NULL
+);
+
+CREATE INDEX ix_ledger_movimientos_fecha ON ledger_movimientos (fecha_hora, id_movimiento);
+
+-- Ocupación completa en un instante: JSON {"tipo|piso|rack|letra": [NPallet desde la posición 1]}
+CREATE TABLE ledger_snapshots (
+    id_snapshot     BIGINT IDENTITY(1,1) PRIMARY KEY,
+    fecha_hora      DATETIME2(3)  NOT NULL,
+    id_movimiento   BIGINT        NOT NULL,  -- último movimiento incluido en el snapshot
+    contenido       NVARCHAR(MAX) NOT NULL
+);
+
+CREATE INDEX ix_ledger_snapshots_fecha ON ledger_snapshots (fecha_hora);
+GO
+
+-- El registro es append-only: se niegan actualizaciones y borrados
+CREATE TRIGGER tr_ledger_movimientos_append_only
+ON ledger_movimientos
+INSTEAD OF UPDATE, DELETE
+AS
+BEGIN
+    RAISERROR('ledger_movimientos es append-only.', 16, 1);
+END;
+GO
+
+-- Snapshot inicial con la ocupación actual: sin él, la reconstrucción histórica partiría
+-- de un almacén vacío y omitiría los pallets ubicados antes de crear el ledger
+INSERT INTO ledger_snapshots (fecha_hora, id_movimiento, contenido)
+SELECT SYSDATETIME(), 0, N'{' + ISNULL(STRING_AGG(c.carril, N','), N'') + N'}'
+FROM (
+    SELECT N'"' + STRING_ESCAPE(CONCAT(u.tipo_almacen, N'|', u.piso, N'|', u.rack, N'|', u.letra), 'json') + N'":['
+           + STRING_AGG(CAST(N'"' + STRING_ESCAPE(p.NPallet, 'json') + N'"' AS NVARCHAR(MAX)), N',')
+                 WITHIN GROUP (ORDER BY u.posicion_pallet)
+           + N']' AS carril
+    FROM ubicaciones u
+    JOIN pallets p ON p.id_pallet = u.id_pallet_asignado
+    GROUP BY u.tipo_almacen, u.piso, u.rack, u.letra
+) c;
@@ -0,0 +1,91 @@
+-- Control de concurrencia optimista sobre ubicaciones.
+-- Cada fila tiene un número de versión; la versión de un carril (piso, rack, letra)
+-- es la suma de las versiones de sus filas. conexion_bd compara esa suma antes de
+-- escribir (compare-and-swap) y reintenta si otro worker modificó el carril.
+
+ALTER TABLE ubicaciones ADD version_fila INT NOT NULL CONSTRAINT df_ubicaciones_version_fila DEFAULT 0;
+GO
+
+CREATE INDEX ix_ubicaciones_carril ON ubicaciones (piso, rack, letra) INCLUDE (version_fila, id_pallet_asignado);
+GO
+
+-- Un pallet no puede quedar asignado a dos posiciones aunque dos asignaciones se crucen.
+-- conexion_bd reintenta la transacción cuando choca con este índice (errores 2601/2627).
+CREATE UNIQUE INDEX ux_ubicaciones_pallet_asignado ON ubicaciones (id_pallet_asignado) WHERE id_pallet_asignado IS NOT NULL;
+GO
+
+-- Los procedimientos corren el carril con un único UPDATE. SQL Server verifica los
+-- índices únicos contra el resultado de cada sentencia y no fila por fila, y en el
+-- resultado cada pallet del carril ocupa una sola posición. Un corrimiento fila a fila
+-- dejaría el pallet en dos posiciones a la vez y violaría el índice a mitad de camino.
+-- Los pallets quedan desde la posición 1, igual que en benchmarks/bd_sqlite.py.
+CREATE OR ALTER PROCEDURE reasignar_pallet @piso INT, @rack INT, @letra VARCHAR(5), @id_pallet INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF NOT EXISTS (SELECT 1 FROM ubicaciones WITH (UPDLOCK, HOLDLOCK)
+                   WHERE piso = @piso AND rack = @rack AND letra = @letra AND id_pallet_asignado IS NULL)
+        THROW 50001, 'El carril no tiene posiciones libres.', 1;
+
+    -- El pallet nuevo en la posición 1 y los que ya estaban una posición más adentro
+    WITH posiciones AS (
+        SELECT ubicacion_key, ROW_NUMBER() OVER (ORDER BY posicion_pallet) AS orden
+        FROM ubicaciones WHERE piso = @piso AND rack = @rack AND letra = @letra
+    ), pallets AS (
+        SELECT @id_pallet AS id_pallet, 1 AS orden
+        UNION ALL
+        SELECT id_pallet_asignado, 1 + ROW_NUMBER() OVER (ORDER BY posicion_pallet)
+        FROM ubicaciones
+        WHERE piso = @piso AND rack = @rack AND letra = @letra AND id_pallet_asignado IS NOT NULL
+    )
+    UPDATE u SET id_pallet_asignado = p.id_pallet
+    FROM ubicaciones u
+    JOIN posiciones s ON s.ubicacion_key = u.ubicacion_key
+    LEFT JOIN pallets p ON p.orden = s.orden;
+END;
+GO
+
+CREATE OR ALTER PROCEDURE retirar_pallet @id_pallet INT
+AS
+BEGIN
+    SET NOCOUNT ON;
+    DECLARE @piso INT, @rack INT, @letra VARCHAR(5);
+    SELECT @piso = piso, @rack = rack, @letra = letra
+    FROM ubicaciones WITH (UPDLOCK, HOLDLOCK) WHERE id_pallet_asignado = @id_pallet;
+    IF @piso IS NULL
+        RETURN;
+
+    -- Los pallets restantes del carril se corren hacia la posición 1
+    WITH posiciones AS (
+        SELECT ubicacion_key, ROW_NUMBER() OVER (ORDER BY posicion_pallet) AS orden
+        FROM ubicaciones WHERE piso = @piso AND rack = @rack AND letra = @letra
+    ), pallets AS (
+        SELECT id_pallet_asignado AS id_pallet, ROW_NUMBER() OVER (ORDER BY posicion_pallet) AS orden
+        FROM ubicaciones
+        WHERE piso = @piso AND rack = @rack AND letra = @letra
+          AND id_pallet_asignado IS NOT NULL AND id_pallet_asignado <> @id_pallet
+    )
+    UPDATE u SET id_pallet_asignado = p.id_pallet
+    FROM ubicaciones u
+    JOIN posiciones s ON s.ubicacion_key = u.ubicacion_key
+    LEFT JOIN pallets p ON p.orden = s.orden;
+END;
+GO
+
+-- Toda modificación de una posición incrementa su versión, también las que no pasan
+-- por conexion_bd. Solo cuentan las filas cuyo pallet o posición cambió.
+CREATE TRIGGER tr_ubicaciones_version
+ON ubicaciones
+AFTER UPDATE
+AS
+BEGIN
+    SET NOCOUNT ON;
+    IF UPDATE(id_pallet_asignado) OR UPDATE(posicion_pallet)
+        UPDATE u SET version_fila = u.version_fila + 1
+        FROM ubicaciones u
+        JOIN inserted i ON i.ubicacion_key = u.ubicacion_key
+        JOIN deleted d ON d.ubicacion_key = i.ubicacion_key
+        WHERE ISNULL(i.id_pallet_asignado, -1) <> ISNULL(d.id_pallet_asignado, -1)
+           OR i.posicion_pallet <> d.posicion_pallet;
+END;
+GO
@@ -0,0 +1,46 @@
+# tests/conftest.py
+#
+# Base SQLite de benchmarks/bd_sqlite.py instalada en conexion_bd, con el estado de
+# cada proceso (pools, circuitos, caches y series) aislado por prueba.
+
+import os
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+sys.path.insert(0, RAIZ)
+
+import bd_sqlite  # noqa: E402
+import cache_almacen  # noqa: E402
+import cache_compartido  # noqa: E402
+import circuito_bd  # noqa: E402
+import conexion_bd  # noqa: E402
+import series_ocupacion  # noqa: E402
+
+
+@pytest.fixture
+def almacen_sqlite(tmp_path, monkeypatch):
+    """
+    Retorna una función que crea la base con el layout {(tipo_almacen, piso, rack, letra): profundidad},
+    la instala en conexion_bd y retorna su ruta.
+    """
+    monkeypatch.setattr(conexion_bd, "_conectar", conexion_bd._conectar)
+    monkeypatch.setattr(conexion_bd, "_pools", {})
+    monkeypatch.setattr(conexion_bd, "_desfases", {})
+    monkeypatch.setattr(conexion_bd, "_version_datos", {})
+    monkeypatch.setattr(circuito_bd, "_circuitos", {})
+    monkeypatch.setattr(cache_almacen, "_estados", {})
+    monkeypatch.setattr(cache_compartido, "_backend", cache_compartido.BackendMemoria())
+    monkeypatch.setattr(series_ocupacion, "SERIES_OCUPACION_DIR", str(tmp_path / "series"))
+    monkeypatch.setattr(series_ocupacion, "_series", {})
+    monkeypatch.setattr(series_ocupacion, "_ultimo_muestreo", {})
+
+    def crear(carriles, ocupacion=0.5, npallets_extra=()):
+        ruta = str(tmp_path / "almacen.db")
+        bd_sqlite.crear_base(ruta, carriles, ocupacion, npallets_extra)
+        bd_sqlite.instalar(ruta)
+        return ruta
+
+    return crear
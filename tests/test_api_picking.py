@@ -0,0 +1,37 @@
+# tests/test_api_picking.py
+
+import pytest
+
+import app
+
+
+@pytest.fixture
+def cliente(almacen_sqlite):
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "ABCD"}, ocupacion=0.6)
+    return app.server.test_client()
+
+
+@pytest.mark.parametrize("ruta", ["/api/picking?cantidad=", "/api/pallets/buscar?q=0&limite="])
+@pytest.mark.parametrize("valor", ["-3", "0", "abc", "2.5"])
+def test_cantidad_invalida_responde_400(cliente, ruta, valor):
+    respuesta = cliente.get(ruta + valor)
+    assert respuesta.status_code == 400
+    assert "error" in respuesta.get_json()
+
+
+def test_cantidad_se_recorta_al_maximo(cliente):
+    respuesta = cliente.get(f"/api/picking?cantidad={app.MAXIMO_PICKING * 10}")
+    assert respuesta.status_code == 200
+    assert respuesta.get_json()["cantidad_solicitada"] == app.MAXIMO_PICKING
+
+
+def test_limite_de_busqueda(cliente):
+    respuesta = cliente.get("/api/pallets/buscar?q=0&limite=1")
+    assert respuesta.status_code == 200
+    assert len(respuesta.get_json()["pallets"]) == 1
+
+
+@pytest.mark.parametrize("cantidad", [None, "", "abc", -1, 0])
+def test_callback_de_picking_rechaza_cantidades_invalidas(almacen_sqlite, cantidad):
+    resultado = app.generar_picking(1, None, None, cantidad)
+    assert resultado.color == "danger"
@@ -0,0 +1,110 @@
+# tests/test_busqueda_pallets.py
+
+import time
+
+import cache_almacen
+import cache_compartido
+import conexion_bd
+from busqueda_pallets import IndiceNPallet
+from modelo_almacen import Carril, ModeloAlmacen, PalletModelo
+
+
+def _pallet(numero, variedad="Cerdo", mercado="China", fecha_faena="20240110"):
+    return PalletModelo(f"{numero:08d}", numero, variedad, mercado, fecha_faena)
+
+
+def _modelo():
+    return ModeloAlmacen([
+        Carril(("A", 1, 1, "A"), 3, [_pallet(11), _pallet(12)]),
+        Carril(("A", 1, 1, "B"), 3, [_pallet(21)]),
+        Carril(("A", 1, 2, "A"), 2),
+    ])
+
+
+def _reproducir(modelo, movimientos):
+    """Aplica los movimientos al modelo como lo haría la base de datos."""
+    modelo = modelo.copiar()
+    for tipo_movimiento, _, destino, pallet in movimientos:
+        if tipo_movimiento == "retiro":
+            modelo.quitar(pallet.npallet)
+        elif tipo_movimiento == "asignacion":
+            modelo.ingresar(destino, pallet)
+    return modelo
+
+
+def _equivalentes(incremental, reconstruido):
+    assert incremental.npallets == reconstruido.npallets
+    for texto in ("0", "00000", "1", "2", "3", "00000011", "9"):
+        assert incremental.buscar(texto, limite=50) == reconstruido.buscar(texto, limite=50)
+
+
+def test_aplicar_equivale_a_reconstruir():
+    modelo = _modelo()
+    movimientos = [
+        ("ingreso", 31, None, _pallet(31)),
+        # Reubicación: retiro del frente de A y asignación en otro carril
+        ("retiro", 12, None, _pallet(12)),
+        ("asignacion", 12, ("A", 1, 2, "A"), _pallet(12)),
+        # Pallet que el índice no conocía: llega solo con los datos del movimiento
+        ("asignacion", 31, ("A", 1, 1, "B"), _pallet(31, variedad="Pollo")),
+        ("retiro", 11, None, _pallet(11)),
+    ]
+    indice = IndiceNPallet(modelo, 0)
+    assert indice.aplicar(movimientos)
+
+    _equivalentes(indice, IndiceNPallet(_reproducir(modelo, movimientos), 0))
+    [detalle] = indice.buscar("00000031")
+    assert (detalle["letra"], detalle["posicion_pallet"], detalle["variedad"]) == ("B", 1, "Pollo")
+    assert detalle["bloqueantes"] == []
+    assert indice.buscar("00000021")[0]["bloqueantes"] == ["00000031"]
+    # El modelo original no se modifica
+    assert [p.npallet for p in modelo.carriles[("A", 1, 1, "A")].pallets] == ["00000011", "00000012"]
+
+
+def test_movimientos_que_no_se_pueden_reflejar():
+    # Retiro de un pallet desconocido, carril inexistente, carril lleno y pallet ya ubicado
+    for movimiento in (
+        ("retiro", 99, None, None),
+        ("asignacion", 31, ("Z", 9, 9, "Z"), _pallet(31)),
+        ("asignacion", 31, ("A", 1, 2, "A"), None),
+        ("asignacion", 21, ("A", 1, 2, "A"), _pallet(21)),
+        ("traslado", 21, None, None),
+    ):
+        assert not IndiceNPallet(_modelo(), 0).aplicar([movimiento]), movimiento
+
+    modelo = ModeloAlmacen([Carril(("A", 1, 1, "A"), 1, [_pallet(1)])])
+    assert not IndiceNPallet(modelo, 0).aplicar([("asignacion", 2, ("A", 1, 1, "A"), _pallet(2))])
+
+
+def test_escrituras_del_mismo_worker_no_reconstruyen(almacen_sqlite):
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "ABC"}, ocupacion=0.4, npallets_extra=["12345678"])
+    indice = cache_almacen.indice_busqueda()
+    assert indice.buscar("12345678") == []
+
+    id_pallet = conexion_bd.obtener_id_pallet("12345678")
+    assert "asignado" in conexion_bd.asignar_ubicacion(id_pallet, "A", 1, 1, "C")
+
+    # Mismo objeto, actualizado con el pallet que llegó en el movimiento
+    assert cache_almacen.indice_busqueda() is indice
+    reconstruido = IndiceNPallet(cache_almacen.obtener_snapshot().modelo(), 0)
+    _equivalentes(indice, reconstruido)
+    assert indice.buscar("12345678")[0]["letra"] == "C"
+
+
+def test_escrituras_de_otro_worker_reconstruyen(almacen_sqlite):
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "AB"}, ocupacion=0.5)
+    indice = cache_almacen.indice_busqueda()
+
+    # Otro worker escribió: la generación compartida cambia sin movimientos en este proceso
+    cache_compartido.invalidar()
+    assert cache_almacen.indice_busqueda() is not indice
+
+
+def test_indice_vencido_se_reconstruye(almacen_sqlite, monkeypatch):
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "AB"}, ocupacion=0.5)
+    indice = cache_almacen.indice_busqueda()
+
+    # Vencido el TTL el snapshot se vuelve a leer y el índice se construye de nuevo
+    ahora = time.time() + cache_almacen.TTL_SNAPSHOT + 1
+    monkeypatch.setattr(cache_almacen.time, "time", lambda: ahora)
+    assert cache_almacen.indice_busqueda() is not indice
@@ -0,0 +1,95 @@
+# tests/test_compactacion.py
+
+import sqlite3
+
+import cache_almacen
+import conexion_bd
+from compactacion import fragmentacion_por_rack, planificar_compactacion
+from modelo_almacen import Carril, ModeloAlmacen, PalletModelo
+
+
+def _pallet(numero, variedad="Cerdo", mercado="China", fecha_faena="20240110"):
+    return PalletModelo(f"{numero:08d}", numero, variedad, mercado, fecha_faena)
+
+
+def _modelo():
+    return ModeloAlmacen([
+        # Un pallet cabe en B sin bloquear (misma faena y grupo)
+        Carril(("A", 1, 1, "A"), 4, [_pallet(1)]),
+        Carril(("A", 1, 1, "B"), 4, [_pallet(2), _pallet(3)]),
+        # Otro grupo: no hay carril parcial donde quepa sin bloquear
+        Carril(("A", 1, 1, "C"), 4, [_pallet(4, mercado="USA")]),
+        Carril(("A", 1, 1, "D"), 4),
+    ])
+
+
+def _contenido(modelo):
+    return {clave: [p.npallet for p in carril.pallets] for clave, carril in modelo.carriles.items()}
+
+
+def _reproducir(modelo, pasos):
+    modelo = modelo.copiar()
+    for paso in pasos:
+        assert modelo.posicion(paso["npallet"]) == (paso["origen"], 1)
+        modelo.ingresar(paso["destino"], modelo.retirar(paso["npallet"]))
+    return modelo
+
+
+def test_plan_libera_carriles_sin_bloquear_pallets():
+    modelo = _modelo()
+    plan = planificar_compactacion(modelo)
+
+    assert plan["carriles_liberados"] == [("A", 1, 1, "A")]
+    assert plan["capacidad_ganada"] == 4
+    final = _reproducir(modelo, plan["pasos"])
+    assert final.carriles[("A", 1, 1, "A")].vacio
+    # El carril de otro grupo no se toca y nada se mueve a carriles vacíos
+    assert _contenido(final)[("A", 1, 1, "C")] == ["00000004"]
+    assert final.carriles[("A", 1, 1, "D")].vacio
+    assert final.total_ocupadas() == modelo.total_ocupadas()
+
+
+def test_plan_no_modifica_el_modelo_y_respeta_el_maximo():
+    modelo = _modelo()
+    antes = _contenido(modelo)
+    assert planificar_compactacion(modelo, maximo_movimientos=0)["pasos"] == []
+    planificar_compactacion(modelo)
+    assert _contenido(modelo) == antes
+
+
+def test_carril_que_no_cabe_completo_no_se_mueve():
+    modelo = ModeloAlmacen([
+        Carril(("A", 1, 1, "A"), 4, [_pallet(1), _pallet(2, mercado="USA")]),
+        Carril(("A", 1, 1, "B"), 4, [_pallet(3)]),
+        Carril(("A", 1, 1, "C"), 4, [_pallet(4)]),
+    ])
+    plan = planificar_compactacion(modelo)
+    # B cabe en C; de A, el pallet USA bloquearía en cualquier carril y A queda igual
+    assert [(paso["origen"], paso["destino"]) for paso in plan["pasos"]] == [(("A", 1, 1, "B"), ("A", 1, 1, "C"))]
+    assert plan["carriles_liberados"] == [("A", 1, 1, "B")]
+    assert _contenido(_reproducir(modelo, plan["pasos"]))[("A", 1, 1, "A")] == ["00000001", "00000002"]
+
+
+def test_fragmentacion_por_rack():
+    modelo = _modelo()
+    [rack] = fragmentacion_por_rack(modelo)
+    assert (rack["carriles"], rack["parciales"], rack["vacios"]) == (4, 3, 1)
+    assert rack["libres"] == 12 and rack["libres_parciales"] == 8
+    assert rack["fragmentacion"] == 8 / 12
+
+
+def test_plan_ejecutado_en_la_base(almacen_sqlite):
+    ruta = almacen_sqlite({("A", 1, rack, letra): 5 for rack in (1, 2) for letra in "ABCDEFGH"}, ocupacion=0.3)
+    # Un solo grupo y fecha, para que los pallets puedan consolidarse sin bloquearse
+    conn = sqlite3.connect(ruta)
+    conn.execute("UPDATE pallets SET Variedad = 'Cerdo', Mercado = 'China', fechafaena = '20240101'")
+    conn.commit()
+    conn.close()
+    modelo = cache_almacen.obtener_snapshot().modelo()
+    plan = planificar_compactacion(modelo)
+    assert plan["pasos"]
+    claves = {paso[extremo] for paso in plan["pasos"] for extremo in ("origen", "destino")}
+
+    resultado = conexion_bd.ejecutar_lote_movimientos(plan["pasos"], modelo.contenido_carriles(claves))
+    assert resultado.startswith("Lote de"), resultado
+    assert _contenido(cache_almacen.obtener_snapshot().modelo()) == _contenido(_reproducir(modelo, plan["pasos"]))
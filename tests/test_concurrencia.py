@@ -0,0 +1,128 @@
+# tests/test_concurrencia.py
+
+import sqlite3
+
+import pytest
+
+import bd_sqlite
+import conexion_bd
+
+
+@pytest.fixture
+def carril(almacen_sqlite, monkeypatch):
+    """Carril A-1-1-A vacío y dos pallets sin ubicación; retorna (id del primero, destino, ruta)."""
+    ruta = almacen_sqlite({("A", 1, 1, "A"): 3}, ocupacion=0, npallets_extra=["12345678", "87654321"])
+    monkeypatch.setattr(conexion_bd, "ESPERA_REINTENTO", 0)
+    return conexion_bd.obtener_id_pallet("12345678"), ("A", 1, 1, "A"), ruta
+
+
+def _carril(ruta):
+    conn = sqlite3.connect(ruta)
+    filas = conn.execute("SELECT id_pallet_asignado FROM ubicaciones WHERE letra = 'A' ORDER BY posicion_pallet").fetchall()
+    conn.close()
+    return [fila[0] for fila in filas]
+
+
+def _contar(monkeypatch, modulo, nombre, falla):
+    """Reemplaza modulo.nombre; `falla(llamada)` decide si la llamada número `llamada` falla."""
+    original = getattr(modulo, nombre)
+    llamadas = []
+
+    def reemplazo(*args):
+        llamadas.append(args)
+        falla(len(llamadas))
+        return original(*args)
+
+    monkeypatch.setattr(modulo, nombre, reemplazo)
+    return llamadas
+
+
+def test_version_desactualizada_se_reintenta(carril, monkeypatch):
+    id_pallet, destino, ruta = carril
+    original = conexion_bd._version_carril
+    lecturas = []
+
+    def version_vieja(cursor, piso, rack, letra):
+        lecturas.append(1)
+        version, libres = original(cursor, piso, rack, letra)
+        # La primera lectura ve el carril antes de que otro worker lo modificara
+        return (version - 1 if len(lecturas) == 1 else version), libres
+
+    monkeypatch.setattr(conexion_bd, "_version_carril", version_vieja)
+    assert "asignado" in conexion_bd.asignar_ubicacion(id_pallet, *destino)
+    assert len(lecturas) == 2
+
+
+def test_reintentos_agotados(carril, monkeypatch):
+    id_pallet, destino, ruta = carril
+    monkeypatch.setattr(conexion_bd, "REINTENTOS_CONCURRENCIA", 2)
+
+    def conflicto(_llamada):
+        raise conexion_bd.ConflictoConcurrencia("modificado")
+
+    llamadas = _contar(monkeypatch, conexion_bd, "_comparar_y_bloquear_carril", conflicto)
+    assert "siendo modificada por otro usuario" in conexion_bd.asignar_ubicacion(id_pallet, *destino)
+    assert len(llamadas) == 3
+    assert _carril(ruta) == [None, None, None]
+
+
+def test_indice_de_pallet_asignado_se_reintenta(carril, monkeypatch):
+    id_pallet, destino, ruta = carril
+
+    def cruce(llamada):
+        if llamada == 1:
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: ubicaciones.id_pallet_asignado")
+
+    llamadas = _contar(monkeypatch, bd_sqlite, "reasignar_pallet", cruce)
+    monkeypatch.setitem(bd_sqlite.PROCEDIMIENTOS, "reasignar_pallet", bd_sqlite.reasignar_pallet)
+    assert "asignado" in conexion_bd.asignar_ubicacion(id_pallet, *destino)
+    assert len(llamadas) == 2
+    assert _carril(ruta) == [id_pallet, None, None]
+
+
+def test_otras_violaciones_de_integridad_no_se_reintentan(carril, monkeypatch):
+    id_pallet, destino, ruta = carril
+
+    def clave_foranea(_llamada):
+        raise sqlite3.IntegrityError("FOREIGN KEY constraint failed")
+
+    llamadas = _contar(monkeypatch, bd_sqlite, "reasignar_pallet", clave_foranea)
+    monkeypatch.setitem(bd_sqlite.PROCEDIMIENTOS, "reasignar_pallet", bd_sqlite.reasignar_pallet)
+    assert conexion_bd.asignar_ubicacion(id_pallet, *destino).startswith("Error al asignar ubicación")
+    assert len(llamadas) == 1
+
+
+INDICE = "with unique index 'ux_ubicaciones_pallet_asignado'"
+
+
+@pytest.mark.parametrize("clase, args, reintentable", [
+    ("Error", ("40001", "[40001] Transaction was deadlocked (1205)"), True),
+    ("IntegrityError", ("23000", f"[23000] Cannot insert duplicate key row in object 'dbo.ubicaciones' {INDICE}. (2601)"), True),
+    ("IntegrityError", ("23000", "[23000] Violation of UNIQUE KEY constraint 'ux_ubicaciones_pallet_asignado'. (2627)"), True),
+    ("IntegrityError", ("23000", "[23000] The INSERT statement conflicted with the FOREIGN KEY constraint. (547)"), False),
+    ("IntegrityError", ("23000", "[23000] Cannot insert the value NULL into column 'NPallet'. (515)"), False),
+    ("IntegrityError", ("23000", "[23000] The UPDATE statement conflicted with the CHECK constraint. (547)"), False),
+    ("IntegrityError", ("23000", "[23000] Cannot insert duplicate key row in object 'dbo.pallets' "
+                                 "with unique index 'ux_pallets_npallet'. (2601)"), False),
+    ("Error", ("HY000", "[HY000] error general"), False),
+])
+def test_es_reintentable(carril, clase, args, reintentable):
+    # pyodbc se resuelve al instalar la base (o su reemplazo sin el driver ODBC)
+    error = getattr(conexion_bd.pyodbc, clase)(*args)
+    assert conexion_bd._es_reintentable(error) is reintentable
+
+
+def test_conflicto_de_version_es_reintentable():
+    assert conexion_bd._es_reintentable(conexion_bd.ConflictoConcurrencia("modificado"))
+    assert not conexion_bd._es_reintentable(ValueError("no es de la base"))
+
+
+def test_corrimiento_lifo_deja_cada_pallet_una_vez(carril):
+    id_pallet, destino, ruta = carril
+    otro = conexion_bd.obtener_id_pallet("87654321")
+    assert "asignado" in conexion_bd.asignar_ubicacion(id_pallet, *destino)
+    assert "asignado" in conexion_bd.asignar_ubicacion(otro, *destino)
+    # El último en entrar queda en la posición 1 y el anterior se corre una posición
+    assert _carril(ruta) == [otro, id_pallet, None]
+    assert "liberad" in conexion_bd.liberar_ubicacion(otro).lower()
+    assert _carril(ruta) == [id_pallet, None, None]
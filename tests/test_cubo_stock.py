@@ -0,0 +1,103 @@
+# tests/test_cubo_stock.py
+
+from datetime import date
+
+import cache_almacen
+import cache_compartido
+import conexion_bd
+from cubo_stock import SIN_FECHA, CuboStock, tramo_edad
+from modelo_almacen import Carril, ModeloAlmacen, PalletModelo
+
+
+HOY = date(2024, 2, 1)
+
+
+def _pallet(numero, variedad="Cerdo", mercado="China", fecha_faena="20240110"):
+    return PalletModelo(f"{numero:08d}", numero, variedad, mercado, fecha_faena)
+
+
+def _modelo():
+    return ModeloAlmacen([
+        Carril(("A", 1, 1, "A"), 3, [_pallet(11), _pallet(12, mercado="USA")]),
+        Carril(("A", 1, 2, "A"), 3, [_pallet(21, fecha_faena="10122023")]),
+        Carril(("A", 2, 1, "A"), 2),
+    ])
+
+
+def _reproducir(modelo, movimientos):
+    modelo = modelo.copiar()
+    for tipo_movimiento, _, destino, pallet in movimientos:
+        if tipo_movimiento == "retiro":
+            modelo.quitar(pallet.npallet)
+        elif tipo_movimiento == "asignacion":
+            modelo.ingresar(destino, pallet)
+    return modelo
+
+
+def _consultas(cubo):
+    return [
+        cubo.consultar(("rack", "tramo"), hoy=HOY),
+        cubo.consultar(("tipo_almacen", "piso", "rack", "variedad", "mercado", "tramo"), hoy=HOY),
+        cubo.consultar(("variedad",), {"mercado": "China"}, hoy=HOY),
+        cubo.valores("mercado"),
+    ]
+
+
+def test_tramo_edad():
+    assert tramo_edad("20240130", HOY) == "0-7 días"
+    assert tramo_edad("20240101", HOY) == "31-90 días"
+    assert tramo_edad("20230101", HOY) == "Más de 90 días"
+    assert tramo_edad("2024XX01", HOY) == SIN_FECHA
+
+
+def test_aplicar_equivale_a_reconstruir():
+    modelo = _modelo()
+    movimientos = [
+        ("ingreso", 31, None, _pallet(31)),
+        ("retiro", 11, None, _pallet(11)),
+        ("asignacion", 11, ("A", 2, 1, "A"), _pallet(11)),
+        # Pallet que el cubo no había visto: se suma con los datos del movimiento
+        ("asignacion", 31, ("A", 1, 2, "A"), _pallet(31, variedad="Pollo", fecha_faena="30012024")),
+        ("retiro", 12, None, _pallet(12)),
+    ]
+    cubo = CuboStock(modelo, 0)
+    assert cubo.aplicar(movimientos)
+
+    reconstruido = CuboStock(_reproducir(modelo, movimientos), 0)
+    assert cubo.celdas == reconstruido.celdas
+    assert _consultas(cubo) == _consultas(reconstruido)
+    # Las fechas DDMMAAAA quedan en la misma celda que su forma AAAAMMDD
+    assert cubo.consultar(("variedad", "tramo"), {"variedad": "Pollo"}, hoy=HOY) == [(("Pollo", "0-7 días"), 1)]
+
+
+def test_movimientos_que_no_se_pueden_reflejar():
+    for movimiento in (
+        ("retiro", 99, None, None),
+        ("asignacion", 31, ("A", 2, 1, "A"), None),
+        ("asignacion", 21, ("A", 2, 1, "A"), _pallet(21)),
+        ("traslado", 21, None, None),
+    ):
+        assert not CuboStock(_modelo(), 0).aplicar([movimiento]), movimiento
+
+
+def test_escrituras_del_mismo_worker_no_reconstruyen(almacen_sqlite):
+    almacen_sqlite({("A", 1, rack, letra): 4 for rack in (1, 2) for letra in "AB"}, ocupacion=0.4,
+                   npallets_extra=["12345678"])
+    cubo = cache_almacen.cubo_stock()
+
+    id_pallet = conexion_bd.obtener_id_pallet("12345678")
+    assert "asignado" in conexion_bd.asignar_ubicacion(id_pallet, "A", 1, 2, "B")
+    frente = next(c.pallets[0] for c in cache_almacen.obtener_snapshot().modelo().carriles.values() if c.pallets)
+    assert "liberad" in conexion_bd.liberar_ubicacion(frente.id_pallet).lower()
+
+    assert cache_almacen.cubo_stock() is cubo
+    reconstruido = CuboStock(cache_almacen.obtener_snapshot().modelo(), 0)
+    assert cubo.celdas == reconstruido.celdas
+    assert _consultas(cubo) == _consultas(reconstruido)
+
+
+def test_escrituras_de_otro_worker_reconstruyen(almacen_sqlite):
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "AB"}, ocupacion=0.5)
+    cubo = cache_almacen.cubo_stock()
+    cache_compartido.invalidar()
+    assert cache_almacen.cubo_stock() is not cubo
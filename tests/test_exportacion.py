@@ -0,0 +1,67 @@
+# tests/test_exportacion.py
+
+import csv
+import io
+import sqlite3
+
+import pytest
+
+import app
+import conexion_bd
+
+
+# Fechas de faena mezcladas, como llegan de distintos lectores de QR
+FECHAS = {1: "20240105", 2: "15012024", 3: "20240201", 4: "01032024", 5: "20231231"}
+
+
+@pytest.fixture
+def base(almacen_sqlite, monkeypatch):
+    # Un pallet por carril y un carril libre, que ningún rango de fechas debe incluir
+    ruta = almacen_sqlite({("A", 1, 1, letra): 1 for letra in "ABCDEF"}, ocupacion=0)
+    conn = sqlite3.connect(ruta)
+    conn.executemany(
+        "INSERT INTO pallets (id_pallet, Variedad, Mercado, fechafaena, NPallet) VALUES (?, 'Cerdo', 'China', ?, ?)",
+        [(i, fecha, f"{i:08d}") for i, fecha in FECHAS.items()],
+    )
+    conn.execute("UPDATE ubicaciones SET id_pallet_asignado = id_ubicacion, status_ubicacion = 'Ocupado' WHERE id_ubicacion <= 5")
+    conn.commit()
+    conn.close()
+    monkeypatch.setattr(app, "_cupos_exportacion", {})
+    return ruta
+
+
+def _ids(**filtros):
+    return sorted(fila[6] for lote in conexion_bd.iterar_posiciones_exportacion(**filtros) for fila in lote)
+
+
+def test_rango_de_fechas_compara_como_aaaammdd(base):
+    assert _ids(fecha_desde="20240101", fecha_hasta="20240131") == [1, 2]
+    # Los límites también pueden venir como DDMMAAAA
+    assert _ids(fecha_desde="01022024") == [3, 4]
+    assert _ids(fecha_hasta="31122023") == [5]
+
+
+def test_exportar_csv_con_rango(base):
+    respuesta = app.server.test_client().get("/exportar/inventario.csv?desde=20240201&hasta=20240331")
+    assert respuesta.status_code == 200
+    filas = list(csv.reader(io.StringIO(respuesta.get_data(as_text=True))))
+    assert filas[0] == conexion_bd.COLUMNAS_EXPORTACION
+    assert sorted(int(fila[6]) for fila in filas[1:]) == [3, 4]
+
+
+@pytest.mark.parametrize("consulta", ["desde=2024-01-01", "hasta=2024011", "desde=abcdefgh", "hasta=20241340"])
+def test_fechas_invalidas_responden_400(base, consulta):
+    assert app.server.test_client().get(f"/exportar/inventario.csv?{consulta}").status_code == 400
+
+
+def test_exportaciones_simultaneas_limitadas(base, monkeypatch):
+    monkeypatch.setattr(app, "EXPORTACIONES_SIMULTANEAS", 1)
+    cliente = app.server.test_client()
+
+    en_curso = cliente.get("/exportar/inventario.csv", buffered=False)
+    assert en_curso.status_code == 200
+    assert cliente.get("/exportar/inventario.csv").status_code == 503
+
+    # Al cerrar la descarga se libera el cupo
+    en_curso.close()
+    assert cliente.get("/exportar/inventario.csv").status_code == 200
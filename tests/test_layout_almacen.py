@@ -0,0 +1,70 @@
+# tests/test_layout_almacen.py
+
+import io
+import sqlite3
+import sys
+
+import conexion_bd
+import layout_almacen
+
+
+def _slots(ruta):
+    conn = sqlite3.connect(ruta)
+    filas = conn.execute(
+        "SELECT tipo_almacen, piso, rack, letra, posicion_pallet, id_pallet_asignado FROM ubicaciones"
+    ).fetchall()
+    conn.close()
+    return {fila[:5]: fila[5] for fila in filas}
+
+
+def _base(almacen_sqlite):
+    ruta = almacen_sqlite({("A", 1, 1, letra): 2 for letra in "AB"}, ocupacion=0)
+    # Un pallet en la posición 1 de B, que el layout nuevo ya no incluye
+    conn = sqlite3.connect(ruta)
+    conn.execute("INSERT INTO pallets (id_pallet, Variedad, Mercado, fechafaena, NPallet) VALUES (1, 'Cerdo', 'China', '20240101', '00000001')")
+    conn.execute("UPDATE ubicaciones SET id_pallet_asignado = 1, status_ubicacion = 'Ocupado' WHERE letra = 'B' AND posicion_pallet = 1")
+    conn.commit()
+    conn.close()
+    # A con profundidad 3, sin B y con un carril C nuevo
+    return ruta, {("A", 1, 1, "A"): 3, ("A", 1, 1, "C"): 2}
+
+
+def test_sin_aplicar_no_modifica_la_base(almacen_sqlite):
+    ruta, carriles = _base(almacen_sqlite)
+    antes = _slots(ruta)
+
+    resultado = conexion_bd.aplicar_layout(layout_almacen.slots_layout(carriles), aplicar=False)
+    assert (resultado["insertar"], resultado["retirar"], resultado["aplicado"]) == (3, 1, False)
+    assert resultado["protegidas"] == [("A", 1, 1, "B", 1)]
+    assert _slots(ruta) == antes
+
+
+def test_aplicar_mantiene_las_posiciones_ocupadas(almacen_sqlite):
+    ruta, carriles = _base(almacen_sqlite)
+
+    resultado = conexion_bd.aplicar_layout(layout_almacen.slots_layout(carriles))
+    assert resultado["aplicado"], resultado
+    assert set(_slots(ruta)) == set(layout_almacen.slots_layout(carriles)) | {("A", 1, 1, "B", 1)}
+    assert _slots(ruta)[("A", 1, 1, "B", 1)] == 1
+
+    # Aplicado de nuevo no hay nada que cambiar
+    resultado = conexion_bd.aplicar_layout(layout_almacen.slots_layout(carriles))
+    assert (resultado["insertar"], resultado["retirar"], resultado["aplicado"]) == (0, 0, False)
+
+
+def test_diferencias_se_leen_del_primario(almacen_sqlite, monkeypatch, capsys):
+    ruta, carriles = _base(almacen_sqlite)
+    # Una réplica atrasada no debe influir en las diferencias
+    monkeypatch.setattr(conexion_bd, "obtener_todas_las_posiciones", lambda: [])
+    archivo = io.StringIO()
+    layout_almacen.escribir_layout(carriles, archivo)
+    ruta_layout = ruta + ".csv"
+    with open(ruta_layout, "w", encoding="utf-8") as destino:
+        destino.write(archivo.getvalue())
+
+    monkeypatch.setattr(sys, "argv", ["layout_almacen.py", "importar", ruta_layout])
+    layout_almacen.main()
+    salida = capsys.readouterr().out
+    assert "Posiciones a insertar: 3" in salida
+    assert "Posiciones a retirar: 1" in salida
+    assert "('A', 1, 1, 'B', 1)" in salida
@@ -0,0 +1,77 @@
+# tests/test_ledger.py
+
+from datetime import timedelta
+
+import cache_almacen
+import conexion_bd
+import ledger
+from modelo_almacen import Carril, ModeloAlmacen
+
+
+def _contenido(modelo):
+    return {clave: [p.npallet for p in carril.pallets] for clave, carril in modelo.carriles.items()}
+
+
+def _layout():
+    return ModeloAlmacen([Carril(("A", 1, 1, letra), 3) for letra in "ABC"])
+
+
+def test_reconstruir_modelo_aplica_movimientos_sobre_el_snapshot():
+    contenido = {"A|1|1|A": ["P1", "P2"], "A|1|1|B": ["P3"], "A|9|9|Z": ["P9"]}
+    movimientos = [
+        (11, "retiro", "P1", None, None, None, None),
+        (12, "asignacion", "P1", "A", 1, 1, "C"),
+        (13, "asignacion", "P4", "A", 1, 1, "B"),
+        # Reubicación registrada solo como asignación: sale de su carril anterior
+        (14, "asignacion", "P2", "A", 1, 1, "C"),
+        # Carril que ya no existe en el layout
+        (15, "asignacion", "P5", "A", 9, 9, "Z"),
+    ]
+    modelo = ledger.reconstruir_modelo(_layout(), contenido, movimientos)
+
+    assert _contenido(modelo) == {
+        ("A", 1, 1, "A"): [],
+        ("A", 1, 1, "B"): ["P4", "P3"],
+        ("A", 1, 1, "C"): ["P2", "P1"],
+    }
+    assert modelo.ubicacion_pallet == {"P4": ("A", 1, 1, "B"), "P3": ("A", 1, 1, "B"),
+                                       "P2": ("A", 1, 1, "C"), "P1": ("A", 1, 1, "C")}
+
+
+def test_reconstruir_sin_movimientos_devuelve_el_snapshot():
+    contenido = {"A|1|1|A": ["P1"]}
+    modelo = ledger.reconstruir_modelo(_layout(), contenido, [])
+    assert ledger.contenido_desde_modelo(modelo) == contenido
+
+
+def _ahora_bd():
+    return conexion_bd.obtener_ultimo_snapshot_ledger()[1]
+
+
+def test_ocupacion_en_coincide_con_la_base_despues_de_escrituras(almacen_sqlite, monkeypatch):
+    monkeypatch.setattr(ledger, "_cache_reconstrucciones", ledger.OrderedDict())
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "ABCD"}, ocupacion=0.5, npallets_extra=["12345678", "87654321"])
+    layout = cache_almacen.obtener_snapshot().modelo()
+
+    # Sin snapshots, la primera consulta toma uno con la ocupación actual
+    assert _contenido(ledger.ocupacion_en(_ahora_bd() + timedelta(seconds=2), layout)) == _contenido(layout)
+
+    frente_clave, frente = next((clave, c.pallets[0]) for clave, c in layout.carriles.items() if c.pallets)
+    libre = next(clave for clave, c in layout.carriles.items() if c.libres >= 2 and clave != frente_clave)
+    assert "liberad" in conexion_bd.liberar_ubicacion(frente.id_pallet).lower()
+    for npallet in ("12345678", "87654321"):
+        assert "asignado" in conexion_bd.asignar_ubicacion(conexion_bd.obtener_id_pallet(npallet), *libre)
+
+    actual = cache_almacen.obtener_snapshot().modelo()
+    reconstruido = ledger.ocupacion_en(_ahora_bd() + timedelta(seconds=2), layout)
+    assert _contenido(reconstruido) == _contenido(actual)
+    assert _contenido(reconstruido)[libre][:2] == ["87654321", "12345678"]
+
+
+def test_instante_anterior_al_primer_snapshot(almacen_sqlite, monkeypatch):
+    monkeypatch.setattr(ledger, "_cache_reconstrucciones", ledger.OrderedDict())
+    almacen_sqlite({("A", 1, 1, "A"): 4})
+    layout = cache_almacen.obtener_snapshot().modelo()
+    ledger.crear_snapshot_ledger()
+
+    assert ledger.ocupacion_en(_ahora_bd() - timedelta(hours=1), layout) is None
@@ -0,0 +1,79 @@
+# tests/test_limite_tasa.py
+
+import threading
+
+import pytest
+
+import limite_tasa
+from limite_tasa import LimitadorTasa
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    """Reloj monotónico manual: reloj[0] es el instante actual en segundos."""
+    instante = [1000.0]
+    monkeypatch.setattr(limite_tasa.time, "monotonic", lambda: instante[0])
+    return instante
+
+
+def _permitidas(limitador, cliente, intentos):
+    return sum(limitador.permitir(cliente) for _ in range(intentos))
+
+
+def test_rafaga_y_luego_rechazo(reloj):
+    limitador = LimitadorTasa(tasa=1, capacidad=5)
+    assert _permitidas(limitador, "a", 5) == 5
+    assert not limitador.permitir("a")
+
+
+def test_tokens_se_reponen_segun_la_tasa(reloj):
+    limitador = LimitadorTasa(tasa=2, capacidad=4)
+    assert _permitidas(limitador, "a", 4) == 4
+
+    reloj[0] += 0.25
+    assert not limitador.permitir("a")
+    # Medio token del intento rechazado no se pierde: a los 0,5 s hay uno entero
+    reloj[0] += 0.25
+    assert limitador.permitir("a")
+    assert not limitador.permitir("a")
+
+    reloj[0] += 1.5
+    assert _permitidas(limitador, "a", 4) == 3
+
+
+def test_la_cubeta_no_supera_la_capacidad(reloj):
+    limitador = LimitadorTasa(tasa=10, capacidad=3)
+    limitador.permitir("a")
+    reloj[0] += 3600
+    assert _permitidas(limitador, "a", 10) == 3
+
+
+def test_clientes_independientes(reloj):
+    limitador = LimitadorTasa(tasa=1, capacidad=2)
+    assert _permitidas(limitador, "a", 3) == 2
+    assert _permitidas(limitador, "b", 3) == 2
+
+
+def test_clientes_inactivos_se_olvidan(reloj):
+    limitador = LimitadorTasa(tasa=1, capacidad=2, expiracion=60)
+    limitador.permitir("inactivo")
+    reloj[0] += 30
+    limitador.permitir("activo")
+    reloj[0] += 40
+    limitador.permitir("activo")
+    assert set(limitador._cubetas) == {"activo"}
+
+
+def test_concurrencia_no_entrega_tokens_de_mas(reloj):
+    limitador = LimitadorTasa(tasa=1, capacidad=50)
+    permitidas = []
+
+    def pedir():
+        permitidas.append(_permitidas(limitador, "a", 20))
+
+    hilos = [threading.Thread(target=pedir) for _ in range(8)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join()
+    assert sum(permitidas) == 50
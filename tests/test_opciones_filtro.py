@@ -0,0 +1,51 @@
+# tests/test_opciones_filtro.py
+#
+# Opciones de los filtros servidas desde el snapshot en memoria frente a la consulta
+# obtener_opciones_disponibles sobre la base SQLite.
+
+import pytest
+
+import cache_almacen
+import conexion_bd
+
+
+CARRILES = {
+    ("A", piso, rack, letra): 3
+    for piso in (1, 2)
+    for rack in (1, 2)
+    for letra in ("A", "B", "C")
+}
+
+
+@pytest.fixture
+def snapshot(almacen_sqlite):
+    almacen_sqlite(CARRILES, ocupacion=0.6)
+    return cache_almacen.obtener_snapshot()
+
+
+@pytest.mark.parametrize("filtros", [
+    {},
+    {"tipo_almacen": "A"},
+    {"piso": 2},
+    {"piso": 1, "rack": 2},
+    {"tipo_almacen": "A", "piso": 2, "rack": 1, "letra": "B"},
+    {"letra": "Z"},
+])
+def test_opciones_disponibles_igual_a_la_consulta(snapshot, filtros):
+    assert snapshot.opciones_disponibles(**filtros) == conexion_bd.obtener_opciones_disponibles(**filtros)
+
+
+def test_token_de_opciones_depende_solo_de_los_valores(snapshot):
+    copia = cache_almacen.SnapshotAlmacen(snapshot.version + 1, snapshot.posiciones)
+    assert copia.token_opciones == snapshot.token_opciones
+
+    # Cambiar la posición de un pallet no cambia los valores distintos de los filtros
+    posiciones = list(snapshot.posiciones)
+    posiciones.reverse()
+    assert cache_almacen.SnapshotAlmacen(0, posiciones).token_opciones == snapshot.token_opciones
+
+    i = next(i for i, fila in enumerate(posiciones) if fila[11] is not None)
+    fila = list(posiciones[i])
+    fila[8] = "Variedad nueva"
+    posiciones[i] = tuple(fila)
+    assert cache_almacen.SnapshotAlmacen(0, posiciones).token_opciones != snapshot.token_opciones
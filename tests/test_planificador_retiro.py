@@ -0,0 +1,106 @@
+# tests/test_planificador_retiro.py
+
+import cache_almacen
+import conexion_bd
+from modelo_almacen import Carril, ModeloAlmacen, PalletModelo
+from planificador_retiro import planificar_retiro
+
+
+def _pallet(numero, variedad="Cerdo", mercado="China", fecha_faena="20240110"):
+    return PalletModelo(f"{numero:08d}", numero, variedad, mercado, fecha_faena)
+
+
+def _modelo():
+    # pallets[0] es la posición 1
+    return ModeloAlmacen([
+        Carril(("A", 1, 1, "A"), 4, [_pallet(1), _pallet(2), _pallet(3)]),
+        Carril(("A", 1, 1, "B"), 4, [_pallet(4), _pallet(5)]),
+        Carril(("A", 1, 1, "C"), 4, [_pallet(6)]),
+        Carril(("A", 1, 1, "D"), 4),
+    ])
+
+
+def _reproducir(modelo, pasos):
+    """Aplica los pasos con las reglas del modelo; retirar() falla si el pallet no está en la posición 1."""
+    modelo = modelo.copiar()
+    for paso in pasos:
+        assert modelo.posicion(paso["npallet"]) == (paso["origen"], 1)
+        pallet = modelo.retirar(paso["npallet"])
+        if paso["accion"] == "reubicar":
+            modelo.ingresar(paso["destino"], pallet)
+    return modelo
+
+
+def test_plan_respeta_la_posicion_1_y_mueve_solo_los_bloqueantes():
+    modelo = _modelo()
+    objetivos = ["00000003", "00000005"]
+    plan = planificar_retiro(modelo, objetivos)
+
+    assert plan["completo"] and plan["faltantes"] == []
+    final = _reproducir(modelo, plan["pasos"])
+    assert all(final.posicion(n) is None for n in objetivos)
+    # 1 y 2 tapan a 3 y 4 tapa a 5: tres reubicaciones, cada una una sola vez
+    reubicados = [paso["npallet"] for paso in plan["pasos"] if paso["accion"] == "reubicar"]
+    assert sorted(reubicados) == ["00000001", "00000002", "00000004"]
+    # Ningún pallet se reubica en un carril con pallets por despachar
+    assert all(paso["destino"] not in (("A", 1, 1, "A"), ("A", 1, 1, "B")) for paso in plan["pasos"] if paso["destino"])
+    assert final.total_ocupadas() == modelo.total_ocupadas() - 2
+
+
+def test_plan_no_modifica_el_modelo_y_reporta_faltantes():
+    modelo = _modelo()
+    antes = modelo.posiciones()
+    plan = planificar_retiro(modelo, ["00000006", "99999999"])
+
+    assert modelo.posiciones() == antes
+    assert plan["faltantes"] == ["99999999"]
+    assert [paso["accion"] for paso in plan["pasos"]] == ["retirar"]
+
+
+def test_sin_espacio_para_reubicar_el_plan_queda_incompleto():
+    modelo = ModeloAlmacen([
+        Carril(("A", 1, 1, "A"), 2, [_pallet(1), _pallet(2)]),
+        Carril(("A", 1, 1, "B"), 1, [_pallet(3)]),
+    ])
+    plan = planificar_retiro(modelo, ["00000002"])
+    assert not plan["completo"]
+    assert plan["pasos"] == []
+
+
+def _plan_en_base(npallets):
+    modelo = cache_almacen.obtener_snapshot().modelo()
+    plan = planificar_retiro(modelo, npallets)
+    claves = {paso[extremo] for paso in plan["pasos"] for extremo in ("origen", "destino") if paso[extremo]}
+    return modelo, plan, modelo.contenido_carriles(claves)
+
+
+def test_plan_ejecutado_en_la_base_deja_el_estado_del_modelo(almacen_sqlite):
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "ABCDEF"}, ocupacion=0.6)
+    modelo = cache_almacen.obtener_snapshot().modelo()
+    profundo = next(c.pallets[-1].npallet for c in modelo.carriles.values() if len(c.pallets) >= 2)
+    modelo, plan, carriles = _plan_en_base([profundo])
+
+    assert plan["completo"]
+    resultado = conexion_bd.ejecutar_lote_movimientos(plan["pasos"], carriles)
+    assert resultado.startswith("Lote de"), resultado
+    esperado = _reproducir(modelo, plan["pasos"])
+    actual = cache_almacen.obtener_snapshot().modelo()
+    assert {c: [p.npallet for p in carril.pallets] for c, carril in actual.carriles.items()} == \
+        {c: [p.npallet for p in carril.pallets] for c, carril in esperado.carriles.items()}
+
+
+def test_plan_desactualizado_no_se_ejecuta(almacen_sqlite):
+    almacen_sqlite({("A", 1, 1, letra): 4 for letra in "ABCDEF"}, ocupacion=0.6, npallets_extra=["12345678"])
+    modelo = cache_almacen.obtener_snapshot().modelo()
+    profundo = next(c.pallets[-1].npallet for c in modelo.carriles.values() if 2 <= len(c.pallets) < c.profundidad)
+    _, plan, carriles = _plan_en_base([profundo])
+
+    # Otro usuario ingresa un pallet en el carril de origen después de planificar
+    origen = plan["pasos"][0]["origen"]
+    id_extra = conexion_bd.obtener_id_pallet("12345678")
+    assert "asignado" in conexion_bd.asignar_ubicacion(id_extra, *origen)
+    antes = conexion_bd.obtener_todas_las_posiciones()
+
+    resultado = conexion_bd.ejecutar_lote_movimientos(plan["pasos"], carriles)
+    assert "cambió desde que se calculó el plan" in resultado
+    assert sorted(conexion_bd.obtener_todas_las_posiciones()) == sorted(antes)
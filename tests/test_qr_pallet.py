@@ -0,0 +1,118 @@
+# tests/test_qr_pallet.py
+
+import sqlite3
+
+import pytest
+
+import app
+import conexion_bd
+from qr_pallet import RegistroQR, extraer_npallet, validar_lote, validar_qr
+
+
+VALIDA = "Cerdo,Pallet 1,China,20240110,00000001"
+
+
+def _linea(numero, fecha_faena="20240110"):
+    return f"Cerdo,Pallet {numero},China,{fecha_faena},{numero:08d}"
+
+
+def test_validar_qr():
+    assert validar_qr(VALIDA) == (RegistroQR("Cerdo", "Pallet 1", "China", "20240110", "00000001"), None)
+
+
+@pytest.mark.parametrize("linea, mensaje", [
+    ("Cerdo,Pallet 1,China,20240110", "5 campos"),
+    (VALIDA + ",extra", "5 campos"),
+    ("Cerdo,Pallet 1,China,2024011,00000001", "Fecha Faena"),
+    ("Cerdo,Pallet 1,China,2024-1-10,00000001", "Fecha Faena"),
+    # Dígitos que no son ASCII tampoco son una fecha válida
+    ("Cerdo,Pallet 1,China,２０２４０１１０,00000001", "Fecha Faena"),
+    ("Cerdo,Pallet 1,China,20240110,0000001", "NPallet"),
+    ("Cerdo,Pallet 1,China,20240110,000000001", "NPallet"),
+])
+def test_validar_qr_errores(linea, mensaje):
+    registro, error = validar_qr(linea)
+    assert registro is None and mensaje in error
+
+
+def test_extraer_npallet():
+    assert extraer_npallet(VALIDA) == ("00000001", None)
+    assert extraer_npallet(" 12345678 ") == ("12345678", None)
+    assert extraer_npallet("Cerdo,Pallet 1,China,20240110,ABCDEFGH")[0] is None
+
+
+def test_lote_valido_por_columnas():
+    lineas = [_linea(i) for i in range(1, 6)]
+    lote = validar_lote("\r\n".join(lineas))
+    assert lote.errores == []
+    assert list(lote.lineas) == [1, 2, 3, 4, 5]
+    assert lote.n_pallet == [f"{i:08d}" for i in range(1, 6)]
+    assert [registro for _, registro in lote.registros()] == [validar_qr(linea)[0] for linea in lineas]
+
+
+def test_lote_ignora_lineas_vacias_y_conserva_su_numero():
+    lote = validar_lote(f"\n{_linea(1)}\n\n{_linea(2)}\n")
+    assert lote.errores == []
+    assert list(lote.lineas) == [2, 4]
+    assert validar_lote("\n\n").errores == [] and len(validar_lote("")) == 0
+
+
+def test_lote_con_errores_se_revisa_linea_por_linea():
+    texto = "\n".join([
+        _linea(1),
+        "Cerdo,Pallet 2,China,20240110",
+        "",
+        _linea(3, fecha_faena="2024011A"),
+        "Cerdo,Pallet 4,China,20240110,0004",
+        _linea(5),
+    ])
+    lote = validar_lote(texto)
+    assert list(lote.lineas) == [1, 6]
+    assert lote.n_pallet == ["00000001", "00000005"]
+    assert [numero for numero, _ in lote.errores] == [2, 4, 5]
+    # Los mensajes son los mismos que los de validar_qr
+    lineas = texto.split("\n")
+    assert [error for _, error in lote.errores] == [validar_qr(lineas[i - 1])[1] for i in (2, 4, 5)]
+
+
+@pytest.mark.parametrize("error", ["fecha", "npallet", "campos"])
+def test_lote_ambas_rutas_coinciden(error):
+    lineas = [_linea(i) for i in range(1, 50)]
+    lineas[17] = {
+        "fecha": _linea(18, fecha_faena="1801202"),
+        "npallet": _linea(18)[:-1],
+        "campos": _linea(18) + ",x",
+    }[error]
+    lote = validar_lote("\n".join(lineas))
+    validos = [(i, validar_qr(linea)[0]) for i, linea in enumerate(lineas, start=1) if validar_qr(linea)[1] is None]
+    assert list(lote.registros()) == validos
+    assert lote.errores == [(18, validar_qr(lineas[17])[1])]
+
+
+def _npallets(ruta):
+    conn = sqlite3.connect(ruta)
+    npallets = {fila[0] for fila in conn.execute("SELECT NPallet FROM pallets")}
+    conn.close()
+    return npallets
+
+
+def test_ingreso_de_lote(almacen_sqlite):
+    ruta = almacen_sqlite({("A", 1, 1, "A"): 2}, ocupacion=0, npallets_extra=["00000002"])
+    texto = "\n".join([_linea(1), "", _linea(2), _linea(3, fecha_faena="2024"), _linea(1), _linea(4)])
+
+    resultado = conexion_bd.ingresar_lote_pallets(texto)
+    assert resultado["ingresados"] == 2
+    assert [(numero, "ya existe" in error or "repetido" in error) for numero, error in resultado["errores"]] == [
+        (3, True), (4, False), (5, True),
+    ]
+    assert {"00000001", "00000004"} <= _npallets(ruta)
+
+
+def test_callback_de_lote(almacen_sqlite):
+    almacen_sqlite({("A", 1, 1, "A"): 2}, ocupacion=0)
+    alerta, texto = app.manejar_ingresar_lote(1, "\n".join([_linea(1), _linea(2)]), None)
+    assert alerta.color == "success" and texto == ""
+
+    # Con errores el texto se conserva para corregirlo
+    alerta, texto = app.manejar_ingresar_lote(1, _linea(1), None)
+    assert alerta.color == "danger" and texto is app.no_update
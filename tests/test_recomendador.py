@@ -0,0 +1,55 @@
+# tests/test_recomendador.py
+
+from modelo_almacen import Carril, ModeloAlmacen, PalletModelo
+from recomendador import PESO_CARRIL_VACIO, puntaje_carril, recomendar_ubicaciones
+
+
+def _pallet(numero, variedad="Cerdo", mercado="China", fecha_faena="20240110"):
+    return PalletModelo(f"{numero:08d}", numero, variedad, mercado, fecha_faena)
+
+
+def _modelo():
+    return ModeloAlmacen([
+        # Mismo grupo, con faenas posteriores: el nuevo no bloquea a nadie
+        Carril(("A", 2, 1, "A"), 4, [_pallet(1, fecha_faena="20240115")]),
+        # Mismo grupo pero con una faena anterior: quedaría bloqueado
+        Carril(("A", 1, 1, "B"), 4, [_pallet(2, fecha_faena="20240105")]),
+        # Otro mercado: quedaría bloqueado
+        Carril(("A", 1, 1, "C"), 4, [_pallet(3, mercado="USA", fecha_faena="20240120")]),
+        # Lleno
+        Carril(("A", 1, 1, "D"), 2, [_pallet(4, fecha_faena="20240120"), _pallet(5, fecha_faena="20240120")]),
+        Carril(("A", 2, 1, "E"), 4),
+        Carril(("A", 1, 1, "F"), 4),
+    ])
+
+
+def test_puntaje_de_carril_lleno_y_vacio():
+    modelo = _modelo()
+    assert puntaje_carril(modelo.carriles[("A", 1, 1, "D")], _pallet(9)) is None
+    assert puntaje_carril(modelo.carriles[("A", 1, 1, "F")], _pallet(9)) == PESO_CARRIL_VACIO
+
+
+def test_prefiere_carril_del_mismo_grupo_sin_bloqueos():
+    recomendaciones = recomendar_ubicaciones(_modelo(), _pallet(9), limite=6)
+    claves = [clave for _, clave in recomendaciones]
+
+    assert claves[0] == ("A", 2, 1, "A")
+    assert ("A", 1, 1, "D") not in claves
+    # A igual puntaje (carriles vacíos) se prefiere el piso más bajo
+    assert claves.index(("A", 1, 1, "F")) < claves.index(("A", 2, 1, "E"))
+    # Los carriles donde el pallet bloquearía a otro quedan al final
+    assert set(claves[-2:]) == {("A", 1, 1, "B"), ("A", 1, 1, "C")}
+    assert [p for p, _ in recomendaciones] == sorted(p for p, _ in recomendaciones)
+
+
+def test_fecha_en_formato_ddmmaaaa_se_compara_como_fecha():
+    modelo = ModeloAlmacen([Carril(("A", 1, 1, "A"), 4, [_pallet(1, fecha_faena="15012024")])])
+    # 10/01/2024 es anterior a 15/01/2024: el pallet del carril no queda bloqueado
+    puntaje, _ = recomendar_ubicaciones(modelo, _pallet(9, fecha_faena="10012024"))[0]
+    assert puntaje < 0
+
+
+def test_filtros_y_limite():
+    recomendaciones = recomendar_ubicaciones(_modelo(), _pallet(9), limite=2, piso=1)
+    assert len(recomendaciones) == 2
+    assert all(clave[1] == 1 for _, clave in recomendaciones)
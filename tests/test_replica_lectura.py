@@ -0,0 +1,124 @@
+# tests/test_replica_lectura.py
+#
+# Ruteo de conectar_bd_lectura() entre primario y réplica con dos bases SQLite de
+# benchmarks/bd_sqlite.py en lugar de SQL Server.
+
+import os
+import sqlite3
+import sys
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(RAIZ, "benchmarks"))
+sys.path.insert(0, RAIZ)
+
+import bd_sqlite  # noqa: E402
+import circuito_bd  # noqa: E402
+import conexion_bd  # noqa: E402
+import sitios  # noqa: E402
+
+
+SITIO = sitios.SITIO_PREDETERMINADO
+
+
+def _registrar_movimiento(ruta, id_movimiento, segundos_atras=0):
+    conn = sqlite3.connect(ruta)
+    conn.execute(
+        "INSERT INTO ledger_movimientos (id_movimiento, fecha_hora, tipo_movimiento, id_pallet) "
+        "VALUES (?, strftime('%Y-%m-%d %H:%M:%f', 'now', 'localtime', ?), 'asignacion', 1)",
+        (id_movimiento, f"-{segundos_atras} seconds"),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _destino(conn):
+    """'replica' o 'primario' según la base de la conexión prestada."""
+    fila = conn.cursor().execute("SELECT descripcion FROM pallets WHERE id_pallet = 0").fetchone()
+    return fila[0]
+
+
+@pytest.fixture
+def bases(tmp_path, monkeypatch):
+    rutas = {}
+    for destino in ("primario", "replica"):
+        ruta = str(tmp_path / f"{destino}.db")
+        bd_sqlite.crear_base(ruta, {("A", 1, 1, "A"): 2}, ocupacion=0)
+        # Marca para saber a qué base apunta cada conexión
+        conn = sqlite3.connect(ruta)
+        conn.execute("INSERT INTO pallets (id_pallet, descripcion) VALUES (0, ?)", (destino,))
+        conn.commit()
+        conn.close()
+        rutas[destino] = ruta
+
+    monkeypatch.setattr(conexion_bd, "_conectar", conexion_bd._conectar)
+    bd_sqlite.instalar(rutas["primario"], replica=rutas["replica"])
+    monkeypatch.setitem(sitios.SITIOS, SITIO, sitios.SITIOS[SITIO]._replace(servidor_lectura="replica"))
+    monkeypatch.setattr(conexion_bd, "DESFASE_MAXIMO_REPLICA", 5.0)
+    monkeypatch.setattr(conexion_bd, "INTERVALO_MEDICION_DESFASE", 60.0)
+    monkeypatch.setattr(conexion_bd, "_pools", {})
+    monkeypatch.setattr(conexion_bd, "_desfases", {})
+    monkeypatch.setattr(circuito_bd, "_circuitos", {})
+    return rutas
+
+
+def test_replica_al_dia_atiende_la_lectura(bases):
+    _registrar_movimiento(bases["primario"], 1)
+    _registrar_movimiento(bases["replica"], 1)
+
+    assert _destino(conexion_bd.conectar_bd_lectura()) == "replica"
+
+
+def test_replica_atrasada_mas_del_maximo_usa_el_primario(bases):
+    _registrar_movimiento(bases["primario"], 1, segundos_atras=60)
+
+    assert _destino(conexion_bd.conectar_bd_lectura()) == "primario"
+
+
+def test_atraso_menor_al_maximo_usa_la_replica(bases):
+    _registrar_movimiento(bases["primario"], 1, segundos_atras=1)
+
+    assert _destino(conexion_bd.conectar_bd_lectura()) == "replica"
+
+
+def test_desfase_se_calcula_con_el_reloj_de_la_base(bases):
+    _registrar_movimiento(bases["primario"], 1, segundos_atras=30)
+    primario, replica = conexion_bd.conectar_bd(), conexion_bd.conectar_replica()
+
+    assert 29 <= conexion_bd.desfase_replica(primario, replica) < 40
+    _registrar_movimiento(bases["replica"], 1, segundos_atras=30)
+    assert conexion_bd.desfase_replica(primario, replica) == 0
+
+
+def test_la_medicion_se_reutiliza_durante_el_intervalo(bases, monkeypatch):
+    mediciones = []
+    desfase_replica = conexion_bd.desfase_replica
+    monkeypatch.setattr(
+        conexion_bd, "desfase_replica", lambda *args: mediciones.append(1) or desfase_replica(*args)
+    )
+
+    for _ in range(20):
+        conexion_bd.conectar_bd_lectura().close()
+    assert len(mediciones) == 1
+
+    monkeypatch.setattr(conexion_bd, "INTERVALO_MEDICION_DESFASE", 0)
+    conexion_bd.conectar_bd_lectura().close()
+    assert len(mediciones) == 2
+
+
+def test_replica_con_circuito_abierto_usa_el_primario(bases):
+    circuito = circuito_bd.circuito_sitio(SITIO, "replica")
+    for _ in range(circuito.fallos_para_abrir):
+        circuito.registrar_fallo("sin respuesta")
+
+    assert _destino(conexion_bd.conectar_bd_lectura()) == "primario"
+
+
+def test_primario_con_circuito_abierto_usa_la_replica(bases):
+    _registrar_movimiento(bases["primario"], 1, segundos_atras=60)
+    circuito = circuito_bd.circuito_sitio(SITIO, "primario")
+    for _ in range(circuito.fallos_para_abrir):
+        circuito.registrar_fallo("sin respuesta")
+
+    assert _destino(conexion_bd.conectar_bd_lectura()) == "replica"
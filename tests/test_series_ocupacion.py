@@ -0,0 +1,75 @@
+# tests/test_series_ocupacion.py
+
+import time
+
+import cache_almacen
+import series_ocupacion
+from series_ocupacion import SerieRing
+
+
+def test_buckets_acumulan_promedio_minimo_y_maximo(tmp_path):
+    serie = SerieRing(str(tmp_path / "s.ring"), segundos=60, capacidad=10)
+    for instante, valor in ((600, 10.0), (630, 30.0), (659, 20.0), (660, 50.0)):
+        serie.agregar(instante, valor)
+
+    assert serie.leer() == [(600, 20.0, 10.0, 30.0), (660, 50.0, 50.0, 50.0)]
+    assert serie.leer(desde=660) == [(660, 50.0, 50.0, 50.0)]
+    assert serie.leer(hasta=600) == [(600, 20.0, 10.0, 30.0)]
+
+
+def test_ring_reemplaza_los_buckets_de_la_vuelta_anterior(tmp_path):
+    serie = SerieRing(str(tmp_path / "s.ring"), segundos=60, capacidad=4)
+    for i in range(6):
+        serie.agregar(i * 60, float(i))
+
+    # Con 4 buckets solo quedan los 4 últimos; el bucket 4 ocupa el lugar del 0
+    assert [punto[:2] for punto in serie.leer()] == [(120, 2.0), (180, 3.0), (240, 4.0), (300, 5.0)]
+    # Una muestra nueva en un bucket reutilizado no se suma a la de la vuelta anterior
+    serie.agregar(6 * 60 + 1, 100.0)
+    assert serie.leer(desde=360) == [(360, 100.0, 100.0, 100.0)]
+
+
+def test_serie_persiste_en_el_archivo(tmp_path):
+    ruta = str(tmp_path / "s.ring")
+    SerieRing(ruta, segundos=60, capacidad=4).agregar(120, 7.0)
+    assert SerieRing(ruta, segundos=60, capacidad=4).leer() == [(120, 7.0, 7.0, 7.0)]
+
+
+def test_utilizacion_por_serie():
+    posiciones = [
+        ("A", 1, 1, "A", 1, "Ocupado", 1, None, "V", "M", "20240101", "00000001"),
+        ("A", 1, 1, "A", 2, "Libre", None, None, None, None, None, None),
+        ("B", 1, 2, "A", 1, "Libre", None, None, None, None, None, None),
+        ("B", 1, 2, "A", 2, "Libre", None, None, None, None, None, None),
+    ]
+    assert series_ocupacion.utilizacion_por_serie(posiciones) == {
+        "general": 25.0, "tipo_A": 50.0, "rack_A_1": 50.0, "tipo_B": 0.0, "rack_B_2": 0.0,
+    }
+
+
+def test_muestreo_programado_sin_consultas(almacen_sqlite, monkeypatch):
+    almacen_sqlite({("A", 1, 1, letra): 2 for letra in "AB"}, ocupacion=0.5)
+    monkeypatch.setattr(series_ocupacion, "INTERVALO_MUESTREO", 0.05)
+
+    # Sin refresco del snapshot, el muestreo corre en su propio hilo
+    assert cache_almacen.iniciar_refresco_snapshot(intervalo=0) == []
+    hilo = cache_almacen.estado_sitio().muestreo
+    assert hilo is not None
+    try:
+        limite = time.monotonic() + 5
+        while not series_ocupacion.series_disponibles() and time.monotonic() < limite:
+            time.sleep(0.02)
+    finally:
+        hilo.detener.set()
+        hilo.join()
+
+    assert "general" in series_ocupacion.series_disponibles()
+    assert series_ocupacion.leer("general", "1m")
+
+
+def test_series_desactivadas(almacen_sqlite, monkeypatch):
+    almacen_sqlite({("A", 1, 1, "A"): 2})
+    monkeypatch.setattr(series_ocupacion, "INTERVALO_MUESTREO", 0)
+    assert cache_almacen.iniciar_muestreo_ocupacion() == []
+    cache_almacen.obtener_snapshot()
+    assert series_ocupacion.series_disponibles() == []
@@ -0,0 +1,134 @@
+# tests/test_simulador_almacen.py
+
+import io
+
+import pytest
+
+import simulador_almacen
+from modelo_almacen import ModeloAlmacen, PalletModelo
+from simulador_almacen import Simulador, flujo_sintetico, leer_flujo
+
+
+def _pallet(numero, variedad="Cerdo", mercado="China", fecha_faena="20240110"):
+    return PalletModelo(f"{numero:08d}", numero, variedad, mercado, fecha_faena)
+
+
+def _contenido(simulador):
+    return {clave: [p.npallet for p in carril.pallets] for clave, carril in simulador.modelo.carriles.items()}
+
+
+@pytest.fixture
+def retiros(monkeypatch):
+    """Registra la posición de cada pallet que el simulador retira del modelo."""
+    posiciones = []
+    original = ModeloAlmacen.retirar
+
+    def retirar(modelo, npallet):
+        posiciones.append(modelo.posicion(npallet)[1])
+        return original(modelo, npallet)
+
+    monkeypatch.setattr(ModeloAlmacen, "retirar", retirar)
+    return posiciones
+
+
+A, B = ("A", 1, 1, "A"), ("A", 1, 1, "B")
+
+
+def test_llegadas_entran_por_el_frente_del_carril():
+    simulador = Simulador({A: 3, B: 3})
+    for i in range(1, 4):
+        simulador.procesar(i, "llegada", _pallet(i))
+    # Mismo lote en el mismo carril; el último en llegar queda en la posición 1
+    assert _contenido(simulador)[A] == ["00000003", "00000002", "00000001"]
+    assert simulador.modelo.posicion("00000003") == (A, 1)
+
+    # Otro lote abre un carril vacío
+    simulador.procesar(4, "llegada", _pallet(4, mercado="USA"))
+    assert _contenido(simulador)[B] == ["00000004"]
+
+
+def test_despacho_devolviendo_bloqueantes(retiros):
+    simulador = Simulador({A: 3, B: 3}, bloqueantes="devolver")
+    for i in range(1, 4):
+        simulador.procesar(i, "llegada", _pallet(i))
+
+    # El pallet 1 está en la posición 3: se sacan el 3 y el 2 y se vuelven a ingresar
+    assert simulador.despachar("00000001") == 1 + 2 * 2
+    assert retiros == [1, 1, 1]
+    assert _contenido(simulador)[A] == ["00000003", "00000002"]
+    assert simulador.movimientos_bloqueo == 4
+
+
+def test_despacho_reubicando_bloqueantes(retiros):
+    simulador = Simulador({A: 3, B: 3}, bloqueantes="reubicar")
+    for i in range(1, 4):
+        simulador.procesar(i, "llegada", _pallet(i))
+
+    assert simulador.despachar("00000002") == 2
+    assert retiros == [1, 1]
+    # El bloqueante no vuelve a su carril: se ubica en otro
+    assert _contenido(simulador) == {A: ["00000001"], B: ["00000003"]}
+
+
+def test_despacho_fefo_elige_el_mas_antiguo_y_menos_tapado(retiros):
+    simulador = Simulador({A: 3, B: 3}, politica="aleatoria")
+    simulador._ingresar(A, _pallet(1, fecha_faena="20240105"))
+    simulador._ingresar(A, _pallet(2, fecha_faena="20240101"))
+    simulador._ingresar(B, _pallet(3, fecha_faena="20240101"))
+    simulador._ingresar(B, _pallet(4, fecha_faena="20240110"))
+
+    # 2 y 3 tienen la fecha más antigua; 2 está en la posición 1 y 3 tapado por 4
+    simulador.procesar(10, "despacho", ("Cerdo", "China"))
+    assert "00000002" not in simulador.modelo.ubicacion_pallet
+    simulador.procesar(20, "despacho", ("Cerdo", "China"))
+    assert "00000003" not in simulador.modelo.ubicacion_pallet
+    assert all(posicion == 1 for posicion in retiros)
+
+    simulador.procesar(30, "despacho", ("Pollo", "USA"))
+    assert (simulador.despachos, simulador.sin_stock) == (2, 1)
+
+
+def test_llegada_rechazada_sin_espacio():
+    simulador = Simulador({A: 1})
+    simulador.procesar(1, "llegada", _pallet(1))
+    simulador.procesar(2, "llegada", _pallet(2))
+    assert (simulador.ubicados, simulador.rechazados) == (1, 1)
+
+
+def test_operaciones_esperan_al_montacargas():
+    simulador = Simulador({A: 3, B: 3}, montacargas=1, segundos_movimiento=60)
+    simulador.procesar(0, "llegada", _pallet(1))
+    simulador.procesar(0, "llegada", _pallet(2))
+    assert simulador.espera_maxima == 60
+
+
+@pytest.mark.parametrize("politica", simulador_almacen.POLITICAS)
+@pytest.mark.parametrize("bloqueantes", simulador_almacen.MODOS_BLOQUEANTES)
+def test_simulacion_sintetica_solo_retira_desde_la_posicion_1(retiros, politica, bloqueantes):
+    carriles = {("A", piso, 1, letra): 4 for piso in (1, 2) for letra in "ABCDEF"}
+    simulador = Simulador(carriles, politica, bloqueantes)
+    resumen = simulador.ejecutar(flujo_sintetico(dias=5, llegadas_por_dia=20))
+
+    assert retiros and set(retiros) == {1}
+    assert resumen["llegadas"] == resumen["ubicados"] + resumen["rechazados"]
+    assert simulador.modelo.total_ocupadas() == resumen["ubicados"] - resumen["despachos"]
+    assert len(simulador.modelo.ubicacion_pallet) == simulador.modelo.total_ocupadas()
+
+
+def test_leer_flujo():
+    archivo = io.StringIO(
+        "fecha_hora,evento,npallet,variedad,mercado,fecha_faena\n"
+        "2024-03-01 08:00:00,llegada,00012345,Cerdo,China,20240229\n"
+        "2024-03-01 09:00:00,despacho,,Cerdo,China,\n"
+        "2024-03-01 09:30:00,despacho,00012345,,,\n"
+    )
+    eventos = list(leer_flujo(archivo))
+    assert eventos[0] == (0, "llegada", PalletModelo("00012345", 1, "Cerdo", "China", "20240229"))
+    assert eventos[1] == (3600, "despacho", ("Cerdo", "China"))
+    assert eventos[2] == (5400, "despacho", "00012345")
+
+
+def test_leer_flujo_indica_la_linea_erronea():
+    archivo = io.StringIO("fecha_hora,evento\n2024-03-01 08:00:00,llegada\n2024-03-01 08:00:00,traslado\n")
+    with pytest.raises(ValueError, match="Línea 3"):
+        list(leer_flujo(archivo))
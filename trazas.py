@@ -0,0 +1,196 @@
+# trazas.py
+#
+# Grabación opcional de tráfico real para pruebas de regresión de rendimiento.
+#
+# Con TRAZA_ARCHIVO=/ruta/base se registra, como una línea JSON por evento:
+#   - cada invocación de un callback de Dash (POST a /_dash-update-component):
+#     {"t", "tipo": "callback", "sitio", "salida", "cuerpo", "ms", "estado"}
+#   - cada llamada a las funciones públicas de conexion_bd:
+#     {"t", "tipo": "bd", "sitio", "funcion", "args", "ms", "error"}
+#
+# Cada proceso escribe su propio archivo comprimido /ruta/base.<pid>.jsonl.gz, por lo
+# que los workers de gunicorn no se mezclan. Los valores de los campos de contraseña
+# no se graban. benchmarks/reproducir_traza.py reproduce la traza.
+
+import atexit
+import functools
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+
+import sitios
+
+
+ARCHIVO_TRAZA = os.getenv("TRAZA_ARCHIVO")
+
+# Funciones de conexion_bd que no se graban: utilidades internas o generadores
+FUNCIONES_EXCLUIDAS = {
+    "suscribir_cambios_datos",
+    "suscribir_movimientos",
+    "marcar_cambio_datos",
+    "obtener_version_datos",
+    "conectar_bd",
+    "conectar_replica",
+    "conectar_bd_lectura",
+    "pool_sitio",
+    "desfase_replica",
+    "cerrar_conexion_bd",
+    "iterar_posiciones_exportacion",
+    "aplicar_layout",
+}
+
+# Funciones cuyos argumentos no se graban (credenciales)
+FUNCIONES_SIN_ARGUMENTOS = {"crear_usuario", "verificar_credenciales"}
+
+# Cada cuántos registros se vacía el buffer al archivo
+REGISTROS_POR_VACIADO = 200
+
+
+class GrabadorTraza:
+    """
+    Escribe registros JSON compactos en un archivo gzip por proceso.
+
+    El archivo se abre en el primer registro de cada proceso: con preload_app el
+    módulo se importa en el maestro y cada worker debe escribir en su propio archivo.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self._archivo = None
+        self._pid = None
+        self._pendientes = 0
+        self._lock = threading.Lock()
+        atexit.register(self.cerrar)
+
+    def registrar(self, registro):
+        linea = json.dumps(registro, separators=(",", ":"), ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._archivo = gzip.open(f"{self.base}.{self._pid}.jsonl.gz", "at", encoding="utf-8")
+            self._archivo.write(linea)
+            self._pendientes += 1
+            if self._pendientes >= REGISTROS_POR_VACIADO:
+                self._archivo.flush()
+                self._pendientes = 0
+
+    def cerrar(self):
+        with self._lock:
+            if self._archivo is not None and self._pid == os.getpid():
+                self._archivo.close()
+            self._archivo = None
+            self._pid = None
+
+
+grabador = GrabadorTraza(ARCHIVO_TRAZA) if ARCHIVO_TRAZA else None
+
+
+def _trazar_funcion(funcion):
+    nombre = funcion.__name__
+    sin_argumentos = nombre in FUNCIONES_SIN_ARGUMENTOS
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        instante, inicio = time.time(), time.perf_counter()
+        error = None
+        try:
+            return funcion(*args, **kwargs)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            grabador.registrar({
+                "t": instante,
+                "tipo": "bd",
+                "sitio": sitios.sitio_actual(),
+                "funcion": nombre,
+                "args": None if sin_argumentos else [list(args), kwargs],
+                "ms": round((time.perf_counter() - inicio) * 1000, 3),
+                "error": error,
+            })
+
+    return envoltura
+
+
+def instrumentar_modulo(espacio):
+    """
+    Reemplaza en `espacio` (globals() de un módulo) sus funciones públicas por versiones que se graban.
+
+    Debe llamarse al final del módulo, antes de que otros módulos importen sus
+    funciones por nombre. Sin TRAZA_ARCHIVO no hace nada.
+    """
+    if grabador is None:
+        return
+    modulo = espacio["__name__"]
+    for nombre, valor in list(espacio.items()):
+        if (
+            callable(valor) and not isinstance(valor, type)
+            and getattr(valor, "__module__", None) == modulo
+            and not nombre.startswith("_")
+            and nombre not in FUNCIONES_EXCLUIDAS
+        ):
+            espacio[nombre] = _trazar_funcion(valor)
+
+
+def _ocultar_contrasenas(cuerpo):
+    for clave in ("inputs", "state"):
+        for entrada in cuerpo.get(clave) or []:
+            if isinstance(entrada, dict) and "password" in str(entrada.get("id", "")) and entrada.get("value"):
+                entrada["value"] = "***"
+    return cuerpo
+
+
+def instrumentar_dash(server):
+    """
+    Graba cada invocación de callback de Dash que atiende el servidor Flask. Sin TRAZA_ARCHIVO no hace nada.
+    """
+    if grabador is None:
+        return
+
+    from flask import g, request
+
+    @server.before_request
+    def _inicio_callback():
+        if request.path == "/_dash-update-component":
+            g.inicio_traza = (time.time(), time.perf_counter())
+
+    @server.after_request
+    def _grabar_callback(respuesta):
+        inicio = g.pop("inicio_traza", None)
+        if inicio is not None:
+            instante, inicio = inicio
+            cuerpo = request.get_json(silent=True) or {}
+            grabador.registrar({
+                "t": instante,
+                "tipo": "callback",
+                "sitio": sitios.sitio_actual(),
+                "salida": cuerpo.get("output"),
+                "cuerpo": _ocultar_contrasenas(cuerpo),
+                "ms": round((time.perf_counter() - inicio) * 1000, 3),
+                "estado": respuesta.status_code,
+            })
+        return respuesta
+
+
+def leer_traza(rutas):
+    """
+    Lee los registros de uno o más archivos de traza (o la base común a todos los procesos), ordenados por instante.
+    """
+    archivos = []
+    for ruta in rutas:
+        archivos.extend(sorted(glob.glob(f"{ruta}.*.jsonl.gz")) if not os.path.exists(ruta) else [ruta])
+    registros = []
+    for archivo in archivos:
+        with gzip.open(archivo, "rt", encoding="utf-8") as entrada:
+            try:
+                for linea in entrada:
+                    if linea.strip():
+                        registros.append(json.loads(linea))
+            except (EOFError, OSError, ValueError):
+                # Archivo de un proceso que terminó sin cerrarlo; se usa lo que alcanzó a escribir
+                pass
+    registros.sort(key=lambda registro: registro["t"])
+    return registros